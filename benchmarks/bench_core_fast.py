@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+""" ZIP level core.xml rewrite vs python-docx load/save
+
+Checks parity first: both paths must produce identical core.xml, and the fast
+path must leave every other member's compressed bytes untouched.
+
+    python3 benchmarks/bench_core_fast.py --media-mb 10 20 40
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import docx
+import docx_coreprop_writer as writer
+from docx_coreprop_writer import zipio
+from fixtures import BENCH_META, make_fixture
+
+CORE_META = {key: val for key, val in BENCH_META.items() if key in writer.ATTR_LIST}
+
+
+def raw_members(filename):
+    """ :return dict: member name -> compressed bytes """
+    members = {}
+    with open(filename, "rb") as f, zipfile.ZipFile(f) as zf:
+        for info in zf.infolist():
+            f.seek(info.header_offset + 26)
+            name_len, extra_len = int.from_bytes(f.read(2), "little"), int.from_bytes(f.read(2), "little")
+            f.seek(info.header_offset + 30 + name_len + extra_len)
+            members[info.filename] = f.read(info.compress_size)
+    return members
+
+
+def check_parity(fixture, tmp):
+    slow = shutil.copy(fixture, os.path.join(tmp, "slow.docx"))
+    fast = shutil.copy(fixture, os.path.join(tmp, "fast.docx"))
+    writer.apply_core_properties(CORE_META, slow)
+    writer.apply_core_properties_fast(CORE_META, fast)
+
+    assert zipio.read_part(slow, "docProps/core.xml") == zipio.read_part(fast, "docProps/core.xml"), \
+        "core.xml differs between python-docx and ZIP level path"
+    before, after = raw_members(fixture), raw_members(fast)
+    assert list(before) == list(after), "member order differs"
+    for name in before:
+        if name != "docProps/core.xml":
+            assert before[name] == after[name], "{} has been recompressed".format(name)
+    assert docx.Document(fast).core_properties.title == CORE_META["title"]
+
+
+def timed(func, fixture, tmp, repeat):
+    best = None
+    for _ in range(repeat):
+        target = shutil.copy(fixture, os.path.join(tmp, "timed.docx"))
+        start = time.perf_counter()
+        func(CORE_META, target)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="core.xml fast path benchmark")
+    parser.add_argument("--media-mb", type=int, nargs="+", default=[1, 10, 40])
+    parser.add_argument("--paragraphs", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stderr(io.StringIO()):
+        for media_mb in args.media_mb:
+            fixture = make_fixture(os.path.join(tmp, "fixture.docx"), paragraphs=args.paragraphs,
+                                   tables=0, media_mb=media_mb)
+            check_parity(fixture, tmp)
+            slow = timed(writer.apply_core_properties, fixture, tmp, args.repeat)
+            fast = timed(writer.apply_core_properties_fast, fixture, tmp, args.repeat)
+            print("{:>6.1f} MiB  python-docx {:>8.3f} s  zip {:>8.3f} s  x{:.1f}".format(
+                os.path.getsize(fixture) / 1024 / 1024, slow, fast, slow / fast), file=sys.__stdout__)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+""" Compares one-load-per-pass (legacy wrappers) with single-load pipeline
+
+Each mode runs in its own interpreter so peak RSS is measured separately.
+
+    python3 benchmarks/bench_pipeline.py --paragraphs 20000 --media-mb 40
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LEGACY = ["unset_word2010_compatibility_mode",
+          "apply_core_properties",
+          "replace_paragraph_style",
+          "insert_extra_section",
+          "replace_table_style",
+          "replace_character_style",
+          "apply_table_alignment_in_page",
+          "apply_cell_vertical_alignment",
+          "disable_table_autofit",
+          "recommend_readonly",
+          "insert_okuzuke_table",
+          ]
+
+
+def run_mode(mode, filename):
+    """ Runs in child interpreter; prints elapsed seconds and peak RSS in KiB """
+    import io
+    import contextlib
+    import docx_coreprop_writer as writer
+    from fixtures import BENCH_META, peak_rss_kib
+
+    start = time.perf_counter()
+    with contextlib.redirect_stderr(io.StringIO()):
+        if mode == "legacy":
+            for name in LEGACY:
+                getattr(writer, name)(BENCH_META, filename)
+        else:
+            writer.process_document(BENCH_META, filename)
+    elapsed = time.perf_counter() - start
+    print(elapsed, peak_rss_kib())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="single-load pipeline benchmark")
+    parser.add_argument("--paragraphs", type=int, default=5000)
+    parser.add_argument("--tables", type=int, default=50)
+    parser.add_argument("--media-mb", type=int, default=20)
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "DOCX"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_mode(*args.child)
+        return
+
+    from fixtures import make_fixture
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fixture = make_fixture(os.path.join(tmp, "fixture.docx"), paragraphs=args.paragraphs,
+                               tables=args.tables, media_mb=args.media_mb)
+        print("fixture: {} paragraphs, {} tables, {:.1f} MiB".format(
+            args.paragraphs, args.tables, os.path.getsize(fixture) / 1024 / 1024))
+        for mode in ["legacy", "pipeline"]:
+            target = os.path.join(tmp, mode + ".docx")
+            shutil.copy(fixture, target)
+            out = subprocess.check_output([sys.executable, __file__, "--child", mode, target])
+            elapsed, rss = out.split()
+            print("{:<8} {:>8.2f} s {:>8.1f} MiB peak RSS".format(mode, float(elapsed), int(rss) / 1024))
+
+
+if __name__ == "__main__":
+    main()
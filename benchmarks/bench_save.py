@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+""" save_document() vs doc.save() after the passes have run
+
+Checks parity first: both saves must hold the same members with the same
+content, and members save_document() did not write must keep the compressed
+bytes of the source.
+
+    python3 benchmarks/bench_save.py --media-mb 10 20 40
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import docx
+import docx_coreprop_writer as writer
+from bench_core_fast import raw_members
+from fixtures import BENCH_META, make_fixture
+
+CASES = {"readonly": {"read-only-recommended": True},
+         "all passes": BENCH_META,
+         }
+
+
+def loaded(fixture, meta):
+    """ :return docx.Document: fixture after every pass of meta has run """
+    doc = docx.Document(fixture)
+    writer.run_passes(dict(meta), doc)
+    return doc
+
+
+def check_parity(fixture, meta, tmp):
+    slow = os.path.join(tmp, "slow.docx")
+    fast = os.path.join(tmp, "fast.docx")
+    loaded(fixture, meta).save(slow)
+    written = writer.save_document(loaded(fixture, meta), fixture, fast)
+
+    with zipfile.ZipFile(slow) as a, zipfile.ZipFile(fast) as b:
+        assert sorted(a.namelist()) == sorted(b.namelist()), "members differ"
+        for name in a.namelist():
+            assert a.read(name) == b.read(name), "{} differs from doc.save()".format(name)
+    before, after = raw_members(fixture), raw_members(fast)
+    for name in after:
+        if name not in written:
+            assert before[name] == after[name], "{} has been recompressed".format(name)
+    docx.Document(fast)
+
+
+def timed(save, fixture, meta, tmp, repeat):
+    best = None
+    for _ in range(repeat):
+        doc = loaded(fixture, meta)
+        target = os.path.join(tmp, "timed.docx")
+        start = time.perf_counter()
+        save(doc, fixture, target)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="zero-recompression save benchmark")
+    parser.add_argument("--media-mb", type=int, nargs="+", default=[1, 10, 40])
+    parser.add_argument("--paragraphs", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stderr(io.StringIO()):
+        for media_mb in args.media_mb:
+            fixture = make_fixture(os.path.join(tmp, "fixture.docx"), paragraphs=args.paragraphs,
+                                   tables=args.paragraphs // 100, media_mb=media_mb)
+            for case, meta in CASES.items():
+                check_parity(fixture, meta, tmp)
+                slow = timed(lambda doc, src, dst: doc.save(dst), fixture, meta, tmp, args.repeat)
+                fast = timed(writer.save_document, fixture, meta, tmp, args.repeat)
+                print("{:>6.1f} MiB  {:<12} doc.save {:>8.3f} s  raw copy {:>8.3f} s  x{:.1f}".format(
+                    os.path.getsize(fixture) / 1024 / 1024, case, slow, fast, slow / fast), file=sys.__stdout__)
+
+
+if __name__ == "__main__":
+    main()
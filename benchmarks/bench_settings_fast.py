@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+""" ZIP level settings.xml patch vs python-docx load/save
+
+Runs the default-config settings passes (drop Word 2010 compatibility mode,
+recommend read-only) both ways. Checks parity first: both paths must produce
+identical settings.xml, and the fast path must leave every other member's
+compressed bytes untouched.
+
+    python3 benchmarks/bench_settings_fast.py --media-mb 10 20 40
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import docx
+import docx_coreprop_writer as writer
+from bench_core_fast import raw_members
+from docx_coreprop_writer import zipio
+from fixtures import make_fixture
+
+SETTINGS_META = {"word2010compatible": False, "read-only-recommended": True}
+SETTINGS = "word/settings.xml"
+
+
+def full_load(meta, filename):
+    """ Both settings passes on one python-docx load and save """
+    doc = docx.Document(filename)
+    if writer.run_passes(meta, doc, writer.SETTINGS_PASSES) != []:
+        writer.save_document(doc, filename)
+
+
+def check_parity(fixture, tmp):
+    slow = shutil.copy(fixture, os.path.join(tmp, "slow.docx"))
+    fast = shutil.copy(fixture, os.path.join(tmp, "fast.docx"))
+    full_load(SETTINGS_META, slow)
+    assert writer.apply_settings_fast(SETTINGS_META, fast)
+
+    assert zipio.read_part(slow, SETTINGS) == zipio.read_part(fast, SETTINGS), \
+        "settings.xml differs between python-docx and ZIP level path"
+    before, after = raw_members(fixture), raw_members(fast)
+    assert list(before) == list(after), "member order differs"
+    for name in before:
+        if name != SETTINGS:
+            assert before[name] == after[name], "{} has been recompressed".format(name)
+    assert docx.Document(fast).settings.element.xpath("w:writeProtection") != []
+    assert not writer.apply_settings_fast(SETTINGS_META, fast), "second run is not a no-op"
+
+
+def timed(func, fixture, tmp, repeat):
+    best = None
+    for _ in range(repeat):
+        target = shutil.copy(fixture, os.path.join(tmp, "timed.docx"))
+        start = time.perf_counter()
+        func(SETTINGS_META, target)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="settings.xml fast path benchmark")
+    parser.add_argument("--media-mb", type=int, nargs="+", default=[1, 10, 40])
+    parser.add_argument("--paragraphs", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stderr(io.StringIO()):
+        for media_mb in args.media_mb:
+            fixture = make_fixture(os.path.join(tmp, "fixture.docx"), paragraphs=args.paragraphs,
+                                   tables=0, media_mb=media_mb)
+            check_parity(fixture, tmp)
+            slow = timed(full_load, fixture, tmp, args.repeat)
+            fast = timed(writer.apply_settings_fast, fixture, tmp, args.repeat)
+            print("{:>6.1f} MiB  python-docx {:>8.3f} s  zip {:>8.3f} s  x{:.1f}".format(
+                os.path.getsize(fixture) / 1024 / 1024, slow, fast, slow / fast), file=sys.__stdout__)
+
+
+if __name__ == "__main__":
+    main()
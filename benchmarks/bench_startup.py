@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+""" Cold-start budget for the CLI
+
+Measures, as the best of several fresh interpreters,
+- cumulative `python -X importtime` of docx_coreprop_writer
+- wall time of `docx-coreprop-writer --version`
+and checks that --version/--help load none of the heavy dependencies.
+Exits nonzero when startup_budget.json is exceeded.
+
+    python3 benchmarks/bench_startup.py [--repeat 10] [--update]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+BUDGET = os.path.join(HERE, "startup_budget.json")
+MAIN = "import sys; import docx_coreprop_writer as w; sys.argv[0] = 'docx-coreprop-writer'; w.main()"
+LOADED = ("import sys; import docx_coreprop_writer as w; sys.argv = ['docx-coreprop-writer', {!r}]\n"
+          "try:\n    w.main()\nexcept SystemExit:\n    pass\n"
+          "print(' '.join(sorted(m for m in sys.modules if m.split('.')[0] in {!r})), file=sys.stderr)")
+
+
+def environ():
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([ROOT, env.get("PYTHONPATH", "")])
+    return env
+
+
+def import_time_us():
+    """ :return int: cumulative import time of docx_coreprop_writer in microseconds """
+    err = subprocess.run([sys.executable, "-X", "importtime", "-c", "import docx_coreprop_writer"],
+                         env=environ(), stderr=subprocess.PIPE, check=True).stderr.decode()
+    for line in err.splitlines():
+        if line.rstrip().endswith("| docx_coreprop_writer"):
+            return int(line.split("|")[1])
+    raise RuntimeError("docx_coreprop_writer not found in importtime output")
+
+
+def version_ms():
+    """ :return float: wall time of `docx-coreprop-writer --version` in milliseconds """
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", MAIN, "--version"], env=environ(), stdout=subprocess.DEVNULL, check=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def loaded_modules(option, forbidden):
+    """ :return list: forbidden top-level packages imported while handling option """
+    err = subprocess.run([sys.executable, "-c", LOADED.format(option, tuple(forbidden))], env=environ(),
+                         stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True).stderr.decode()
+    return err.split()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CLI cold-start budget")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--update", action="store_true", help="rewrite budget from this run (x1.5 headroom)")
+    args = parser.parse_args()
+
+    with open(BUDGET) as f:
+        budget = json.load(f)
+
+    measured = {"import_us": min(import_time_us() for _ in range(args.repeat)),
+                "version_ms": round(min(version_ms() for _ in range(args.repeat)), 1),
+                }
+    failed = False
+    for key, value in measured.items():
+        ok = value <= budget[key]
+        failed |= not ok
+        print("{:<12} {:>10} (budget {}) {}".format(key, value, budget[key], "ok" if ok else "OVER BUDGET"))
+    for option in ["--version", "--help"]:
+        loaded = loaded_modules(option, budget["forbidden_modules"])
+        failed |= loaded != []
+        print("{:<12} {}".format(option, "no heavy imports" if loaded == [] else "imports " + " ".join(loaded)))
+
+    if args.update:
+        budget.update({key: type(value)(value * 1.5) for key, value in measured.items()})
+        with open(BUDGET, "w") as f:
+            json.dump(budget, f, indent=2)
+            f.write("\n")
+        return
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
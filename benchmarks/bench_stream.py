@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+""" Peak RSS of python-docx pipeline vs streaming engine on large documents
+
+    python3 benchmarks/bench_stream.py --paragraphs 20000 50000
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixtures import BENCH_META, peak_rss_kib
+
+STREAM_META = {key: val for key, val in BENCH_META.items() if key not in ["extra_section", "okuzuke"]}
+
+
+def run_mode(mode, filename):
+    """ Runs in child interpreter; prints elapsed seconds and peak RSS in KiB """
+    import docx_coreprop_writer as writer
+    from docx_coreprop_writer.stream import stream_document
+
+    start = time.perf_counter()
+    with contextlib.redirect_stderr(io.StringIO()):
+        if mode == "stream":
+            stream_document(STREAM_META, filename)
+        else:
+            writer.process_document(STREAM_META, filename)
+    elapsed = time.perf_counter() - start
+    print(elapsed, peak_rss_kib())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="streaming engine benchmark")
+    parser.add_argument("--paragraphs", type=int, nargs="+", default=[10000, 50000])
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "DOCX"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_mode(*args.child)
+        return
+
+    from fixtures import make_fixture
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for paragraphs in args.paragraphs:
+            fixture = make_fixture(os.path.join(tmp, "fixture.docx"), paragraphs=paragraphs,
+                                   tables=paragraphs // 100)
+            print("fixture: {} paragraphs, {} tables, {:.1f} MiB".format(
+                paragraphs, paragraphs // 100, os.path.getsize(fixture) / 1024 / 1024))
+            for mode in ["pipeline", "stream"]:
+                target = shutil.copy(fixture, os.path.join(tmp, mode + ".docx"))
+                out = subprocess.check_output([sys.executable, __file__, "--child", mode, target])
+                elapsed, rss = out.split()
+                print("  {:<8} {:>8.2f} s {:>8.1f} MiB peak RSS".format(mode, float(elapsed), int(rss) / 1024))
+
+
+if __name__ == "__main__":
+    main()
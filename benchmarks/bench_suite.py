@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+""" Scaling benchmark of every pass and of the whole CLI
+
+Synthetic fixtures grow along one axis at a time from BASE: paragraph count,
+runs per paragraph, tables x rows x cells, sections and embedded media size.
+For each fixture it reports
+- each stage (load, every pass, save) of process_document(), best of --repeat
+- `docx-coreprop-writer -I -O` in a fresh interpreter, as documents/sec and paragraphs/sec
+and compares the results with a stored baseline. Timings are normalized by a
+fixed calibration workload so baselines recorded on other machines stay comparable.
+Exits nonzero when the pipeline total or the CLI regressed beyond --tolerance;
+slower single passes are reported as warnings.
+
+    python3 benchmarks/bench_suite.py [--quick] [--repeat 3] [--output results.json] [--update]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, HERE)
+sys.path.insert(0, ROOT)
+
+import yaml  # noqa: E402
+from lxml import etree  # noqa: E402
+
+import docx_coreprop_writer as writer  # noqa: E402
+from docx_coreprop_writer import profiling  # noqa: E402
+from fixtures import BENCH_META, make_fixture  # noqa: E402
+
+BASELINE = os.path.join(HERE, "bench_baseline.json")
+MAIN = "import sys; import docx_coreprop_writer as w; sys.argv[0] = 'docx-coreprop-writer'; w.main()"
+
+BASE = {"paragraphs": 2000, "runs": 3, "tables": 10, "rows": 10, "cols": 4, "sections": 1, "media_mb": 0}
+AXES = {"paragraphs": [{"paragraphs": n} for n in [500, 2000, 10000]],
+        "runs": [{"runs": n} for n in [1, 3, 10]],
+        "tables": [{"tables": t, "rows": r, "cols": c} for t, r, c in [(10, 10, 4), (50, 10, 4), (50, 50, 8)]],
+        "sections": [{"sections": n} for n in [1, 10, 50]],
+        "media_mb": [{"media_mb": n} for n in [0, 10, 40]],
+        }
+QUICK = 2  # --quick takes the smallest sizes of each axis
+NOISE_MS = 20.0  # measurements below this are not compared
+GATED = ["total", "main_ms"]  # single passes are too noisy to fail a build on, unless --strict
+
+
+def case_name(params):
+    """ :return str: e.g. "paragraphs=2000 runs=3 tables=10x10x4 sections=1 media_mb=0" """
+    return "paragraphs={paragraphs} runs={runs} tables={tables}x{rows}x{cols} " \
+           "sections={sections} media_mb={media_mb}".format(**params)
+
+
+def calibration_ms(repeat=30):
+    """ :return float: best time of a fixed lxml parse/serialize workload, the bulk of what passes do """
+    xml = b"<root>" + b"<p a='1'><r><t>text</t></r></p>" * 5000 + b"</root>"
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        root = etree.fromstring(xml)
+        for elem in root.iter("r"):
+            elem.set("s", "1")
+        etree.tostring(root)
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def stage_ms(fixture, work, repeat):
+    """ Runs process_document() with profiler on fresh copies of fixture
+
+    :return dict: stage name -> best wall time in milliseconds
+    """
+    best = {}
+    for _ in range(repeat):
+        target = os.path.join(work, "stages.docx")
+        shutil.copy(fixture, target)
+        profiler = profiling.Profiler(target)
+        with contextlib.redirect_stderr(io.StringIO()):
+            writer.process_document(dict(BENCH_META), target, profiler=profiler)
+        for row in profiler.stages + [profiler.total()]:
+            best[row["stage"]] = min(best.get(row["stage"], row["wall_ms"]), row["wall_ms"])
+    return best
+
+
+def main_ms(fixture, config, work, repeat):
+    """ :return float: best wall time of the CLI in a fresh interpreter in milliseconds """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([ROOT, env.get("PYTHONPATH", "")])
+    best = None
+    for _ in range(repeat):
+        target = os.path.join(work, "main.docx")
+        shutil.copy(fixture, target)
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", MAIN, "-I", config, "-O", target], env=env,
+                       stderr=subprocess.DEVNULL, check=True)
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_suite(axes, repeat, work, calibration):
+    """ :return dict cases: case name -> measurements """
+    config = os.path.join(work, "meta.yaml")
+    with open(config, "w") as f:
+        yaml.safe_dump({writer.META_KEY: BENCH_META}, f)
+
+    cases = {}
+    for axis, steps in axes.items():
+        for step in steps:
+            params = dict(BASE, **step)
+            name = case_name(params)
+            if name in cases:  # BASE lies on every axis; measured once
+                cases[name]["axes"].append(axis)
+                continue
+            fixture = make_fixture(os.path.join(work, "fixture.docx"), **params)
+            stages = stage_ms(fixture, work, repeat)
+            total = main_ms(fixture, config, work, repeat)
+            cases[name] = {"axes": [axis],
+                           "params": params,
+                           "calibration_ms": calibration,
+                           "stages": {key: round(val, 3) for key, val in stages.items()},
+                           "main_ms": round(total, 3),
+                           "docs_per_s": round(1000 / total, 3),
+                           "paragraphs_per_s": round(params["paragraphs"] * 1000 / total, 1),
+                           }
+            print("{:<70} {:>9.1f} ms {:>7.2f} docs/s {:>9.0f} paragraphs/s".format(
+                name, total, cases[name]["docs_per_s"], cases[name]["paragraphs_per_s"]), flush=True)
+    return cases
+
+
+def print_stages(cases):
+    """ Prints one table per axis; rows are stages, columns are sizes along the axis """
+    for axis in AXES:
+        columns = sorted([(name, case) for name, case in cases.items() if axis in case["axes"]],
+                         key=lambda column: [column[1]["params"][key] for key in AXES[axis][0]])
+        if columns == []:
+            continue
+        stages = list(columns[0][1]["stages"])
+        labels = [str(case["params"][axis]) if axis != "tables" else
+                  "{tables}x{rows}x{cols}".format(**case["params"]) for _, case in columns]
+        print()
+        print("{:<30}".format(axis) + "".join("{:>12}".format(label) for label in labels))
+        for stage in stages + ["main_ms"]:
+            values = [case["stages"].get(stage) if stage != "main_ms" else case["main_ms"] for _, case in columns]
+            print("{:<30}".format(stage) + "".join("{:>12.1f}".format(v) if v is not None else "{:>12}".format("-")
+                                                   for v in values))
+
+
+def compare(results, baseline, tolerance):
+    """ Compares normalized timings of results and baseline
+
+    :return list regressions: (case, stage, baseline ms, measured ms, ratio)
+    """
+    regressions = []
+    for name, case in results["cases"].items():
+        base = baseline["cases"].get(name)
+        if base is None:
+            continue
+        scale = case["calibration_ms"] / base["calibration_ms"]
+        pairs = [(stage, base["stages"].get(stage), ms) for stage, ms in case["stages"].items()]
+        pairs.append(("main_ms", base["main_ms"], case["main_ms"]))
+        for stage, before, after in pairs:
+            if before is None or max(before * scale, after) < NOISE_MS:
+                continue
+            ratio = after / (before * scale)
+            if ratio > tolerance:
+                regressions.append((name, stage, before, after, ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="pass and pipeline scaling benchmark")
+    parser.add_argument("--quick", action="store_true", help="only the smallest sizes of each axis")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default=None, help="write results as JSON")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--tolerance", type=float, default=2.0,
+                        help="fail when a normalized timing exceeds baseline by this factor")
+    parser.add_argument("--strict", action="store_true", help="fail on regressions of single passes as well")
+    parser.add_argument("--update", action="store_true", help="merge results into baseline instead of comparing")
+    args = parser.parse_args()
+
+    axes = {axis: steps[:QUICK] if args.quick else steps for axis, steps in AXES.items()}
+    work = tempfile.mkdtemp()
+    try:
+        calibration = round(calibration_ms(), 3)
+        print("calibration {:.1f} ms".format(calibration))
+        results = {"cases": run_suite(axes, args.repeat, work, calibration)}
+    finally:
+        shutil.rmtree(work)
+    print_stages(results["cases"])
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+
+    if args.update:
+        baseline = {"cases": {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline["cases"].update(results["cases"])
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2)
+            f.write("\n")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("no baseline at {}; run with --update to record one".format(args.baseline))
+        return
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    failed = [regression for regression in regressions if args.strict or regression[1] in GATED]
+    print()
+    for regression in regressions:
+        name, stage, before, after, ratio = regression
+        print("{} {} {}: {:.1f} ms -> {:.1f} ms (x{:.2f} normalized)".format(
+            "REGRESSION" if regression in failed else "slower    ", name, stage, before, after, ratio))
+    print("{} regressions, {} slower passes (tolerance x{})".format(len(failed), len(regressions) - len(failed),
+                                                                   args.tolerance))
+    if failed != []:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+""" Okuzuke, extra section and compat insertion: prebuilt templates vs building per document
+
+The reference implementations below are the passes as they were before
+templates.py: the okuzuke table built with add_row()/cell.text and a style
+lookup per row, the compat block rebuilt element by element, the extra
+section added through doc.sections/doc.add_section(). Checks parity first:
+document.xml and settings.xml must come out identical both ways.
+
+    python3 benchmarks/bench_templates.py --rows 4 40 --repeat 20
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import docx
+from docx.enum.section import WD_SECTION
+from docx.enum.table import WD_TABLE_ALIGNMENT
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+
+import docx_coreprop_writer as writer
+from docx_coreprop_writer.plan import compile_metadata
+from docx_coreprop_writer.templates import COMPAT_SETTINGS, COMPAT_URL
+from fixtures import make_fixture
+
+
+def okuzuke_per_row(meta_file, doc):
+    okuzuke = meta_file["okuzuke"]
+    doc.sections[-1]._sectPr.append(OxmlElement("w:vAlign", attrs={qn("w:val"): "bottom"}))
+    doc.add_page_break()
+    table = doc.add_table(rows=0, cols=1, style=okuzuke.get("table-style", "Normal Table"))
+    table.alignment = WD_TABLE_ALIGNMENT.CENTER
+    for row_text in okuzuke.get("rows", []):
+        row = table.add_row()
+        row.cells[0].text = row_text.strip()
+        row.cells[0].paragraphs[0].style = okuzuke.get("para-style", "Table Body Left")
+    doc.add_page_break()
+    doc.add_page_break()
+    return True
+
+
+def compat_per_element(meta_file, doc):
+    compat = OxmlElement("w:compat")
+    compat.append(OxmlElement("w:useFELayout"))
+    for name, val in COMPAT_SETTINGS:
+        compat.append(OxmlElement("w:compatSetting", attrs={qn("w:name"): name, qn("w:url"): COMPAT_URL,
+                                                            qn("w:val"): val}))
+    current = doc.settings.element.xpath("w:compat")
+    if len(current) == 1 and writer.same_element(current[0], compat):
+        return False
+    doc.settings.element.remove_all("w:compat")
+    doc.settings.element.append(compat)
+    return True
+
+
+def extra_section_by_sections(meta_file, doc):
+    last_section = doc.sections[-1]
+    extra_section = doc.add_section(WD_SECTION.NEW_PAGE)
+    extra_section.orientation = last_section.orientation
+    extra_section.page_width = last_section.page_width
+    extra_section.page_height = last_section.page_height
+    extra_section.left_margin = last_section.left_margin
+    extra_section.right_margin = last_section.right_margin
+    extra_section.top_margin = last_section.top_margin
+    extra_section.bottom_margin = last_section.bottom_margin
+    extra_section.different_first_page_header_footer = True
+    for hdrftr in (extra_section.first_page_header, extra_section.first_page_footer, extra_section.header,
+                   extra_section.footer, extra_section.even_page_header, extra_section.even_page_footer):
+        hdrftr.is_linked_to_previous = False
+    return True
+
+
+def cases(rows):
+    okuzuke = {"table-style": "Table Grid", "para-style": "Body Text",
+               "rows": ["Row {}".format(i) for i in range(rows)]}
+    return [("okuzuke {} rows".format(rows), {"okuzuke": okuzuke}, okuzuke_per_row, writer.okuzuke_table_pass),
+            ("compat", {}, compat_per_element, writer.word2010_compatibility_pass),
+            ("extra section", {"extra_section": True}, extra_section_by_sections, writer.extra_section_pass),
+            ]
+
+
+def parts_xml(doc):
+    return doc.element.xml, doc.settings.element.xml
+
+
+def check_parity(fixture, meta, before, after):
+    a, b = docx.Document(fixture), docx.Document(fixture)
+    before(meta, a)
+    after(meta, b)
+    assert parts_xml(a) == parts_xml(b), "{} output differs".format(after.__name__)
+
+
+def timed(func, fixture, meta, repeat):
+    """ :return float: best seconds of func alone, on a freshly loaded document each time """
+    best = None
+    for _ in range(repeat):
+        doc = docx.Document(fixture)
+        start = time.perf_counter()
+        func(meta, doc)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="prebuilt XML fragment benchmark")
+    parser.add_argument("--rows", type=int, nargs="+", default=[4, 40])
+    parser.add_argument("--paragraphs", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stderr(io.StringIO()):
+        fixture = make_fixture(os.path.join(tmp, "fixture.docx"), paragraphs=args.paragraphs,
+                               tables=args.paragraphs // 100)
+        seen = set()
+        for rows in args.rows:
+            for case, meta, before, after in cases(rows):
+                if case in seen:
+                    continue
+                seen.add(case)
+                meta = compile_metadata(meta)
+                check_parity(fixture, meta, before, after)
+                slow = timed(before, fixture, meta, args.repeat)
+                fast = timed(after, fixture, meta, args.repeat)
+                print("{:<18} per document: built {:>8.3f} ms  template {:>8.3f} ms  x{:.1f}".format(
+                    case, slow * 1000, fast * 1000, slow / fast), file=sys.__stdout__)
+
+
+if __name__ == "__main__":
+    main()
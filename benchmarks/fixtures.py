@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+""" Synthetic DOCX fixture generator for benchmarks """
+
+import os
+import struct
+import zlib
+
+import docx
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls
+from docx.shared import Inches
+
+BENCH_META = {"author": "K4ZUKI",
+              "category": "Category",
+              "comments": "Comment",
+              "created": "31-Dec-2018",
+              "keywords": "Keyword1 Keyword2",
+              "last_modified_by": "K4ZUKI",
+              "last_printed": "31-Dec-2018",
+              "modified": "31-Dec-2018",
+              "revision": 1123,
+              "subject": "SubjecT",
+              "title": "Title",
+              "table-alignment-in-page": "center",
+              "table-cell-vertical-alignment": "center",
+              "read-only-recommended": True,
+              "disable-table-autofit": True,
+              "extra_section": True,
+              "table": {"Normal Table": "Table Grid"},
+              "paragraph": {"Normal": "Body Text"},
+              "character": {"Default Paragraph Font": "Emphasis"},
+              "okuzuke": {"table-style": "Normal Table",
+                          "para-style": "Normal",
+                          "rows": ["Title", "Author", "Revision", "Year"]},
+              }
+
+
+def peak_rss_kib():
+    """ Peak RSS of this process in KiB
+
+    Prefers VmHWM; ru_maxrss of a child may carry the parent's peak over fork and exec on Linux.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def make_png(filename, size):
+    """ Writes incompressible RGB PNG of roughly `size` bytes
+
+    :param str filename:
+    :param int size: approximate size in bytes
+    """
+    width = max(1, int((size / 3) ** 0.5))
+    height = width
+    raw = b"".join(b"\x00" + os.urandom(width * 3) for _ in range(height))
+
+    def chunk(tag, data):
+        body = tag + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body) & 0xffffffff)
+
+    with open(filename, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(raw, 0)))
+        f.write(chunk(b"IEND", b""))
+
+
+def _body_xml(paragraphs, runs, tables, rows, cols, sections):
+    """ :return str: w:body children for make_fixture() """
+    run = '<w:r><w:t xml:space="preserve">Paragraph {} run {} </w:t></w:r>'
+    cell = '<w:tc><w:tcPr><w:tcW w:w="{}" w:type="dxa"/></w:tcPr><w:p><w:r><w:t>cell</w:t></w:r></w:p></w:tc>'
+    row = "<w:tr>" + cell.format(9000 // cols) * cols + "</w:tr>"
+    table = ('<w:tbl><w:tblPr><w:tblW w:w="0" w:type="auto"/></w:tblPr><w:tblGrid>'
+             + '<w:gridCol w:w="{}"/>'.format(9000 // cols) * cols + "</w:tblGrid>" + row * rows + "</w:tbl>")
+    section = "<w:p><w:pPr><w:sectPr/></w:pPr></w:p>"
+
+    per_section = max(1, paragraphs // sections)
+    table_every = max(1, paragraphs // tables) if tables else 0
+    made_tables = made_sections = 0
+    body = []
+    for i in range(paragraphs):
+        body.append("<w:p>" + "".join(run.format(i, j) for j in range(runs)) + "</w:p>")
+        if table_every and i % table_every == 0 and made_tables < tables:
+            body.append(table)
+            made_tables += 1
+        if i and i % per_section == 0 and made_sections < sections - 1:
+            body.append(section)
+            made_sections += 1
+    return "".join(body)
+
+
+def make_fixture(filename, paragraphs=1000, runs=3, tables=20, rows=10, cols=4, sections=1, media_mb=0):
+    """ Builds a synthetic DOCX which scales along each axis
+
+    Body XML is generated directly; python-docx add_paragraph() is quadratic on large bodies.
+
+    :param str filename:
+    :param int paragraphs: number of body paragraphs
+    :param int runs: number of runs per paragraph
+    :param int tables: number of tables
+    :param int rows: rows per table
+    :param int cols: cells per row
+    :param int sections: number of sections
+    :param int media_mb: size of one embedded picture in MiB; 0 for none
+    :return str filename:
+    """
+    doc = docx.Document()
+    body = doc.element.body
+    xml = '<w:body {}>{}</w:body>'.format(nsdecls("w"), _body_xml(paragraphs, runs, tables, rows, cols, sections))
+    sect_pr = body.sectPr
+    for child in list(parse_xml(xml)):
+        sect_pr.addprevious(child)
+    if media_mb:
+        png = filename + ".png"
+        make_png(png, media_mb * 1024 * 1024)
+        doc.add_picture(png, width=Inches(4))
+        os.remove(png)
+    doc.save(filename)
+    return filename
@@ -1,22 +1,20 @@
 #!/usr/bin/env python3
-from typing import List, Dict
+from typing import Dict, TYPE_CHECKING
 
 import datetime
 import sys
 import argparse
-import yaml
-from box import Box
-import docx
-from docx.section import Section
-from docx.enum.table import WD_CELL_VERTICAL_ALIGNMENT, WD_TABLE_ALIGNMENT
-from docx.oxml import OxmlElement
-from docx.oxml.ns import qn
-from docx.table import Table, _Cell
-from docx.text.paragraph import Paragraph, Run
-from docx.enum.section import WD_SECTION
 from docx_coreprop_writer.version import version
+from docx_coreprop_writer import profiling
+
+# python-docx and yaml are imported by the functions using them;
+# --version, --help and ZIP level paths never pay for them
+if TYPE_CHECKING:
+    from docx.section import Section
 
 META_KEY = "docx_coreprop"
+STDIO = "-"  # --output reading stdin and writing stdout
+STAMP_NAME = "fingerprint_stamp"  # listed among the changed passes when --stamp records a fingerprint
 ATTR_LIST = ["author",
              "category",
              "comments",
@@ -34,15 +32,31 @@ ATTR_LIST = ["author",
              "version",
              ]
 
-TABLE_ALIGNMENT_IN_PAGE = {"left": WD_TABLE_ALIGNMENT.LEFT,
-                           "center": WD_TABLE_ALIGNMENT.CENTER,
-                           "right": WD_TABLE_ALIGNMENT.RIGHT}
 
-CELL_VERTICAL_ALIGMENT = {"top": WD_CELL_VERTICAL_ALIGNMENT.TOP,
-                          "center": WD_CELL_VERTICAL_ALIGNMENT.CENTER,
-                          "bottom": WD_CELL_VERTICAL_ALIGNMENT.BOTTOM,
-                          "both": WD_CELL_VERTICAL_ALIGNMENT.BOTH
-                          }
+def load_enums():
+    """ Defines TABLE_ALIGNMENT_IN_PAGE and CELL_VERTICAL_ALIGMENT on first call """
+    global TABLE_ALIGNMENT_IN_PAGE, CELL_VERTICAL_ALIGMENT
+    if "CELL_VERTICAL_ALIGMENT" in globals():
+        return
+    from docx.enum.table import WD_CELL_VERTICAL_ALIGNMENT, WD_TABLE_ALIGNMENT
+
+    TABLE_ALIGNMENT_IN_PAGE = {"left": WD_TABLE_ALIGNMENT.LEFT,
+                               "center": WD_TABLE_ALIGNMENT.CENTER,
+                               "right": WD_TABLE_ALIGNMENT.RIGHT}
+
+    CELL_VERTICAL_ALIGMENT = {"top": WD_CELL_VERTICAL_ALIGNMENT.TOP,
+                              "center": WD_CELL_VERTICAL_ALIGNMENT.CENTER,
+                              "bottom": WD_CELL_VERTICAL_ALIGNMENT.BOTTOM,
+                              "both": WD_CELL_VERTICAL_ALIGNMENT.BOTH
+                              }
+
+
+def __getattr__(name):
+    """ Lazy module attributes (PEP 562) """
+    if name in ("TABLE_ALIGNMENT_IN_PAGE", "CELL_VERTICAL_ALIGMENT"):
+        load_enums()
+        return globals()[name]
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
 
 
 def ensure_value(namespace, dest, default):
@@ -84,37 +98,76 @@ def get_choice(meta_ext: Dict or None, meta_file: Dict, key):
     return ret
 
 
+def merge_choice(meta_ext: Dict, meta_file: Dict):
+    """ get_choice() for every key of both
+
+    :param Dict meta_ext: overrides
+    :param Dict meta_file: default
+    :return Dict ret: nested mappings are merged the same way, key by key
+    """
+    from collections.abc import Mapping
+
+    ret = {}
+    for key in list(meta_file) + [key for key in meta_ext if key not in meta_file]:
+        if isinstance(meta_ext.get(key), Mapping) and isinstance(meta_file.get(key), Mapping):
+            ret[key] = merge_choice(meta_ext[key], meta_file[key])
+        else:
+            ret[key] = get_choice(meta_ext, meta_file, key)
+    return ret
+
+
 class DictDotNotation(dict):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.__dict__ = self
 
 
-def apply_core_properties(meta_file, filename):
-    """ Overwrite DOCX core property from meta_file or meta_ext dictionaries
-    When both dict has value for each for same key, meta_ext has priority
+def update_property(core_properties, name, value):
+    """ Sets one core property only when it differs from current value
 
-    :param dict meta_file:
-    :param str filename:
+    :param docx.opc.coreprops.CoreProperties core_properties:
+    :param str name:
+    :param value:
+    :return bool: True when the property has been changed
     """
+    current = getattr(core_properties, name)
+    if isinstance(current, datetime.datetime):
+        current = current.replace(tzinfo=None)  # python-docx reads back UTC-aware, writes naive as UTC
+    elif isinstance(current, str):
+        value = str(value)
+    if current == value:
+        return False
+    setattr(core_properties, name, value)
+    profiling.count("properties changed")
+    return True
+
+
+def set_core_properties(meta_file, core_properties):
+    """ Overwrite core properties from meta_file
+
+    :param dict meta_file: metadata or MetadataPlan
+    :param docx.opc.coreprops.CoreProperties core_properties:
+    :return bool: True when any property has been changed
+    """
+    from docx_coreprop_writer.plan import compile_metadata
 
-    doc = docx.Document(filename)  # type:docx.Document
-
-    meta = Box({key: meta_file.get(key) for key in ATTR_LIST})
+    meta_file = compile_metadata(meta_file)  # dates parsed, revision coerced
+    meta = DictDotNotation({key: meta_file.get(key) for key in ATTR_LIST})
     [print("{} = {}".format(key, val), file=sys.stderr) for key, val in meta.items()]
+    changed = False
     if meta.author is not None:
         """ author (unicode)
         Note: named `creator` in spec.
         An entity primarily responsible for making the content of the resource. (Dublin Core)
         """
-        doc.core_properties.author = meta.author
+        changed |= update_property(core_properties, "author", meta.author)
     if meta.category is not None:
         """ category (unicode)
         A categorization of the content of this package.
         Example values for this property might include: Resume, Letter, Financial Forecast, Proposal,
         Technical Presentation, and so on. (Open Packaging Conventions)
         """
-        doc.core_properties.category = meta.category
+        changed |= update_property(core_properties, "category", meta.category)
     if meta.comments is not None:
         """comments (unicode)
         Note: named `description` in spec.
@@ -122,206 +175,258 @@ def apply_core_properties(meta_file, filename):
         Values might include an abstract, table of contents, reference to a graphical representation
         of content, and a free-text account of the content. (Dublin Core)
         """
-        doc.core_properties.comments = meta.comments
+        changed |= update_property(core_properties, "comments", meta.comments)
     if meta.content_status is not None:
         """content_status (unicode)
         The status of the content.
         Values might include "Draft", "Reviewed", and "Final". (Open Packaging Conventions)
         """
-        doc.core_properties.content_status = meta.content_status
+        changed |= update_property(core_properties, "content_status", meta.content_status)
     if meta.created is not None:
         """created (datetime)
         Date of creation of the resource. (Dublin Core)
         """
-        doc.core_properties.created = datetime.datetime.strptime(meta.created, "%d-%b-%Y")  # DD-MMM-YYYY
+        changed |= update_property(core_properties, "created", meta.created)
     if meta.identifier is not None:
         """identifier (unicode)
         An unambiguous reference to the resource within a given context. (Dublin Core)
         """
-        doc.core_properties.identifier = meta.identifier
+        changed |= update_property(core_properties, "identifier", meta.identifier)
     if meta.keywords is not None:
         """keywords (unicode)
         A delimited set of keywords to support searching and indexing.
         This is typically a list of terms that are not available elsewhere
         in the properties. (Open Packaging Conventions)
         """
-        doc.core_properties.keywords = meta.keywords
+        changed |= update_property(core_properties, "keywords", meta.keywords)
     if meta.language is not None:
         """language (unicode)
         The language of the intellectual content of the resource. (Dublin Core)
         """
-        doc.core_properties.language = meta.language
+        changed |= update_property(core_properties, "language", meta.language)
     if meta.last_modified_by is not None:
         """last_modified_by (unicode)
         The user who performed the last modification. The identification is environment-specific.
         Examples include a name, email address, or employee ID.
         It is recommended that this value be as concise as possible. (Open Packaging Conventions)
         """
-        doc.core_properties.last_modified_by = meta.last_modified_by
+        changed |= update_property(core_properties, "last_modified_by", meta.last_modified_by)
     if meta.last_printed is not None:
         """last_printed (datetime)
         The date and time of the last printing. (Open Packaging Conventions)
         """
-        doc.core_properties.last_printed = datetime.datetime.strptime(meta.last_printed, "%d-%b-%Y")
+        changed |= update_property(core_properties, "last_printed", meta.last_printed)
     if meta.modified is not None:
         """modified (datetime)
         Date on which the resource was changed. (Dublin Core)
         """
-        doc.core_properties.modified = datetime.datetime.strptime(meta.modified, "%d-%b-%Y")
+        changed |= update_property(core_properties, "modified", meta.modified)
     if meta.revision is not None:
         """revision (int)
         The revision number. This value might indicate the number of saves or revisions,
         provided the application updates it after each revision. (Open Packaging Conventions)
         """
-        doc.core_properties.revision = meta.revision
+        changed |= update_property(core_properties, "revision", meta.revision)
     if meta.subject is not None:
         """subject (unicode)
         The topic of the content of the resource. (Dublin Core)
         """
-        doc.core_properties.subject = meta.subject
+        changed |= update_property(core_properties, "subject", meta.subject)
     if meta.title is not None:
         """title (unicode)
         The name given to the resource. (Dublin Core)
         """
-        doc.core_properties.title = meta.title
+        changed |= update_property(core_properties, "title", meta.title)
     if meta.version is not None:
         """version (unicode)
         The version designator.
         This value is set by the user or by the application. (Open Packaging Conventions)
         """
-        doc.core_properties.version = meta.version
+        changed |= update_property(core_properties, "version", meta.version)
 
-    doc.save(filename)
+    return changed
 
 
-def apply_table_alignment_in_page(meta_file, filename):
+def core_properties_pass(meta_file, doc):
+    """ Overwrite DOCX core property from meta_file or meta_ext dictionaries
+    When both dict has value for each for same key, meta_ext has priority
+
+    :param dict meta_file:
+    :param docx.Document doc:
+    :return bool: True when the document has been changed
+    """
+    return set_core_properties(meta_file, doc.core_properties)
+
+
+def table_alignment_in_page_visitor(meta_file, doc):
     """
     :param dict meta_file:
-    :param str filename:
-    :return:
+    :param docx.Document doc:
+    :return Visitor: or None when meta_file does not ask for it
     """
+    from docx.table import Table
+    from docx_coreprop_writer.blocks import Visitor
+
+    load_enums()
+
     _message = "Each table has aligned at {} of page"
     _key = "table-alignment-in-page"
 
     table_alignment_in_page = meta_file.get(_key)
 
     if table_alignment_in_page is not None:
-        doc = docx.Document(filename)  # type:docx.Document
         table_alignment_in_page = table_alignment_in_page.lower()
         print(_message.format(table_alignment_in_page), file=sys.stderr)
-        table: Table
-        for table in doc.tables:
-            table.alignment = TABLE_ALIGNMENT_IN_PAGE[table_alignment_in_page]
-        doc.save(filename)
+        alignment = TABLE_ALIGNMENT_IN_PAGE[table_alignment_in_page]
 
+        def align(tbl):
+            table = Table(tbl, None)
+            if table.alignment == alignment:
+                return False
+            table.alignment = alignment
+            profiling.count("tables aligned")
+            return True
 
-def apply_cell_vertical_alignment(meta_file, filename):
+        return Visitor("table_alignment_in_page_pass", table=align)
+    return None
+
+
+def table_alignment_in_page_pass(meta_file, doc):
     """
     :param dict meta_file:
-    :param str filename:
-    :return:
+    :param docx.Document doc:
+    :return bool: True when the document has been changed
     """
+    return run_visitors(meta_file, doc, [table_alignment_in_page_visitor]) != []
+
+
+def cell_vertical_alignment_visitor(meta_file, doc):
+    """
+    :param dict meta_file:
+    :param docx.Document doc:
+    :return Visitor: or None when meta_file does not ask for it
+    """
+    from docx.table import _Cell
+    from docx_coreprop_writer.blocks import Visitor
+
+    load_enums()
+
     _message = "Each table cell has vertically {} aligned"
     _key = "table-cell-vertical-alignment"
 
     cell_vertical_alignment = meta_file.get(_key)
 
     if cell_vertical_alignment is not None:
-        doc = docx.Document(filename)  # type:docx.Document
         cell_vertical_alignment = cell_vertical_alignment.lower()
         print(_message.format(cell_vertical_alignment), file=sys.stderr)
-        table: Table
-        for table in doc.tables:
-            for row in table.rows:
-                for cell in row.cells:
-                    cell.vertical_alignment = CELL_VERTICAL_ALIGMENT[cell_vertical_alignment]
-        doc.save(filename)
+        vertical_alignment = CELL_VERTICAL_ALIGMENT[cell_vertical_alignment]
 
+        def align(tc):
+            profiling.count("cells scanned")
+            cell = _Cell(tc, None)
+            if cell.vertical_alignment == vertical_alignment:
+                return False
+            cell.vertical_alignment = vertical_alignment
+            profiling.count("cells aligned")
+            return True
 
-def unset_word2010_compatibility_mode(meta_file, filename):
+        return Visitor("cell_vertical_alignment_pass", cell=align)
+    return None
+
+
+def cell_vertical_alignment_pass(meta_file, doc):
     """
     :param dict meta_file:
-    :param str filename:
-    :return:
+    :param docx.Document doc:
+    :return bool: True when the document has been changed
     """
+    return run_visitors(meta_file, doc, [cell_vertical_alignment_visitor]) != []
+
+
+def same_element(a, b):
+    """ :return bool: True when both lxml elements have the same tag, attributes, text and children
+
+    Namespace declarations are ignored; they depend on where the element sits in its tree.
+    """
+    if (a.tag, dict(a.attrib), a.text or "") != (b.tag, dict(b.attrib), b.text or "") or len(a) != len(b):
+        return False
+    return all(same_element(x, y) for x, y in zip(a, b))
+
+
+def word2010_compatibility_pass(meta_file, doc):
+    """
+    :param dict meta_file:
+    :param docx.Document doc:
+    :return bool: True when the document has been changed
+    """
+    from docx_coreprop_writer.templates import compat_template, fragment
+
     _message = "Drop Word 2010 compatibility mode"
     _key = "word2010compatible"
     w_compat = "w:compat"
-    subelements = [
-        ("w:useFELayout", {}),
-        ("w:compatSetting", {qn("w:name"): "compatibilityMode",
-                             qn("w:url"): "http://schemas.microsoft.com/office/word",
-                             qn("w:val"): "15"
-                             },
-         ),
-        ("w:compatSetting", {qn("w:name"): "overrideTableStyleFontSizeAndJustification",
-                             qn("w:url"): "http://schemas.microsoft.com/office/word",
-                             qn("w:val"): "1",
-                             },
-         ),
-        ("w:compatSetting", {qn("w:name"): "enableOpenTypeFeatures",
-                             qn("w:url"): "http://schemas.microsoft.com/office/word",
-                             qn("w:val"): "1"
-                             },
-         ),
-        ("w:compatSetting", {qn("w:name"): "doNotFlipMirrorIndents",
-                             qn("w:url"): "http://schemas.microsoft.com/office/word",
-                             qn("w:val"): "1",
-                             },
-         ),
-        ("w:compatSetting", {qn("w:name"): "differentiateMultirowTableHeaders",
-                             qn("w:url"): "http://schemas.microsoft.com/office/word",
-                             qn("w:val"): "1",
-                             },
-         ),
-        ("w:compatSetting", {qn("w:name"): "useWord2013TrackBottomHyphenation",
-                             qn("w:url"): "http://schemas.microsoft.com/office/word",
-                             qn("w:val"): "0",
-                             },
-         ),
-    ]
 
     word2010compatible = meta_file.get(_key, False)
 
     if word2010compatible is False:
         print(_message, file=sys.stderr)
-        doc = docx.Document(filename)  # type:docx.Document
-        doc.settings.element.remove_all(w_compat)
+        compat = compat_template()
 
-        compat = OxmlElement(w_compat)
-        for sub_elem in subelements:
-            subelement = OxmlElement(sub_elem[0], attrs=sub_elem[1])
-            compat.append(subelement)
-        doc.settings.element.append(compat)
-        doc.save(filename)
+        current = doc.settings.element.xpath(w_compat)
+        if len(current) == 1 and same_element(current[0], compat):
+            return False
+        doc.settings.element.remove_all(w_compat)
+        doc.settings.element.append(fragment(compat))
+        return True
+    return False
 
 
-def disable_table_autofit(meta_file, filename):
+def table_autofit_visitor(meta_file, doc):
     """
     :param dict meta_file:
-    :param str filename:
-    :return:
+    :param docx.Document doc:
+    :return Visitor: or None when meta_file does not ask for it
     """
+    from docx.table import Table
+    from docx_coreprop_writer.blocks import Visitor
+
     _message = "Fix table column widths"
     _key = "disable-table-autofit"
 
     disable_table_autofit_meta = meta_file.get(_key, False)
 
     if disable_table_autofit_meta is True:
-        doc = docx.Document(filename)  # type:docx.Document
         print(_message, file=sys.stderr)
-        table: Table
-        for table in doc.tables:
+
+        def fix(tbl):
+            table = Table(tbl, None)
+            if table.autofit is False:
+                return False
             table.autofit = False
-        doc.save(filename)
+            profiling.count("tables fixed")
+            return True
 
+        return Visitor("table_autofit_pass", table=fix)
+    return None
 
-def recommend_readonly(meta_file, filename):
+
+def table_autofit_pass(meta_file, doc):
     """
     :param dict meta_file:
-    :param str filename:
-    :return:
+    :param docx.Document doc:
+    :return bool: True when the document has been changed
+    """
+    return run_visitors(meta_file, doc, [table_autofit_visitor]) != []
+
+
+def readonly_recommended_pass(meta_file, doc):
     """
+    :param dict meta_file:
+    :param docx.Document doc:
+    :return bool: True when the document has been changed
+    """
+    from docx.oxml import OxmlElement
+    from docx.oxml.ns import qn
+
     _message = "Set read only recommend flag"
     _key = "read-only-recommended"
     elem_name = "w:writeProtection"
@@ -331,25 +436,109 @@ def recommend_readonly(meta_file, filename):
 
     if read_only is True:
         print(_message, file=sys.stderr)
-        doc = docx.Document(filename)  # type:docx.Document
         write_protection = doc.settings.element.xpath(elem_name)
         if write_protection == []:
             write_protection = OxmlElement(elem_name, attrs={attr_name: "1"})
             doc.settings.element.append(write_protection)
         else:
             write_protection = write_protection[0]
-            if write_protection.get(attr_name, None) is None:
-                write_protection.set(attr_name, "1")
+            if write_protection.get(attr_name, None) is not None:
+                return False
+            write_protection.set(attr_name, "1")
 
-        doc.save(filename)
+        return True
+    return False
 
 
-def replace_table_style(meta_file, filename):
+class StyleReplacer:
+    """ Replaces element styles using style ID index built once
+
+    :param docx.styles.styles.Styles styles:
+    :param dict mapping: source style name -> target style name
+    :param WD_STYLE_TYPE style_type:
+    :param str attr: element property holding style ID; "style" or "tblStyle_val"
+
+    Elements without (or with unknown) style ID have the default style of style_type,
+    same as `.style.name` of python-docx proxies. Target style is resolved at its first hit.
+    """
+
+    def __init__(self, styles, mapping, style_type, attr="style"):
+        from docx.enum.style import WD_STYLE_TYPE
+
+        nouns = {WD_STYLE_TYPE.PARAGRAPH: "paragraphs", WD_STYLE_TYPE.CHARACTER: "runs", WD_STYLE_TYPE.TABLE: "tables"}
+        self.noun = nouns.get(style_type, "elements")
+        self.scanned = 0
+        self.styles = styles
+        self.mapping = mapping
+        self.style_type = style_type
+        self.attr = attr
+        self.name_by_id = {style.style_id: style.name for style in styles if style.type == style_type}
+        default = styles.default(style_type)
+        self.default_id = default.style_id if default is not None else None
+        self.index = {style_id: name for style_id, name in self.name_by_id.items() if name in mapping}
+        self.targets = {}
+        self.counts = {}
+
+    def replace(self, element):
+        """
+        :param element: CT_P, CT_R or CT_Tbl
+        :return bool: True when style of element has been replaced
+        """
+        self.scanned += 1
+        current = getattr(element, self.attr)
+        style_id = current if current in self.name_by_id else self.default_id
+        name = self.index.get(style_id)
+        if name is None:
+            return False
+        if name not in self.targets:
+            self.targets[name] = self.styles.get_style_id(self.styles[self.mapping[name]], self.style_type)
+        if current == self.targets[name]:
+            return False
+        setattr(element, self.attr, self.targets[name])
+        self.counts[name] = self.counts.get(name, 0) + 1
+        return True
+
+    def record(self):
+        """ Reports scanned and restyled element counts to the stage being profiled """
+        profiling.count(self.noun + " scanned", self.scanned)
+        profiling.count(self.noun + " restyled", sum(self.counts.values()))
+
+
+def style_visitor(name, replacer, kind):
+    """ Wraps StyleReplacer as visitor of one element kind
+
+    :param str name: name of the pass
+    :param StyleReplacer replacer:
+    :param str kind: "paragraph", "run" or "table"
+    :return Visitor:
+    """
+    from docx_coreprop_writer.blocks import Visitor
+
+    def finish():
+        replacer.record()
+        print_style_counts(replacer.mapping, replacer.counts)
+
+    handler = replacer.replace if replacer.index != {} else None  # no source style defined; nothing to visit
+    return Visitor(name, finish=finish, **{kind: handler})
+
+
+def print_style_counts(mapping, counts):
+    """
+    :param dict mapping: source style name -> target style name
+    :param dict counts: source style name -> number of replaced elements
+    """
+    for key, count in counts.items():
+        print("{} -> {} ({})".format(key, mapping[key], count), file=sys.stderr)
+
+
+def table_style_visitor(meta_file, doc):
     """
     :param dict meta_file:
-    :param str filename:
-    :return:
+    :param docx.Document doc:
+    :return Visitor: or None when meta_file does not ask for it
     """
+    from docx.enum.style import WD_STYLE_TYPE
+
     _message = "Replace table styles"
     _key = "table"
 
@@ -357,22 +546,28 @@ def replace_table_style(meta_file, filename):
 
     if table is not None:
         print(_message, file=sys.stderr)
+        replacer = StyleReplacer(doc.styles, table, WD_STYLE_TYPE.TABLE, attr="tblStyle_val")
+        return style_visitor("table_style_pass", replacer, "table")
+    return None
 
-        doc = docx.Document(filename)  # type:docx.Document
-        for key, val in table.items():
-            for table in doc.tables:
-                if table.style.name == key:
-                    print("{} -> {}".format(key, val), file=sys.stderr)
-                    table.style = doc.styles[val]
-        doc.save(filename)
 
+def table_style_pass(meta_file, doc):
+    """
+    :param dict meta_file:
+    :param docx.Document doc:
+    :return bool: True when the document has been changed
+    """
+    return run_visitors(meta_file, doc, [table_style_visitor]) != []
 
-def replace_paragraph_style(meta_file, filename):
+
+def paragraph_style_visitor(meta_file, doc):
     """
     :param dict meta_file:
-    :param str filename:
-    :return:
+    :param docx.Document doc:
+    :return Visitor: or None when meta_file does not ask for it
     """
+    from docx.enum.style import WD_STYLE_TYPE
+
     _message = "Replace paragraph styles"
     _key = "paragraph"
 
@@ -380,23 +575,28 @@ def replace_paragraph_style(meta_file, filename):
 
     if para is not None:
         print(_message, file=sys.stderr)
+        replacer = StyleReplacer(doc.styles, para, WD_STYLE_TYPE.PARAGRAPH)
+        return style_visitor("paragraph_style_pass", replacer, "paragraph")
+    return None
 
-        doc = docx.Document(filename)  # type:docx.Document
-        for key, val in para.items():
-            for para in doc.paragraphs:
-                if para.style.name == key:
-                    print("{} -> {}".format(key, val), file=sys.stderr)
-                    para.style = doc.styles[val]
 
-        doc.save(filename)
+def paragraph_style_pass(meta_file, doc):
+    """
+    :param dict meta_file:
+    :param docx.Document doc:
+    :return bool: True when the document has been changed
+    """
+    return run_visitors(meta_file, doc, [paragraph_style_visitor]) != []
 
 
-def replace_character_style(meta_file, filename):
+def character_style_visitor(meta_file, doc):
     """
     :param dict meta_file:
-    :param str filename:
-    :return:
+    :param docx.Document doc:
+    :return Visitor: or None when meta_file does not ask for it
     """
+    from docx.enum.style import WD_STYLE_TYPE
+
     _message = "Replace character styles"
     _key = "character"
 
@@ -404,25 +604,53 @@ def replace_character_style(meta_file, filename):
 
     if char is not None:
         print(_message, file=sys.stderr)
-        doc = docx.Document(filename)  # type:docx.Document
-        for key, val in char.items():
-            para: Paragraph
-            for para in doc.paragraphs:
-                run: Run
-                for run in para.runs:
-                    if run.style.name == key:
-                        print("{} -> {}".format(key, val), file=sys.stderr)
-                        run.style = doc.styles[val]
+        replacer = StyleReplacer(doc.styles, char, WD_STYLE_TYPE.CHARACTER)
+        return style_visitor("character_style_pass", replacer, "run")
+    return None
 
-        doc.save(filename)
 
+def character_style_pass(meta_file, doc):
+    """
+    :param dict meta_file:
+    :param docx.Document doc:
+    :return bool: True when the document has been changed
+    """
+    return run_visitors(meta_file, doc, [character_style_visitor]) != []
 
-def insert_extra_section(meta_file, filename):
+
+def sentinel_section(doc):
+    """ doc.sections[-1] found without searching the whole body
+
+    :param docx.Document doc:
+    :return docx.section.Section:
+    """
+    from docx.section import Section
+
+    sectPr = doc.element.body.sectPr
+    return Section(sectPr, doc.part) if sectPr is not None else doc.sections[-1]
+
+
+def block_width(section):
+    """ Width between the margins of section, as Document._block_width computes it for the last section
+
+    :param docx.section.Section section:
+    :return docx.shared.Length:
+    """
+    from docx.shared import Emu, Inches
+
+    return Emu((section.page_width or Inches(8.5)) - (section.left_margin or Inches(1)) -
+               (section.right_margin or Inches(1)))
+
+
+def extra_section_pass(meta_file, doc):
     """
     :param dict meta_file:
-    :param str filename:
-    :return:
+    :param docx.Document doc:
+    :return bool: True when the document has been changed
     """
+    from docx.enum.section import WD_SECTION
+    from docx.section import Section
+
     _message = "Insert extra section (clears Header/Footer content)"
     _key = "extra_section"
 
@@ -430,10 +658,12 @@ def insert_extra_section(meta_file, filename):
 
     if char is True:
         print(_message, file=sys.stderr)
-        doc: docx.Document = docx.Document(filename)
 
-        last_section: Section = doc.sections[-1]
-        extra_section: Section = doc.add_section(WD_SECTION.NEW_PAGE)
+        last_section: Section = sentinel_section(doc)
+        # same as doc.add_section(), without searching the whole body for sections
+        extra_sectPr = doc.element.body.add_section_break()
+        extra_sectPr.start_type = WD_SECTION.NEW_PAGE
+        extra_section: Section = Section(extra_sectPr, doc.part)
 
         extra_section.orientation = last_section.orientation
 
@@ -453,15 +683,22 @@ def insert_extra_section(meta_file, filename):
         extra_section.even_page_header.is_linked_to_previous = False
         extra_section.even_page_footer.is_linked_to_previous = False
 
-        doc.save(filename)
+        profiling.count("sections added")
+        return True
+    return False
 
 
-def insert_okuzuke_table(meta_file, filename):
+def okuzuke_table_pass(meta_file, doc):
     """
     :param dict meta_file:
-    :param str filename:
-    :return:
+    :param docx.Document doc:
+    :return bool: True when the document has been changed
     """
+    from docx.enum.style import WD_STYLE_TYPE
+    from docx.oxml import OxmlElement
+    from docx.oxml.ns import qn
+    from docx_coreprop_writer.templates import fragment, okuzuke_template
+
     _message = "Insert Okuzuke table"
     _key = "okuzuke"
 
@@ -469,57 +706,665 @@ def insert_okuzuke_table(meta_file, filename):
 
     if okuzuke is not None:
         print(_message, file=sys.stderr)
-        doc: docx.Document = docx.Document(filename)
-        last_section: Section = doc.sections[-1]
+        last_section: Section = sentinel_section(doc)
 
         vAlign = OxmlElement("w:vAlign", attrs={qn("w:val"): "bottom"})
         last_section._sectPr.append(vAlign)
 
         doc.add_page_break()
 
-        table: Table = doc.add_table(rows=0, cols=1, style=okuzuke.get("table-style", "Normal Table"))
-        table.alignment = TABLE_ALIGNMENT_IN_PAGE["center"]
-        for row_text in okuzuke.get("rows", []):
-            row = table.add_row()
-            row.cells[0].text = row_text.strip()
-            row.cells[0].paragraphs[0].style = okuzuke.get("para-style", "Table Body Left")
+        # resolved once per document instead of once per row
+        rows = tuple(okuzuke.get("rows", []))
+        table_style_id = doc.part.get_style_id(okuzuke.get("table-style", "Normal Table"), WD_STYLE_TYPE.TABLE)
+        para_style_id = doc.part.get_style_id(okuzuke.get("para-style", "Table Body Left"), WD_STYLE_TYPE.PARAGRAPH)
+        template = okuzuke_template(rows, block_width(last_section), table_style_id, para_style_id)
+        doc.element.body._insert_tbl(fragment(template))
 
         doc.add_page_break()
         doc.add_page_break()
 
-        doc.save(filename)
+        profiling.count("rows added", len(rows))
+        return True
+    return False
 
 
-def main():
+PASSES = [word2010_compatibility_pass,
+          core_properties_pass,
+          paragraph_style_pass,
+          table_style_pass,
+          character_style_pass,
+          table_alignment_in_page_pass,
+          cell_vertical_alignment_pass,
+          table_autofit_pass,
+          extra_section_pass,  # adds one empty paragraph only; placed after the walk so it stays unstyled as before
+          readonly_recommended_pass,
+          okuzuke_table_pass,
+          ]
+
+# Passes touching word/settings.xml alone
+SETTINGS_PASSES = [word2010_compatibility_pass, readonly_recommended_pass]
+
+# Passes which run at ZIP level on core properties and settings parts, without python-docx loading the package
+FAST_PASSES = [word2010_compatibility_pass, core_properties_pass, readonly_recommended_pass]
+
+# Passes implemented as visitors; consecutive ones in a pass list share one walk of the document
+VISITORS = {paragraph_style_pass: paragraph_style_visitor,
+            table_style_pass: table_style_visitor,
+            character_style_pass: character_style_visitor,
+            table_alignment_in_page_pass: table_alignment_in_page_visitor,
+            cell_vertical_alignment_pass: cell_vertical_alignment_visitor,
+            table_autofit_pass: table_autofit_visitor,
+            }
+
+
+def run_visitors(meta_file, doc, factories):
+    """ Runs visitors built by factories in one walk over body, tables, headers, footers and notes
+
+    :param dict meta_file:
+    :param docx.Document doc:
+    :param list factories: functions taking (meta_file, doc) and returning Visitor or None
+    :return list changed: names of the passes whose visitors have changed the document
+    """
+    from docx_coreprop_writer.blocks import walk_document
+
+    visitors = [visitor for visitor in (factory(meta_file, doc) for factory in factories) if visitor is not None]
+    if visitors == []:
+        return []
+    walk_document(doc, visitors)
+    return [visitor.name for visitor in visitors if visitor.changed]
+
+
+def run_passes(meta_file, doc, passes=None, profiler=None):
+    """ Runs each pass in order on one in-memory document
+
+    Consecutive passes found in VISITORS run together in one walk,
+    recorded as a single "walk" stage by profiler.
+
+    :param dict meta_file: metadata or MetadataPlan
+    :param docx.Document doc:
+    :param list passes: pass functions to run; defaults to the passes meta_file needs
+    :param profiling.Profiler profiler: records one stage per pass; None to disable
+    :return list changed: names of the passes which have changed the document
+    """
+    from docx_coreprop_writer.plan import compile_metadata
+
+    meta_file = compile_metadata(meta_file)
+    if passes is None:
+        passes = list(meta_file.passes)
+    changed = []
+    group = []
+    for pass_func in passes + [None]:
+        if pass_func in VISITORS:
+            group.append(VISITORS[pass_func])
+            continue
+        if group != []:
+            with profiling.stage(profiler, "walk"):
+                changed.extend(run_visitors(meta_file, doc, group))
+            group = []
+        if pass_func is None:
+            break
+        with profiling.stage(profiler, pass_func.__name__):
+            if pass_func(meta_file, doc):
+                changed.append(pass_func.__name__)
+    return changed
+
+
+def package_members(doc):
+    """ ZIP members python-docx would write on doc.save(), in the same order
+
+    :param docx.Document doc:
+    :return dict: member name -> bytes
+    """
+    from docx.opc.packuri import CONTENT_TYPES_URI, PACKAGE_URI
+
+    try:
+        from docx.opc.pkgwriter import _ContentTypesItem  # private to python-docx (0.8.7 to 1.2 have it)
+    except ImportError:
+        return saved_members(doc)
+    package = doc.part.package
+    parts = list(package.iter_parts())
+    for part in parts:
+        part.before_marshal()
+    members = {CONTENT_TYPES_URI.membername: _ContentTypesItem.from_parts(parts).blob,
+               PACKAGE_URI.rels_uri.membername: package.rels.xml}
+    for part in parts:
+        members[part.partname.membername] = part.blob
+        if len(part.rels):
+            members[part.partname.rels_uri.membername] = part.rels.xml
+    return members
+
+
+def saved_members(doc):
+    """ ZIP members of doc.save() into memory; fallback of package_members()
+
+    :param docx.Document doc:
+    :return dict: member name -> bytes
+    """
+    import io
+    import zipfile
+
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    with zipfile.ZipFile(buffer) as zf:
+        return {info.filename: zf.read(info) for info in zf.infolist()}
+
+
+def save_document(doc, filename, out_filename=None, compresslevel=None, fsync=False, stamp=None):
+    """ Same result as doc.save() but only new or changed members are compressed again
+    Every other member, media above all, is copied from filename without recompression
+
+    :param docx.Document doc: loaded from filename
+    :param str filename: source DOCX
+    :param str out_filename: defaults to filename (in-place)
+    :param int compresslevel: deflate level (0-9) of new or changed members; None for zlib default
+    :param bool fsync: flush the result to disk before it replaces out_filename
+    :param str stamp: fingerprint to record in the custom properties (see stamp.py); None to leave them alone
+    :return list: names of members which have been written anew
+    """
+    from docx_coreprop_writer import zipio
+
+    members = package_members(doc)
+    if stamp is not None:
+        from docx_coreprop_writer.stamp import stamp_parts
+        members.update(stamp_parts(members.get, stamp))
+    written = zipio.write_package(filename, members, out_filename, compresslevel, fsync)
+    profiling.count("members written", len(written))
+    return written
+
+
+def process_document(meta_file, filename, passes=None, write=True, profiler=None, compresslevel=None, fsync=False,
+                     out_filename=None, stamp=None):
+    """ Loads filename once, runs every pass on it and saves once
+    File is left untouched when no pass has changed anything
+
+    :param dict meta_file: metadata or MetadataPlan
+    :param str filename: or a seekable binary file object
+    :param list passes: pass functions to run; defaults to the passes meta_file needs
+    :param bool write: False to only report what would change
+    :param profiling.Profiler profiler: records load, each pass and save; None to disable
+    :param int compresslevel: deflate level of changed parts; None for zlib default
+    :param bool fsync: flush the saved document to disk before it replaces filename
+    :param str out_filename: destination, or a binary file object; defaults to filename (in-place)
+    :param str stamp: fingerprint to record in the custom properties (see stamp.py); the document is
+        then written even when no pass has changed it. None to leave them alone
+    :return list changed: names of the passes which have changed (or would change) the document
+
+    Without passes, skips those which cannot change filename (see planner.planned_passes()),
+    and takes ZIP level fast path when only core properties and settings are going to change.
+    """
+    import docx
+    from docx_coreprop_writer.plan import compile_metadata
+    from docx_coreprop_writer.planner import planned_passes
+
+    meta_file = compile_metadata(meta_file)
+    if passes is None:
+        passes = planned_passes(meta_file, filename, profiler)
+        if all(pass_func in FAST_PASSES for pass_func in passes):
+            return apply_parts_fast(meta_file, filename, passes, write, profiler, compresslevel, fsync, out_filename,
+                                    stamp)
+
+    with profiling.stage(profiler, "load"):
+        doc = docx.Document(filename)  # type:docx.Document
+        profiling.count("parts", sum(1 for _ in doc.part.package.iter_parts()))
+    changed = run_passes(meta_file, doc, passes, profiler)
+    if stamp is not None:
+        changed.append(STAMP_NAME)
+    if write and changed != []:
+        with profiling.stage(profiler, "save"):
+            save_document(doc, filename, out_filename, compresslevel, fsync, stamp)
+    return changed
+
+
+def process_data(meta_file, data, write=True, profiler=None, compresslevel=None, stream=False, stamp=None):
+    """ In-memory process_document(): DOCX bytes in, DOCX bytes out, no temporary files
+
+    :param dict meta_file: metadata or MetadataPlan
+    :param data: DOCX as bytes-like object, or a seekable binary file object
+    :param bool write: False to only report what would change
+    :param profiling.Profiler profiler: records load, each pass and save; None to disable
+    :param int compresslevel: deflate level of changed parts; None for zlib default
+    :param bool stream: use the streaming engine
+    :param str stamp: fingerprint to record in the custom properties (see stamp.py); None to leave them alone
+    :return tuple: (DOCX bytes, changed); data itself (read out of a file object) when nothing has changed
+    """
+    import io
+
+    src = data if hasattr(data, "read") else io.BytesIO(data)
+    dst = io.BytesIO()
+    if stream:
+        from docx_coreprop_writer.stream import stream_document
+        changed = stream_document(meta_file, src, dst, write, profiler, compresslevel, stamp=stamp)
+    else:
+        changed = process_document(meta_file, src, write=write, profiler=profiler, compresslevel=compresslevel,
+                                   out_filename=dst, stamp=stamp)
+    if write and changed != []:
+        return dst.getvalue(), changed
+    if hasattr(data, "read"):
+        src.seek(0)
+        return src.read(), changed
+    return data, changed
+
+
+def apply_pass(pass_func, meta_file, filename, write=True):
+    """ Runs single pass on filename; saves only when the pass has changed the document
+
+    :param pass_func:
+    :param dict meta_file:
+    :param str filename:
+    :param bool write: False to only report whether it would change
+    :return bool: True when the document has been changed
+    """
+    import docx
+    from docx_coreprop_writer.plan import compile_metadata
+
+    meta_file = compile_metadata(meta_file)
+    doc = docx.Document(filename)  # type:docx.Document
+    changed = pass_func(meta_file, doc)
+    if write and changed:
+        save_document(doc, filename)
+    return changed
+
+
+def apply_core_properties(meta_file, filename):
+    """ Overwrite DOCX core property from meta_file or meta_ext dictionaries
+    When both dict has value for each for same key, meta_ext has priority
+
+    :param dict meta_file:
+    :param str filename:
+    :return bool: True when the document has been changed
+    """
+    return apply_pass(core_properties_pass, meta_file, filename)
+
+
+def apply_parts_fast(meta_file, filename, passes, write=True, profiler=None, compresslevel=None, fsync=False,
+                     out_filename=None, stamp=None):
+    """ Runs passes of FAST_PASSES on core properties and settings parts alone
+    Only the parts which have changed are rewritten in ZIP; other members are copied
+    byte for byte, and neither the document body nor media is ever parsed or loaded
+
+    :param dict meta_file: metadata or MetadataPlan
+    :param str filename: or a seekable binary file object
+    :param list passes: pass functions, each one of FAST_PASSES
+    :param bool write: False to only report what would change
+    :param profiling.Profiler profiler: records load, each pass and save; None to disable
+    :param int compresslevel: deflate level of rewritten parts; None for zlib default
+    :param bool fsync: flush the result to disk before it replaces filename
+    :param str out_filename: destination, or a binary file object; defaults to filename (in-place)
+    :param str stamp: fingerprint to record in the custom properties (see stamp.py); None to leave them alone
+    :return list changed: names of the passes which have changed (or would change) the document
+    """
+    from docx.opc.oxml import serialize_part_xml
+    from docx.oxml import parse_xml
+    from docx_coreprop_writer import zipio
+    from docx_coreprop_writer.plan import compile_metadata
+    from docx_coreprop_writer.stream import PartialDocument
+
+    meta_file = compile_metadata(meta_file)
+    needs_core = core_properties_pass in passes
+    needs_settings = any(pass_func in SETTINGS_PASSES for pass_func in passes)
+    with profiling.stage(profiler, "load"):
+        core_partname, core = zipio.read_core_properties(filename) if needs_core else (None, None)
+        settings_partname, settings = zipio.read_settings(filename) if needs_settings else (None, None)
+    if (needs_core and core is None) or (needs_settings and settings is None):
+        # python-docx creates default parts; let it do so
+        return process_document(meta_file, filename, passes, write, profiler, compresslevel, fsync, out_filename,
+                                stamp)
+
+    core = parse_xml(core) if core is not None else None
+    settings = parse_xml(settings) if settings is not None else None
+    partial = PartialDocument(settings=settings, core=core)
+    changed = []
+    for pass_func in passes:
+        with profiling.stage(profiler, pass_func.__name__):
+            if pass_func(meta_file, partial):
+                changed.append(pass_func.__name__)
+    if stamp is not None:
+        changed.append(STAMP_NAME)
+    if write and changed != []:
+        parts = {}
+        if core_properties_pass.__name__ in changed:
+            parts[core_partname] = serialize_part_xml(core)
+        if any(pass_func.__name__ in changed for pass_func in SETTINGS_PASSES):
+            parts[settings_partname] = serialize_part_xml(settings)
+        if stamp is not None:
+            from docx_coreprop_writer.stamp import read_member, stamp_parts
+            parts.update(stamp_parts(read_member(filename, parts), stamp))
+        with profiling.stage(profiler, "save"):
+            zipio.rewrite_parts(filename, parts, out_filename, compresslevel, fsync=fsync)
+    return changed
+
+
+def apply_core_properties_fast(meta_file, filename, write=True, profiler=None, compresslevel=None, fsync=False,
+                               out_filename=None):
+    """ Same as apply_core_properties but rewrites only core properties part in ZIP
+    Other members are copied byte for byte; document body is never parsed
+
+    :param dict meta_file:
+    :param str filename:
+    :param bool write: False to only report whether it would change
+    :param profiling.Profiler profiler: records load, core_properties_pass and save; None to disable
+    :param int compresslevel: deflate level of core properties part; None for zlib default
+    :param bool fsync: flush the result to disk before it replaces filename
+    :param str out_filename: destination, or a binary file object; defaults to filename (in-place)
+    :return bool: True when the document has been changed
+    """
+    return apply_parts_fast(meta_file, filename, [core_properties_pass], write, profiler, compresslevel, fsync,
+                            out_filename) != []
+
+
+def apply_settings_fast(meta_file, filename, write=True, profiler=None, compresslevel=None, fsync=False,
+                        out_filename=None):
+    """ Same as unset_word2010_compatibility_mode and recommend_readonly together,
+    but rewrites only settings part in ZIP (w:compat and w:writeProtection)
+
+    :param dict meta_file:
+    :param str filename:
+    :param bool write: False to only report whether it would change
+    :param profiling.Profiler profiler: records load, each settings pass and save; None to disable
+    :param int compresslevel: deflate level of settings part; None for zlib default
+    :param bool fsync: flush the result to disk before it replaces filename
+    :param str out_filename: destination, or a binary file object; defaults to filename (in-place)
+    :return bool: True when the document has been changed
+    """
+    return apply_parts_fast(meta_file, filename, SETTINGS_PASSES, write, profiler, compresslevel, fsync,
+                            out_filename) != []
+
+
+def apply_table_alignment_in_page(meta_file, filename):
+    """
+    :param dict meta_file:
+    :param str filename:
+    :return bool: True when the document has been changed
+    """
+    return apply_pass(table_alignment_in_page_pass, meta_file, filename)
+
+
+def apply_cell_vertical_alignment(meta_file, filename):
+    """
+    :param dict meta_file:
+    :param str filename:
+    :return bool: True when the document has been changed
+    """
+    return apply_pass(cell_vertical_alignment_pass, meta_file, filename)
+
+
+def unset_word2010_compatibility_mode(meta_file, filename):
+    """
+    :param dict meta_file:
+    :param str filename:
+    :return bool: True when the document has been changed
+    """
+    return apply_parts_fast(meta_file, filename, [word2010_compatibility_pass]) != []
+
+
+def disable_table_autofit(meta_file, filename):
+    """
+    :param dict meta_file:
+    :param str filename:
+    :return bool: True when the document has been changed
+    """
+    return apply_pass(table_autofit_pass, meta_file, filename)
+
+
+def recommend_readonly(meta_file, filename):
+    """
+    :param dict meta_file:
+    :param str filename:
+    :return bool: True when the document has been changed
+    """
+    return apply_parts_fast(meta_file, filename, [readonly_recommended_pass]) != []
+
+
+def replace_table_style(meta_file, filename):
+    """
+    :param dict meta_file:
+    :param str filename:
+    :return bool: True when the document has been changed
+    """
+    return apply_pass(table_style_pass, meta_file, filename)
+
+
+def replace_paragraph_style(meta_file, filename):
+    """
+    :param dict meta_file:
+    :param str filename:
+    :return bool: True when the document has been changed
+    """
+    return apply_pass(paragraph_style_pass, meta_file, filename)
+
+
+def replace_character_style(meta_file, filename):
+    """
+    :param dict meta_file:
+    :param str filename:
+    :return bool: True when the document has been changed
+    """
+    return apply_pass(character_style_pass, meta_file, filename)
+
+
+def insert_extra_section(meta_file, filename):
+    """
+    :param dict meta_file:
+    :param str filename:
+    :return bool: True when the document has been changed
+    """
+    return apply_pass(extra_section_pass, meta_file, filename)
+
+
+def insert_okuzuke_table(meta_file, filename):
+    """
+    :param dict meta_file:
+    :param str filename:
+    :return bool: True when the document has been changed
+    """
+    return apply_pass(okuzuke_table_pass, meta_file, filename)
+
+
+def load_metadata(filename):
+    """ Reads yaml file and returns its META_KEY block
+    With the config cache enabled, unchanged files are read without parsing yaml (see config.py)
+
+    :param str filename: yaml input filename
+    :return dict meta_file: plain dict
+    """
+    from docx_coreprop_writer.config import load_block
+
+    return load_block(filename, META_KEY)
+
+
+def argument_parser():
+    """ Command line arguments shared by main() and the client
+
+    :return argparse.ArgumentParser parser:
+    """
     parser = argparse.ArgumentParser(description="Reads yaml, overwrites DOCX core property")
-    parser.add_argument("--input", "-I", required=True, default=None, help="yaml input filename")
-    parser.add_argument("--output", "-O", required=True, help="docx output filename")
+    parser.add_argument("--input", "-I", default=None, help="yaml input filename")
+    parser.add_argument("--output", "-O", default=None,
+                        help="docx output filename; - reads the docx from stdin and writes the result to stdout")
     parser.add_argument("--metadata", "-M", default={}, action=StoreDict)
     # parser.add_argument("--paragraph", "-P", default=None, action=StoreDict)
     # parser.add_argument("--table", "-T", default=None, action=StoreDict)
+    parser.add_argument("--stream", action="store_true",
+                        help="rewrite document body with incremental parsing to keep memory bounded")
+    parser.add_argument("--check", action="store_true",
+                        help="report whether the document would change, without writing it; exits 1 on drift")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="list the passes which would run and which are skipped, with estimated cost; "
+                             "does not load or write the document")
+    parser.add_argument("--cache", nargs="?", const="", default=None, metavar="DIR",
+                        help="reuse results for identical docx and metadata; DIR defaults to "
+                             "$DOCX_COREPROP_CACHE or ~/.cache/docx-coreprop-writer")
+    parser.add_argument("--stamp", action="store_true",
+                        help="record a fingerprint of the applied metadata in docProps/custom.xml, and skip "
+                             "documents whose fingerprint already matches")
+    parser.add_argument("--cache-size", type=int, default=1024, metavar="MIB",
+                        help="evict least recently used cache entries beyond this size")
+    parser.add_argument("--compress-level", type=int, default=None, choices=range(10), metavar="0-9",
+                        help="deflate level of changed parts; untouched parts are copied without recompression")
+    parser.add_argument("--fsync", action="store_true",
+                        help="flush the document to disk before it replaces the original, to survive a crash")
+    parser.add_argument("--profile", nargs="?", const="text", default=None, choices=profiling.FORMATS,
+                        help="report wall time, CPU time, peak memory growth and element counts "
+                             "of load, each pass and save")
+    parser.add_argument("--profile-output", default=None, metavar="FILE",
+                        help="append profile to FILE instead of stderr")
     parser.add_argument('--version', action='version', version=str(version))
+    return parser
+
+
+def check_required(parser, args):
+    """ --input and --output are required unless another mode is selected """
+    missing = [option for option, value in [("--input/-I", args.input), ("--output/-O", args.output)]
+               if value is None]
+    if missing != []:
+        parser.error("the following arguments are required: {}".format(", ".join(missing)))
 
-    args = parser.parse_args()
 
-    meta_file = Box.from_yaml(filename=args.input).get(META_KEY, Box({}))
+def open_cache(args):
+    """ :return ResultCache: or None unless --cache is given """
+    if args.cache is None:
+        return None
+    from docx_coreprop_writer.cache import ResultCache
+
+    return ResultCache(args.cache or None, args.cache_size * 1024 * 1024)
+
+
+def run_job(args, load=load_metadata, cache=None):
+    """ Processes one document as described by parsed command line arguments
+
+    :param argparse.Namespace args:
+    :param load: yaml loader; returns META_KEY block of given filename
+    :param ResultCache cache: restores results of identical (docx, metadata) pairs; None to disable
+    :return list changed: names of the passes which have changed (or would change) the document
+    """
+    import io
+    from docx_coreprop_writer.plan import compile_metadata
+
+    meta_file = load(args.input)
     doc = args.output
-    meta_ext = Box(args.metadata)
+    meta_ext = args.metadata
     # style_ext = {"paragraph": args.paragraph, "table": args.table, }
-    metadata = meta_file + meta_ext
-
-    unset_word2010_compatibility_mode(metadata, doc)
-    apply_core_properties(metadata, doc)
-    replace_paragraph_style(metadata, doc)
-    insert_extra_section(metadata, doc)
-    replace_table_style(metadata, doc)
-    replace_character_style(metadata, doc)
-    apply_table_alignment_in_page(metadata, doc)
-    apply_cell_vertical_alignment(metadata, doc)
-    disable_table_autofit(metadata, doc)
-    recommend_readonly(metadata, doc)
-    insert_okuzuke_table(metadata, doc)
-
-    print("{} processed".format(doc), file=sys.stderr)
+    metadata = compile_metadata(merge_choice(meta_ext, meta_file))
+
+    source = io.BytesIO(sys.stdin.buffer.read()) if doc == STDIO else doc
+    stream = args.stream
+    if stream:
+        from docx_coreprop_writer.stream import unsupported_keys
+        unsupported = unsupported_keys(metadata)
+        if unsupported != []:
+            print("{}: {} not supported in streaming mode; processing the whole document".format(
+                doc, ", ".join(unsupported)), file=sys.stderr)
+            stream = False
+
+    if args.dry_run:
+        from docx_coreprop_writer.planner import print_dry_run
+        print_dry_run(metadata, source, doc)
+        return []
+
+    write = not args.check
+    profiler = profiling.Profiler(doc) if args.profile is not None else None
+    key = changed = stamp = None
+    if doc == STDIO:
+        cache = None  # keyed by file content on disk
+    if args.stamp:
+        from docx_coreprop_writer.stamp import fingerprint, read_fingerprint
+        with profiling.stage(profiler, "stamp"):
+            stamp = fingerprint(metadata)
+            if read_fingerprint(source) == stamp:
+                changed = []
+                print("{} fingerprint matches".format(doc), file=sys.stderr)
+                if doc == STDIO and write:
+                    sys.stdout.buffer.write(source.getvalue())
+                    sys.stdout.buffer.flush()
+    if changed is None and cache is not None:
+        with profiling.stage(profiler, "cache"):
+            key = cache.key(doc, metadata, "stream" if stream else "document", args.compress_level,
+                            *(["stamp"] if stamp is not None else []))
+            changed = cache.get(key, doc if write else None, args.fsync)
+        if changed is not None:
+            print("{} restored from cache".format(doc), file=sys.stderr)
+    if changed is None and doc == STDIO:
+        data, changed = process_data(metadata, source, write=write, profiler=profiler,
+                                     compresslevel=args.compress_level, stream=stream, stamp=stamp)
+        if write:
+            sys.stdout.buffer.write(data)
+            sys.stdout.buffer.flush()
+    elif changed is None and stream:
+        from docx_coreprop_writer.stream import stream_document
+        changed = stream_document(metadata, doc, write=write, profiler=profiler, compresslevel=args.compress_level,
+                                  fsync=args.fsync, stamp=stamp)
+    elif changed is None:
+        changed = process_document(metadata, doc, write=write, profiler=profiler, compresslevel=args.compress_level,
+                                   fsync=args.fsync, stamp=stamp)
+    if key is not None and write:
+        cache.put(key, doc, changed)
+
+    if args.check:
+        if changed != []:
+            print("{} would change: {}".format(doc, ", ".join(changed)), file=sys.stderr)
+        else:
+            print("{} up to date".format(doc), file=sys.stderr)
+    elif changed != []:
+        print("{} processed".format(doc), file=sys.stderr)
+    elif doc == STDIO:
+        print("{} unchanged, passed through".format(doc), file=sys.stderr)
+    else:
+        print("{} unchanged, not written".format(doc), file=sys.stderr)
+
+    if profiler is not None:
+        if args.profile_output is not None:
+            with open(args.profile_output, "a", encoding="utf-8") as f:
+                profiler.report(args.profile, f)
+        else:
+            profiler.report(args.profile)
+    return changed
+
+
+def main():
+    if sys.argv[1:2] == ["inspect"]:
+        from docx_coreprop_writer.inspection import main as inspect_main
+        inspect_main(sys.argv[2:])
+        return
+
+    parser = argument_parser()
+    parser.add_argument("--serve", nargs="?", const="", default=None, metavar="SOCKET",
+                        help="keep running and accept jobs from docx-coreprop-client on unix socket")
+    parser.add_argument("--watch", nargs="?", const="auto", default=None, choices=["auto", "inotify", "poll"],
+                        help="keep running and reprocess the docx whenever it or the yaml changes")
+
+    args = parser.parse_args()
+
+    if args.serve is not None:
+        from docx_coreprop_writer.server import serve
+        serve(args.serve or None)
+        return
+
+    check_required(parser, args)
+    from docx_coreprop_writer.plan import MetadataError
+
+    if args.watch is not None:
+        if args.output == STDIO:
+            parser.error("--watch needs a docx filename, not -")
+        ignored = [flag for flag, value in [("--check", args.check), ("--dry-run", args.dry_run),
+                                            ("--stream", args.stream), ("--stamp", args.stamp),
+                                            ("--cache", args.cache is not None), ("--profile", args.profile)]
+                   if value]
+        if ignored != []:
+            parser.error("--watch cannot be combined with {}".format(", ".join(ignored)))
+        from docx_coreprop_writer.watch import watch
+        watch(args, args.watch)
+        return
+
+    cache = open_cache(args)
+    try:
+        changed = run_job(args, cache=cache)
+    except MetadataError as e:
+        print("{}: {}".format(args.input, e), file=sys.stderr)
+        sys.exit(2)
+    if cache is not None:
+        cache.print_counts()
+    if args.check and changed != []:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+""" asyncio API: process documents without blocking the event loop
+
+    from docx_coreprop_writer import aio
+
+    changed = await aio.process_document("out/a.docx", metadata)
+
+Load, passes and save of each document run as separate steps in an executor,
+so while one document is being saved the next one is already being read.
+At most `limit` documents are held in memory at a time; further calls wait.
+Cancelling a call takes effect between steps: a document cancelled before its
+save step is left untouched, and a step already running is waited for (it
+cannot be interrupted) before the cancellation propagates.
+"""
+
+import asyncio
+import functools
+import os
+import weakref
+
+from docx_coreprop_writer import (FAST_PASSES, apply_parts_fast, process_document as process_document_sync,
+                                  run_passes, save_document)
+from docx_coreprop_writer.plan import compile_metadata
+from docx_coreprop_writer.planner import planned_passes
+
+DEFAULT_LIMIT = os.cpu_count() or 1
+
+_default_writers = weakref.WeakKeyDictionary()  # event loop -> AsyncWriter
+
+
+def load_document(filename):
+    import docx
+
+    return docx.Document(filename)
+
+
+class AsyncWriter:
+    """ Runs documents through the passes in an executor, with bounded concurrency
+
+    :param int limit: documents processed (and held in memory) at a time; defaults to os.cpu_count()
+    :param concurrent.futures.Executor executor: runs load, passes and save;
+        defaults to a thread pool of `limit` threads, shut down by close().
+        Other than a thread pool (e.g. a process pool), each document runs as one step
+        since a loaded document cannot be handed between processes
+    :param int compresslevel: deflate level of changed parts; None for zlib default
+    :param bool fsync: flush each document to disk before it replaces the original
+    """
+
+    def __init__(self, limit=None, executor=None, compresslevel=None, fsync=False):
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.limit = limit or DEFAULT_LIMIT
+        self.own_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(self.limit, thread_name_prefix="docx-coreprop")
+        self.steps = isinstance(self.executor, ThreadPoolExecutor)
+        self.compresslevel = compresslevel
+        self.fsync = fsync
+        self._slots = None  # created on first use, inside the running loop
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """ Shuts down the executor unless it has been given by the caller """
+        if self.own_executor:
+            self.executor.shutdown(wait=False)
+
+    async def _step(self, func, *args, **kwargs):
+        """ Runs func in the executor; on cancellation waits for it to finish, then re-raises """
+        future = asyncio.get_running_loop().run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            await asyncio.wait([future])  # keeps the slot until the thread lets go of the document
+            raise
+
+    async def process_document(self, filename, metadata, write=True, stream=False):
+        """ Same as docx_coreprop_writer.process_document() (or stream_document() when stream is True)
+
+        :param str filename: DOCX, rewritten in place
+        :param dict metadata: merged metadata or MetadataPlan
+        :param bool write: False to only report what would change
+        :param bool stream: use the streaming engine; runs as one step
+        :return list changed: names of the passes which have changed (or would change) the document
+        :raise MetadataError: before waiting for a slot, when metadata is malformed
+        """
+        plan = compile_metadata(metadata)
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.limit)
+        async with self._slots:
+            if stream:
+                from docx_coreprop_writer.stream import stream_document
+
+                return await self._step(stream_document, plan, filename, write=write,
+                                        compresslevel=self.compresslevel, fsync=self.fsync)
+            if not self.steps:
+                return await self._step(process_document_sync, plan, filename, write=write,
+                                        compresslevel=self.compresslevel, fsync=self.fsync)
+            passes = await self._step(planned_passes, plan, filename)
+            if all(pass_func in FAST_PASSES for pass_func in passes):
+                return await self._step(apply_parts_fast, plan, filename, passes, write,
+                                        compresslevel=self.compresslevel, fsync=self.fsync)
+            doc = await self._step(load_document, filename)
+            changed = await self._step(run_passes, plan, doc, passes)
+            if write and changed != []:
+                await self._step(save_document, doc, filename, compresslevel=self.compresslevel, fsync=self.fsync)
+            return changed
+
+    async def process_many(self, jobs, write=True, stream=False):
+        """ Processes (filename, metadata) pairs concurrently, at most limit at a time
+
+        :param list jobs: list of (filename, metadata) tuples
+        :return list: changed pass names, or the exception raised, per job in job order
+        """
+        return await asyncio.gather(*(self.process_document(filename, metadata, write, stream)
+                                      for filename, metadata in jobs), return_exceptions=True)
+
+
+def default_writer():
+    """ :return AsyncWriter: shared by module level calls in the running event loop """
+    loop = asyncio.get_running_loop()
+    if loop not in _default_writers:
+        _default_writers[loop] = AsyncWriter()
+    return _default_writers[loop]
+
+
+async def process_document(filename, metadata, write=True, stream=False):
+    """ AsyncWriter.process_document() of the default writer; see AsyncWriter for limits """
+    return await default_writer().process_document(filename, metadata, write, stream)
+
+
+async def process_many(jobs, write=True, stream=False):
+    """ AsyncWriter.process_many() of the default writer """
+    return await default_writer().process_many(jobs, write, stream)
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+""" Batch entry point: one yaml, many DOCX files, one interpreter """
+
+import argparse
+import glob
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from docx_coreprop_writer import StoreDict, load_metadata, merge_choice, process_document, zipio
+from docx_coreprop_writer.cache import DEFAULT_SIZE_MIB, ResultCache
+from docx_coreprop_writer.manifest import read_manifest
+from docx_coreprop_writer.plan import MetadataError, compile_metadata, compile_overrides
+from docx_coreprop_writer.stamp import fingerprint, read_fingerprint
+from docx_coreprop_writer.version import version
+
+FSYNC_MODES = ["file", "batch"]
+
+
+def collect_jobs(args):
+    """ Gathers (path, overrides) tuples from positional outputs, globs and manifests
+
+    :param argparse.Namespace args:
+    :return list jobs:
+    """
+    jobs = [(path, {}) for path in args.outputs]
+    for pattern in args.glob:
+        jobs.extend((path, {}) for path in sorted(glob.glob(pattern, recursive=True)))
+    for manifest in args.manifest:
+        jobs.extend(read_manifest(manifest, args.metadata))
+    return jobs
+
+
+def process_job(metadata, filename, cache=None, compresslevel=None, fsync=False, stamp=False):
+    """ Worker side of the pool; never raises
+
+    :param MetadataPlan metadata: compiled metadata
+    :param str filename:
+    :param ResultCache cache: None to disable
+    :param int compresslevel: deflate level of changed parts; None for zlib default
+    :param bool fsync: flush the document to disk before it replaces filename
+    :param bool stamp: skip filename when its fingerprint matches, record it otherwise (see stamp.py)
+    :return tuple: (filename, error message or None, cache hit or None when cache is disabled)
+    """
+    hit = None
+    try:
+        metadata = compile_metadata(metadata)
+        value = None
+        if stamp:
+            value = fingerprint(metadata)
+            if read_fingerprint(filename) == value:
+                return filename, None, hit
+        if cache is not None:
+            key = cache.key(filename, metadata, "document", compresslevel, *(["stamp"] if stamp else []))
+            hit = cache.get(key, filename, fsync) is not None
+        if not hit:
+            changed = process_document(metadata, filename, compresslevel=compresslevel, fsync=fsync, stamp=value)
+            if cache is not None:
+                cache.put(key, filename, changed)
+    except Exception as e:
+        return filename, "{}: {}".format(type(e).__name__, e), hit
+    return filename, None, hit
+
+
+def run_batch(metadata, jobs, workers=None, cache=None, compresslevel=None, fsync=None, stamp=False):
+    """ Fans jobs out across a process pool
+
+    :param dict metadata: merged metadata shared by every job
+    :param list jobs: list of (path, overrides) tuples; overrides win over metadata key by key
+    :param int workers: pool size; defaults to os.cpu_count()
+    :param ResultCache cache: shared by every worker; None to disable
+    :param int compresslevel: deflate level of changed parts; None for zlib default
+    :param str fsync: "file" to flush each document before it is renamed into place,
+        "batch" to flush every document and directory once after all jobs; None to leave it to the OS
+    :param bool stamp: skip documents whose fingerprint matches, record it in the others
+    :return list results: list of (filename, error message or None, cache hit or None) in job order
+    :raise MetadataError: before any job has started, listing every job whose metadata is malformed
+    """
+    shared = compile_metadata(metadata)
+    plans = []
+    errors = []
+    for path, overrides in jobs:
+        try:
+            plans.append(compile_overrides(shared, overrides))
+        except MetadataError as e:
+            errors.append("{}: {}".format(path, e))
+    if errors != []:
+        raise MetadataError("\n".join(errors))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(process_job, plan, path, cache, compresslevel, fsync == "file", stamp)
+                   for plan, (path, _) in zip(plans, jobs)]
+        results = [future.result() for future in futures]
+    if fsync == "batch":
+        zipio.sync_files([filename for filename, error, _ in results if error is None])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reads yaml once, overwrites many DOCX files")
+    parser.add_argument("--input", "-I", default=None,
+                        help="yaml input filename; optional when a yaml manifest has a docx_coreprop block")
+    parser.add_argument("outputs", nargs="*", help="docx output filenames")
+    parser.add_argument("--glob", "-G", default=[], action="append", help="glob pattern of docx files")
+    parser.add_argument("--manifest", "-F", default=[], action="append",
+                        help="manifest file: yaml or csv with per-document overrides, "
+                             "or one docx path plus optional key=value overrides per line")
+    parser.add_argument("--metadata", "-M", default={}, action=StoreDict)
+    parser.add_argument("--workers", "-j", type=int, default=None, help="number of worker processes")
+    parser.add_argument("--cache", nargs="?", const="", default=None, metavar="DIR",
+                        help="reuse results for identical docx and metadata; DIR defaults to "
+                             "$DOCX_COREPROP_CACHE or ~/.cache/docx-coreprop-writer")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_SIZE_MIB, metavar="MIB",
+                        help="evict least recently used cache entries beyond this size")
+    parser.add_argument("--compress-level", type=int, default=None, choices=range(10), metavar="0-9",
+                        help="deflate level of changed parts; untouched parts are copied without recompression")
+    parser.add_argument("--fsync", default=None, choices=FSYNC_MODES,
+                        help="flush to disk each document before it replaces the original (file), "
+                             "or all documents and their directories once at the end (batch)")
+    parser.add_argument("--stamp", action="store_true",
+                        help="record a fingerprint of the applied metadata in docProps/custom.xml, and skip "
+                             "documents whose fingerprint already matches")
+    parser.add_argument('--version', action='version', version=str(version))
+
+    args = parser.parse_args()
+
+    if args.input is None and not any(manifest.lower().endswith((".yaml", ".yml")) for manifest in args.manifest):
+        parser.error("the following arguments are required: --input/-I")
+    try:
+        jobs = collect_jobs(args)
+    except MetadataError as e:
+        print(e, file=sys.stderr)
+        sys.exit(2)
+    if jobs == []:
+        parser.error("no docx files given")
+
+    metadata = merge_choice(args.metadata, load_metadata(args.input) if args.input is not None else {})
+    try:
+        metadata = compile_metadata(metadata)
+    except MetadataError as e:
+        print("{}: {}".format(args.input or "--metadata", e), file=sys.stderr)
+        sys.exit(2)
+    cache = ResultCache(args.cache or None, args.cache_size * 1024 * 1024) if args.cache is not None else None
+    try:
+        results = run_batch(metadata, jobs, args.workers, cache, args.compress_level, args.fsync, args.stamp)
+    except MetadataError as e:  # names the documents
+        print(e, file=sys.stderr)
+        sys.exit(2)
+
+    failed = [(filename, error) for filename, error, _ in results if error is not None]
+    for filename, error, _ in results:
+        if error is None:
+            print("OK     {}".format(filename), file=sys.stderr)
+        else:
+            print("FAILED {} ({})".format(filename, error), file=sys.stderr)
+    print("{} processed, {} failed".format(len(results) - len(failed), len(failed)), file=sys.stderr)
+    if cache is not None:
+        cache.hits = sum(hit is True for _, _, hit in results)
+        cache.misses = sum(hit is False for _, _, hit in results)
+        cache.print_counts()
+
+    if failed != []:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
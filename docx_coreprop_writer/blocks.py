@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+""" One walk over every block-level container of a document
+
+Containers are the body, table cells (nested tables included), content controls,
+headers, footers, footnotes and endnotes. Passes which look at paragraphs, runs,
+tables or cells are expressed as Visitor objects; any number of them share one walk.
+"""
+
+import sys
+
+from docx.opc.constants import CONTENT_TYPE as CT
+from docx.opc.oxml import serialize_part_xml
+from docx.oxml import parse_xml
+from docx.oxml.ns import qn
+
+KINDS = ["paragraph", "run", "table", "cell"]
+STORY_CONTENT_TYPES = [CT.WML_HEADER, CT.WML_FOOTER, CT.WML_FOOTNOTES, CT.WML_ENDNOTES]
+NOTES = [qn("w:footnotes"), qn("w:endnotes")]
+
+W_P = qn("w:p")
+W_TBL = qn("w:tbl")
+W_SDT = qn("w:sdt")
+W_SDT_CONTENT = qn("w:sdtContent")
+W_CUSTOM_XML = qn("w:customXml")
+W_TYPE = qn("w:type")
+
+
+class Visitor:
+    """ Element handlers of one pass
+
+    Each handler takes one element (CT_P, CT_R, CT_Tbl or CT_Tc) and returns True
+    when it has changed it.
+
+    :param str name: name of the pass, reported when anything has changed
+    :param paragraph: handler of each w:p
+    :param run: handler of each w:r directly under w:p
+    :param table: handler of each w:tbl
+    :param cell: handler of each w:tc
+    :param finish: called once after the walk, e.g. to print counts
+    """
+
+    def __init__(self, name, paragraph=None, run=None, table=None, cell=None, finish=None):
+        self.name = name
+        self.handlers = {"paragraph": paragraph, "run": run, "table": table, "cell": cell}
+        self.finish = finish or (lambda: None)
+        self.changed = False
+
+
+class BlockWalker:
+    """ Dispatches elements of block-level containers to visitors
+
+    :param list visitors:
+    """
+
+    def __init__(self, visitors):
+        self.visitors = visitors
+        self.handlers = {kind: [(visitor, visitor.handlers[kind]) for visitor in visitors
+                                if visitor.handlers[kind] is not None]
+                         for kind in KINDS}
+
+    def _visit(self, kind, elem):
+        changed = False
+        for visitor, handler in self.handlers[kind]:
+            if handler(elem):
+                visitor.changed = changed = True
+        return changed
+
+    def block(self, elem):
+        """ Visits one child of a container and everything nested in it
+
+        :return bool: True when anything has changed
+        """
+        changed = False
+        if elem.tag == W_P:
+            changed |= self._visit("paragraph", elem)
+            if self.handlers["run"] != []:
+                for r in elem.r_lst:
+                    changed |= self._visit("run", r)
+        elif elem.tag == W_TBL:
+            changed |= self._visit("table", elem)
+            for tr in elem.tr_lst:
+                for tc in tr.tc_lst:
+                    changed |= self._visit("cell", tc)
+                    changed |= self.container(tc)
+        elif elem.tag == W_SDT:
+            content = elem.find(W_SDT_CONTENT)
+            if content is not None:
+                changed |= self.container(content)
+        elif elem.tag == W_CUSTOM_XML:
+            changed |= self.container(elem)
+        return changed
+
+    def container(self, elem):
+        """ Visits every block-level child of elem
+
+        :return bool: True when anything has changed
+        """
+        changed = False
+        for child in elem:
+            changed |= self.block(child)
+        return changed
+
+    def story(self, root):
+        """ Visits the root element of a story part; w:footnotes/w:endnotes hold one container per note
+
+        Notes with a w:type (separator, continuationSeparator, continuationNotice) are
+        Word's note separators rather than document content and are left alone.
+
+        :return bool: True when anything has changed
+        """
+        if root.tag in NOTES:
+            changed = False
+            for note in root:
+                if note.get(W_TYPE) is None:
+                    changed |= self.container(note)
+            return changed
+        return self.container(root)
+
+
+def story_parts(doc):
+    """ :return list: header, footer, footnotes and endnotes parts of doc, each once """
+    return [part for part in doc.part.package.iter_parts() if part.content_type in STORY_CONTENT_TYPES]
+
+
+def walk_document(doc, visitors):
+    """ Walks the body and every other story of doc once, running all visitors
+
+    Footnotes and endnotes are not loaded as XML by python-docx; they are parsed
+    here and written back only when a visitor has changed them. Part has no public
+    setter for its bytes, so this relies on its private _blob (python-docx 0.8.7 to
+    1.2); without it such parts are left alone, with a note on stderr.
+
+    :param docx.Document doc:
+    :param list visitors:
+    """
+    walker = BlockWalker(visitors)
+    walker.container(doc.element.body)
+    for part in story_parts(doc):
+        if hasattr(part, "element"):
+            walker.story(part.element)
+            continue
+        if not hasattr(part, "_blob"):
+            print("{} skipped: this python-docx cannot write it back".format(part.partname), file=sys.stderr)
+            continue
+        root = parse_xml(part.blob)
+        if walker.story(root):
+            part._blob = serialize_part_xml(root)
+    for visitor in visitors:
+        visitor.finish()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+""" Content-addressed cache of processed DOCX files
+
+An entry is keyed by the hash of the input DOCX bytes, the merged metadata and
+the tool version, so byte-identical inputs processed with the same metadata are
+restored from disk instead of running every pass again. Entries are evicted in
+least recently used order once the cache grows beyond its size limit.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+from docx_coreprop_writer.version import version
+from docx_coreprop_writer.zipio import commit
+
+CACHE_ENV = "DOCX_COREPROP_CACHE"
+DEFAULT_SIZE_MIB = 1024
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def default_cache_dir():
+    """ :return str: $DOCX_COREPROP_CACHE, or docx-coreprop-writer under $XDG_CACHE_HOME (~/.cache) """
+    if os.environ.get(CACHE_ENV):
+        return os.environ[CACHE_ENV]
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "docx-coreprop-writer")
+
+
+def normalize_metadata(metadata):
+    """ :return bytes: metadata serialized independently of key order and of mapping types """
+    if hasattr(metadata, "to_dict"):
+        metadata = metadata.to_dict()
+    return json.dumps(metadata, sort_keys=True, default=str, ensure_ascii=False).encode("utf-8")
+
+
+def _copy_atomic(src, dst, fsync=False):
+    """ Copies src to a temporary file next to dst (the file it links to) and renames it into place """
+    dst = os.path.realpath(dst)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dst), prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f, open(src, "rb") as s:
+            shutil.copyfileobj(s, f, _CHUNK_SIZE)
+        commit(tmp, dst, fsync)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+class ResultCache:
+    """ On-disk cache of processed documents
+
+    Each entry is `<key>.json` holding the names of the passes which changed the
+    document, plus `<key>.docx` holding the result when anything has changed.
+    Access time is recorded as the mtime of the json file.
+
+    :param str directory: defaults to default_cache_dir()
+    :param int max_bytes: total size of entries kept after put()
+    """
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_SIZE_MIB * 1024 * 1024):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, filename, metadata, *extra):
+        """
+        :param str filename: input DOCX
+        :param dict metadata: merged metadata (meta_file + meta_ext)
+        :param extra: anything else the result depends on, e.g. the processing mode
+        :return str: hex digest
+        """
+        digest = hashlib.sha256()
+        with open(filename, "rb") as f:
+            for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        digest.update(b"\0" + normalize_metadata(metadata))
+        digest.update(b"\0" + normalize_metadata([str(version)] + list(extra)))
+        return digest.hexdigest()
+
+    def _path(self, key, ext):
+        return os.path.join(self.directory, key + ext)
+
+    def get(self, key, out_filename=None, fsync=False):
+        """ Looks key up and restores the cached document to out_filename
+
+        :param str key:
+        :param str out_filename: left untouched when the cached result is "no change"; None to only look up
+        :param bool fsync: flush the restored document to disk
+        :return list changed: names of the passes which changed the document, or None on a miss
+        """
+        try:
+            with open(self._path(key, ".json"), encoding="utf-8") as f:
+                changed = json.load(f)["changed"]
+            if out_filename is not None and changed != []:
+                _copy_atomic(self._path(key, ".docx"), out_filename, fsync)
+            os.utime(self._path(key, ".json"))
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return changed
+
+    def put(self, key, filename, changed):
+        """ Stores the processed document and evicts least recently used entries
+
+        :param str key:
+        :param str filename: processed DOCX
+        :param list changed: names of the passes which changed the document
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        if changed != []:
+            _copy_atomic(filename, self._path(key, ".docx"))
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".", suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"changed": changed}, f)
+        os.replace(tmp, self._path(key, ".json"))  # written last; an entry without json is a miss
+        self.evict()
+
+    def evict(self):
+        """ Removes least recently used entries until the cache fits in max_bytes """
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json") or name.startswith("."):
+                continue
+            key = name[:-len(".json")]
+            try:
+                st = os.stat(self._path(key, ".json"))
+                atime, size = st.st_mtime_ns, st.st_size
+                if os.path.exists(self._path(key, ".docx")):
+                    size += os.stat(self._path(key, ".docx")).st_size
+            except OSError:
+                continue  # removed by a concurrent run
+            entries.append((atime, key, size))
+            total += size
+
+        for _, key, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            for ext in [".json", ".docx"]:
+                try:
+                    os.remove(self._path(key, ext))
+                except FileNotFoundError:
+                    pass
+            total -= size
+
+    def print_counts(self):
+        print("cache: {} hits, {} misses".format(self.hits, self.misses), file=sys.stderr)
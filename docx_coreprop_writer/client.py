@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+""" Thin client for `docx-coreprop-writer --serve`
+
+Takes the same arguments as docx-coreprop-writer and hands the job to a running
+server. Falls back to processing in this process when no server is listening.
+"""
+
+import json
+import os
+import socket
+import stat
+import sys
+import tempfile
+
+SOCKET_ENV = "DOCX_COREPROP_SOCKET"
+
+
+def default_socket_path():
+    """ :return str: $DOCX_COREPROP_SOCKET, else a per-user path in $XDG_RUNTIME_DIR or a private temp directory """
+    path = os.environ.get(SOCKET_ENV)
+    if path:
+        return path
+    directory = os.environ.get("XDG_RUNTIME_DIR")
+    if directory:
+        return os.path.join(directory, "docx-coreprop-writer-{}.sock".format(os.getuid()))
+    return os.path.join(tempfile.gettempdir(), "docx-coreprop-writer-{}".format(os.getuid()), "server.sock")
+
+
+def check_socket(socket_path):
+    """ :raises PermissionError: when socket_path is not a socket owned by this user """
+    st = os.lstat(socket_path)
+    if not stat.S_ISSOCK(st.st_mode) or st.st_uid != os.getuid():
+        raise PermissionError("{} is not a socket owned by this user".format(socket_path))
+
+
+def send_job(socket_path, job):
+    """ Sends one job and waits for its result
+
+    :param str socket_path:
+    :param dict job: {"input": str, "output": str, "metadata": dict, "stream": bool, "check": bool,
+                      "dry_run": bool, "stamp": bool, "cache": str or None, "cache_size": int, "profile": str or None,
+                      "profile_output": str or None}
+    :return dict result: {"ok": bool, "log": str, "error": str or None, "changed": list};
+                         "status": exit status, when not 1 for a failed job
+    :raises OSError: when no server is listening, or socket_path is not a socket of this user
+    """
+    check_socket(socket_path)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(job).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as f:
+            line = f.readline()
+    if line == b"":
+        raise ConnectionError("server closed connection without result")
+    return json.loads(line)
+
+
+def main():
+    from docx_coreprop_writer import STDIO, argument_parser, check_required, open_cache, run_job
+    from docx_coreprop_writer.plan import MetadataError
+
+    parser = argument_parser()
+    parser.add_argument("--socket", default=None, help="server socket path; defaults to " + default_socket_path())
+    args = parser.parse_args()
+    check_required(parser, args)
+
+    job = {"input": os.path.abspath(args.input),
+           "output": os.path.abspath(args.output),
+           "metadata": args.metadata,
+           "stream": args.stream,
+           "check": args.check,
+           "dry_run": args.dry_run,
+           "stamp": args.stamp,
+           "cache": os.path.abspath(args.cache) if args.cache else args.cache,
+           "cache_size": args.cache_size,
+           "compress_level": args.compress_level,
+           "fsync": args.fsync,
+           "profile": args.profile,
+           "profile_output": os.path.abspath(args.profile_output) if args.profile_output else None,
+           }
+    result = None
+    if args.output != STDIO:  # stdin and stdout belong to this process
+        try:
+            result = send_job(args.socket or default_socket_path(), job)
+        except OSError:
+            pass
+    if result is None:
+        cache = open_cache(args)
+        try:
+            result = {"ok": True, "error": None, "log": "", "changed": run_job(args, cache=cache)}
+        except MetadataError as e:
+            print("{}: {}".format(args.input, e), file=sys.stderr)
+            sys.exit(2)
+        if cache is not None:
+            cache.print_counts()
+
+    print(result["log"], end="", file=sys.stderr)
+    if not result["ok"]:
+        print(result["error"], file=sys.stderr)
+        sys.exit(result.get("status", 1))
+    if args.check and result["changed"] != []:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+""" Loading yaml configs, with an optional parsed cache
+
+The docx_coreprop block of a config is parsed with the libyaml loader (pure
+Python SafeLoader when PyYAML has been built without it). When
+$DOCX_COREPROP_CONFIG_CACHE is set, the block is also stored as JSON under
+<cache dir>/configs, one entry per config path, valid while mtime, size and
+tool version match, so later runs on an unchanged config never import yaml.
+Entries are plain data (dates tagged), never code; the directory is private
+to the user.
+"""
+
+import datetime
+import hashlib
+import json
+import os
+import tempfile
+
+from docx_coreprop_writer.version import version
+
+CONFIG_CACHE_ENV = "DOCX_COREPROP_CONFIG_CACHE"  # 1 for the default directory, or a directory; unset disables
+CONFIG_DIR = "configs"
+_DATE_TAGS = {"!datetime": datetime.datetime, "!date": datetime.date}  # checked in this order
+
+
+def yaml_loader():
+    """ :return: yaml.CSafeLoader when libyaml is available, else yaml.SafeLoader """
+    import yaml
+
+    return getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def read_yaml(filename):
+    """
+    :param str filename:
+    :return: parsed document as plain dicts and lists; {} for an empty file
+    """
+    import yaml
+
+    with open(filename, "rb") as f:
+        return yaml.load(f, Loader=yaml_loader()) or {}
+
+
+def config_cache_dir():
+    """ :return str: $DOCX_COREPROP_CONFIG_CACHE, or configs under the result cache directory when it is 1;
+        None when unset or 0 (disabled)
+    """
+    setting = os.environ.get(CONFIG_CACHE_ENV, "")
+    if setting in ("", "0"):
+        return None
+    if setting != "1":
+        return setting
+    from docx_coreprop_writer.cache import default_cache_dir
+
+    return os.path.join(default_cache_dir(), CONFIG_DIR)
+
+
+def entry_name(filename, key):
+    """ :return str: cache entry filename of block key of filename """
+    data = "\0".join([os.path.abspath(filename), key])
+    return hashlib.sha256(data.encode("utf-8", "surrogateescape")).hexdigest() + ".json"
+
+
+def to_json(value):
+    """ :return: value with dates tagged, e.g. {"!date": "2018-12-31"}
+    :raise TypeError: for anything JSON would not give back unchanged (e.g. non-string keys,
+        or a mapping which would read back as a tagged date)
+    """
+    if isinstance(value, dict):
+        if not all(isinstance(key, str) for key in value):
+            raise TypeError("non-string key")
+        if len(value) == 1 and next(iter(value)) in _DATE_TAGS:
+            raise TypeError("mapping with a date tag as its only key")
+        return {key: to_json(val) for key, val in value.items()}
+    if isinstance(value, list):
+        return [to_json(item) for item in value]
+    for tag, kind in _DATE_TAGS.items():
+        if isinstance(value, kind):
+            return {tag: value.isoformat()}
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    raise TypeError("cannot cache {}".format(type(value).__name__))
+
+
+def from_json(value):
+    """ Inverse of to_json() """
+    if isinstance(value, dict):
+        if len(value) == 1:
+            tag, text = next(iter(value.items()))
+            if tag in _DATE_TAGS:
+                return _DATE_TAGS[tag].fromisoformat(text)
+        return {key: from_json(val) for key, val in value.items()}
+    if isinstance(value, list):
+        return [from_json(item) for item in value]
+    return value
+
+
+def load_block(filename, key, cache_dir=None):
+    """ Returns block `key` of yaml filename, from the config cache when the file has not changed
+
+    The cache is best effort; an unwritable or corrupt cache falls back to parsing,
+    and a block JSON cannot hold as is is not cached.
+
+    :param str filename: yaml filename
+    :param str key: top-level key, e.g. META_KEY
+    :param str cache_dir: defaults to config_cache_dir(); None there disables the cache
+    :return dict: plain dict; {} when the block is missing or empty
+    """
+    cache_dir = cache_dir or config_cache_dir()
+    st = os.stat(filename)
+    stamp = [st.st_mtime_ns, st.st_size, str(version)]
+    entry = os.path.join(cache_dir, entry_name(filename, key)) if cache_dir else None
+    if entry is not None:
+        try:
+            with open(entry, encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached["stamp"] == stamp:
+                return from_json(cached["block"])
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    block = read_yaml(filename).get(key) or {}
+    if entry is not None:
+        tmp = None
+        try:
+            data = json.dumps({"stamp": stamp, "block": to_json(block)}, ensure_ascii=False)
+            os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=cache_dir, prefix=".", suffix=".tmp")  # created 0600
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp, entry)
+        except (OSError, TypeError):
+            if tmp is not None and os.path.exists(tmp):
+                os.remove(tmp)
+    return block
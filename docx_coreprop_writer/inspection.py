@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+""" `docx-coreprop-writer inspect`: audit many DOCX files without loading them
+
+Each file is read at ZIP level only: docProps/core.xml and word/settings.xml
+are parsed (both are small), styles.xml is scanned for style IDs and names,
+and the document with its headers, footers and notes is streamed through a
+regular expression counting paragraphs, runs and tables per style. Nothing is
+written. Files are spread across a process pool and reported as JSON lines
+or CSV, in input order.
+
+Given a yaml config (-I, -M or a manifest), each file is also compared with
+what the writer would apply: core properties, the Word 2013 compat block
+(word2010compatible), w:writeProtection (read-only-recommended) and source
+styles of the paragraph, character and table mappings still in use. Table
+layout, extra_section and okuzuke are not checked.
+"""
+
+import argparse
+import csv
+import datetime
+import json
+import re
+import sys
+import zipfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from xml.etree import ElementTree
+from xml.sax.saxutils import unescape
+
+from docx_coreprop_writer import ATTR_LIST, StoreDict, load_metadata, merge_choice, zipio
+from docx_coreprop_writer.plan import MetadataError, compile_metadata, compile_overrides
+from docx_coreprop_writer.planner import W_NS, scan_tags, wordml_prefix
+from docx_coreprop_writer.version import version
+
+FORMATS = ["jsonl", "csv"]
+CHUNK_SIZE = 16  # files handed to a worker at a time
+
+_CP = "{http://schemas.openxmlformats.org/package/2006/metadata/core-properties}"
+_DC = "{http://purl.org/dc/elements/1.1/}"
+_DCTERMS = "{http://purl.org/dc/terms/}"
+_W = "{" + W_NS + "}"
+# core property as python-docx names it -> element of core.xml
+CORE_ELEMENTS = {"author": _DC + "creator",
+                 "category": _CP + "category",
+                 "comments": _DC + "description",
+                 "content_status": _CP + "contentStatus",
+                 "created": _DCTERMS + "created",
+                 "identifier": _DC + "identifier",
+                 "keywords": _CP + "keywords",
+                 "language": _DC + "language",
+                 "last_modified_by": _CP + "lastModifiedBy",
+                 "last_printed": _CP + "lastPrinted",
+                 "modified": _DCTERMS + "modified",
+                 "revision": _CP + "revision",
+                 "subject": _DC + "subject",
+                 "title": _DC + "title",
+                 "version": _CP + "version",
+                 }
+W3CDTF_FORMAT = "%Y-%m-%dT%H:%M:%SZ"  # as python-docx writes dates
+_W3CDTF_FORMATS = [W3CDTF_FORMAT, "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d", "%Y-%m", "%Y"]
+
+# style type of styles.xml -> (metadata key of its mapping, element tag, style reference tag)
+STYLE_KINDS = {"paragraph": ("paragraph", b"p", b"pStyle"),
+               "character": ("character", b"r", b"rStyle"),
+               "table": ("table", b"tbl", b"tblStyle"),
+               }
+CSV_FIELDS = (["file"] + ATTR_LIST + ["compatibility_mode", "write_protection", "read_only_recommended"] +
+              [style_type + "_styles" for style_type in STYLE_KINDS] + ["drift", "error"])
+_ATTRIBUTE = re.compile(rb'([\w.-]+:)?([\w.-]+)="([^"]*)"')
+
+
+def xml_text(value):
+    """ :return str: attribute value (bytes) decoded, entities replaced """
+    text = value.decode("utf-8")
+    return unescape(text, {"&quot;": '"', "&apos;": "'"}) if "&" in text else text
+
+
+def style_usage_pattern(prefix):
+    """ :return: pattern whose findall() items are (element tag, b"", b"") or (b"", reference tag, style ID) """
+    w = re.escape(prefix)
+    return re.compile(b"<" + w + rb"(?:(p|r|tbl)[\s>/]|(pStyle|rStyle|tblStyle)\s[^>]*?" + w + rb'val="([^"]*)")')
+
+
+def read_styles(styles_xml):
+    """ Style IDs and names of styles.xml from its start tags, without parsing it
+
+    :param bytes styles_xml: None when the package has no styles part
+    :return tuple: (style ID -> name as python-docx shows it, style type -> ID of its default style)
+    """
+    from docx.styles import BabelFish
+
+    names = {}
+    defaults = {}
+    prefix = wordml_prefix(styles_xml or b"")
+    if prefix is None:
+        return names, defaults
+    w = re.escape(prefix)
+    pattern = re.compile(b"<" + w + rb"style\b([^>]*)>\s*<" + w + rb'name\s[^>]*?' + w + rb'val="([^"]*)"')
+    for attributes, name in pattern.findall(styles_xml):
+        attrs = {key: xml_text(val) for _, key, val in _ATTRIBUTE.findall(attributes)}
+        if b"styleId" not in attrs:
+            continue
+        names[attrs[b"styleId"]] = BabelFish.internal2ui(xml_text(name))
+        if attrs.get(b"default") in ("1", "true", "on") and attrs.get(b"type") in STYLE_KINDS:
+            defaults.setdefault(attrs[b"type"], attrs[b"styleId"])
+    return names, defaults
+
+
+def style_histogram(zf, document, styles_xml):
+    """ Elements per style name, the way the style passes see them:
+    elements without (or with an unknown) style ID have the default style of their type
+
+    :param zipfile.ZipFile zf:
+    :param str document: main document partname
+    :param bytes styles_xml:
+    :return dict: style type -> {style name: number of elements}
+    """
+    found = Counter()
+    for name in [document] + zipio.related_partnames(zf, document, zipio.STORY_RELTYPES):
+        if name in zf.NameToInfo:
+            found.update(scan_tags(zf, name, style_usage_pattern) or {})
+    names, defaults = read_styles(styles_xml)
+    histogram = {}
+    for style_type, (_, tag, reference) in STYLE_KINDS.items():
+        default = names.get(defaults.get(style_type), "(default)")
+        counts = Counter()
+        for (_, ref, style_id), number in found.items():
+            if ref == reference:
+                counts[names.get(style_id.decode("utf-8"), default)] += number
+        unstyled = found[(tag, b"", b"")] - sum(counts.values())
+        if unstyled > 0:
+            counts[default] += unstyled
+        histogram[style_type] = dict(counts.most_common())
+    return histogram
+
+
+def read_core(blob):
+    """ :return dict: core property -> text, for the properties present in core.xml """
+    if blob is None:
+        return {}
+    root = ElementTree.fromstring(blob)
+    core = {}
+    for key, tag in CORE_ELEMENTS.items():
+        element = root.find(tag)
+        if element is not None:
+            core[key] = element.text or ""
+    return core
+
+
+def read_settings(blob):
+    """ :return dict: compatibility_mode, compat (list of (tag, attributes)), write_protection and
+        read_only_recommended
+    """
+    settings = {"compatibility_mode": None, "compat": None, "write_protection": False, "read_only_recommended": False}
+    if blob is None:
+        return settings
+    root = ElementTree.fromstring(blob)
+    compat = root.find(_W + "compat")
+    if compat is not None:
+        settings["compat"] = [(child.tag, dict(child.attrib)) for child in compat]
+        for child in compat.iter(_W + "compatSetting"):
+            if child.get(_W + "name") == "compatibilityMode":
+                settings["compatibility_mode"] = child.get(_W + "val")
+    write_protection = root.find(_W + "writeProtection")
+    if write_protection is not None:
+        settings["write_protection"] = True
+        settings["read_only_recommended"] = write_protection.get(_W + "recommended") is not None
+    return settings
+
+
+def expected_compat():
+    """ :return list: (tag, attributes) of each child of the compat block word2010_compatibility_pass writes """
+    from docx_coreprop_writer.templates import COMPAT_SETTINGS, COMPAT_URL
+
+    return [(_W + "useFELayout", {})] + [(_W + "compatSetting", {_W + "name": name, _W + "url": COMPAT_URL,
+                                                                   _W + "val": val}) for name, val in COMPAT_SETTINGS]
+
+
+def core_text(value):
+    """ :return str: metadata value as python-docx writes it to core.xml """
+    if isinstance(value, datetime.datetime):
+        return value.strftime(W3CDTF_FORMAT)
+    return str(value)
+
+
+def normalize_date(text):
+    """ :return str: W3CDTF text in W3CDTF_FORMAT (fraction and offset dropped); text itself when unreadable """
+    text = re.sub(r"(\.\d+)?(Z|[+-]\d\d:\d\d)$", "", text.strip())
+    for fmt in _W3CDTF_FORMATS:
+        try:
+            return datetime.datetime.strptime(text, fmt).strftime(W3CDTF_FORMAT)
+        except ValueError:
+            continue
+    return text
+
+
+def find_drift(plan, record):
+    """ What the writer would still change, as far as these parts tell
+
+    :param MetadataPlan plan:
+    :param dict record: inspect_document() result
+    :return list: one message per difference
+    """
+    drift = []
+    for key in ATTR_LIST:
+        if plan.get(key) is None:
+            continue
+        expected = core_text(plan[key])
+        current = record["core"].get(key, "")
+        if key in ("created", "modified", "last_printed") and current != "":
+            current = normalize_date(current)
+        if current != expected:
+            drift.append("{}: {!r}, expected {!r}".format(key, record["core"].get(key), expected))
+    if plan.get("word2010compatible", False) is False and record["compat"] != expected_compat():
+        if record["compatibility_mode"] != "15":
+            drift.append("compatibilityMode: {}, expected 15".format(record["compatibility_mode"]))
+        else:
+            drift.append("compat settings differ from Word 2013 defaults")
+    if plan.get("read-only-recommended") is True and not record["read_only_recommended"]:
+        drift.append("w:writeProtection: {}".format("no w:recommended" if record["write_protection"] else "missing"))
+    for style_type, (key, _, _) in STYLE_KINDS.items():
+        for source, target in (plan.get(key) or {}).items():
+            number = record["styles"][style_type].get(source, 0)
+            if number > 0 and source != target:
+                drift.append("{} style {!r}: {}, expected {!r}".format(style_type, source, number, target))
+    return drift
+
+
+def inspect_document(filename, plan=None):
+    """ Reads core properties, settings and style usage of filename; never loads it with python-docx
+
+    :param str filename:
+    :param MetadataPlan plan: compared with the document when given
+    :return dict: record with core, compatibility_mode, write_protection, read_only_recommended,
+        styles (style type -> {name: count}) and drift (None without plan)
+    :raise ValueError: when filename has no main document part
+    """
+    with zipfile.ZipFile(filename) as zf:
+        document = zipio.package_partname(zf, zipio.RT_OFFICE_DOCUMENT)
+        if document is None or document not in zf.NameToInfo:
+            raise ValueError("no main document part")
+        core = zipio.package_partname(zf, zipio.RT_CORE_PROPERTIES)
+        settings = zipio.related_partname(zf, document, zipio.RT_SETTINGS)
+        styles = zipio.related_partname(zf, document, zipio.RT_STYLES)
+        record = {"file": filename}
+        record["core"] = read_core(zf.read(core) if core in zf.NameToInfo else None)
+        record.update(read_settings(zf.read(settings) if settings in zf.NameToInfo else None))
+        record["styles"] = style_histogram(zf, document, zf.read(styles) if styles in zf.NameToInfo else None)
+    record["drift"] = find_drift(plan, record) if plan is not None else None
+    return record
+
+
+def inspect_job(job):
+    """ Worker side of the pool; never raises
+
+    :param tuple job: (filename, MetadataPlan or None)
+    :return dict: inspect_document() record without compat, with error (message or None)
+    """
+    filename, plan = job
+    try:
+        record = inspect_document(filename, plan)
+    except Exception as e:
+        return {"file": filename, "error": "{}: {}".format(type(e).__name__, e)}
+    del record["compat"]
+    record["error"] = None
+    return record
+
+
+def csv_row(record):
+    """ :return dict: record flattened to CSV_FIELDS; style histograms as name=count separated by '|' """
+    row = {"file": record["file"], "error": record.get("error")}
+    row.update(record.get("core", {}))
+    for key in ["compatibility_mode", "write_protection", "read_only_recommended"]:
+        row[key] = record.get(key)
+    for style_type, counts in record.get("styles", {}).items():
+        row[style_type + "_styles"] = "|".join("{}={}".format(name, number) for name, number in counts.items())
+    if record.get("drift") is not None:
+        row["drift"] = "; ".join(record["drift"])
+    return row
+
+
+def run_inspect(jobs, workers=None):
+    """ Fans jobs out across a process pool
+
+    :param list jobs: list of (filename, MetadataPlan or None) tuples
+    :param int workers: pool size; defaults to os.cpu_count()
+    :return: iterator of inspect_job() records in job order, as they complete
+    """
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(inspect_job, jobs, chunksize=CHUNK_SIZE)
+
+
+def main(argv=None):
+    from docx_coreprop_writer.batch import collect_jobs
+
+    parser = argparse.ArgumentParser(prog="docx-coreprop-writer inspect",
+                                     description="Reports core properties, settings and style usage of many "
+                                                 "DOCX files, and their drift from a yaml config; writes nothing")
+    parser.add_argument("outputs", nargs="*", metavar="docx", help="docx filenames")
+    parser.add_argument("--input", "-I", default=None, help="yaml config to compare with")
+    parser.add_argument("--glob", "-G", default=[], action="append", help="glob pattern of docx files")
+    parser.add_argument("--manifest", "-F", default=[], action="append",
+                        help="manifest file as docx-coreprop-writer-batch reads it; overrides are compared too")
+    parser.add_argument("--metadata", "-M", default={}, action=StoreDict)
+    parser.add_argument("--workers", "-j", type=int, default=None, help="number of worker processes")
+    parser.add_argument("--format", default="jsonl", choices=FORMATS, help="JSON lines (default) or CSV")
+    parser.add_argument("--output", "-o", default=None, metavar="FILE", help="write the report to FILE, not stdout")
+    parser.add_argument('--version', action='version', version=str(version))
+
+    args = parser.parse_args(argv)
+
+    try:
+        jobs = collect_jobs(args)
+    except MetadataError as e:
+        print(e, file=sys.stderr)
+        sys.exit(2)
+    if jobs == []:
+        parser.error("no docx files given")
+
+    compare = args.input is not None or args.metadata != {} or args.manifest != []
+    base = None
+    if compare:
+        try:
+            base = compile_metadata(merge_choice(args.metadata,
+                                                 load_metadata(args.input) if args.input is not None else {}))
+        except MetadataError as e:
+            print("{}: {}".format(args.input or "--metadata", e), file=sys.stderr)
+            sys.exit(2)
+    plans = []
+    errors = []
+    for path, overrides in jobs:
+        try:
+            plans.append(compile_overrides(base, overrides) if compare else None)
+        except MetadataError as e:
+            errors.append("{}: {}".format(path, e))
+    if errors != []:
+        print("\n".join(errors), file=sys.stderr)
+        sys.exit(2)
+
+    out = open(args.output, "w", encoding="utf-8", newline="") if args.output is not None else sys.stdout
+    inspected = drifted = failed = 0
+    try:
+        writer = csv.DictWriter(out, CSV_FIELDS) if args.format == "csv" else None
+        if writer is not None:
+            writer.writeheader()
+        for record in run_inspect([(path, plan) for (path, _), plan in zip(jobs, plans)], args.workers):
+            inspected += 1
+            failed += record["error"] is not None
+            drifted += bool(record.get("drift"))
+            if writer is not None:
+                writer.writerow(csv_row(record))
+            else:
+                print(json.dumps(record, ensure_ascii=False), file=out)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print("{} inspected, {} drifted, {} failed".format(inspected, drifted, failed), file=sys.stderr)
+
+    if drifted or failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+""" Manifests: many documents, one shared metadata base, per-document overrides
+
+Three formats, told apart by extension.
+
+Plain text (any other extension); one DOCX path per line followed by optional
+key=value overrides::
+
+    out/a.docx title="Document A" revision=3
+    out/b.docx
+
+YAML (.yaml, .yml); an optional docx_coreprop block shared by every document,
+then a list of documents, each a path or a mapping of path plus overrides::
+
+    docx_coreprop:
+      author: "K4ZUKI"
+    documents:
+      - path: out/a.docx
+        title: "Document A"
+        okuzuke:
+          rows: ["Title", "Author"]
+      - out/b.docx
+
+CSV (.csv); a header row with a path column, then one row per document.
+Empty cells do not override; dotted column names (okuzuke.rows) set nested
+keys and list values are separated by '|'::
+
+    path,title,identifier,okuzuke.rows
+    out/a.docx,Document A,A-001,Title|Author
+    out/b.docx,,B-001,
+
+Overrides win over the base key by key (merge_choice()); nested mappings
+(okuzuke) are resolved the same way one level down. Command-line -M overrides
+win over the docx_coreprop block of a YAML manifest, as they win over -I.
+"""
+
+import csv
+import shlex
+from collections.abc import Mapping
+
+from docx_coreprop_writer import META_KEY, merge_choice
+from docx_coreprop_writer.plan import MetadataError
+
+DOCUMENTS_KEY = "documents"
+PATH_KEY = "path"
+LIST_KEYS = ["okuzuke.rows"]
+LIST_SEPARATOR = "|"
+
+
+def read_line_manifest(filename):
+    """ Reads plain text manifest; blank lines and lines starting with '#' are ignored
+
+    :param str filename:
+    :return list jobs: list of (path, overrides) tuples
+    """
+    jobs = []
+    with open(filename, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line == "" or line.startswith("#"):
+                continue
+            path, *pairs = shlex.split(line)
+            overrides = {}
+            for pair in pairs:
+                key, _, val = pair.partition("=")
+                overrides[key] = val
+            jobs.append((path, overrides))
+    return jobs
+
+
+def read_yaml_manifest(filename, meta_ext=None):
+    """
+    :param str filename:
+    :param dict meta_ext: command-line (-M) overrides, which win over the docx_coreprop block
+    :return list jobs: list of (path, overrides) tuples; overrides include the docx_coreprop block and meta_ext
+    :raise MetadataError: when an entry has no path
+    """
+    from docx_coreprop_writer.config import read_yaml
+
+    manifest = read_yaml(filename)
+    base = merge_choice(meta_ext or {}, manifest.get(META_KEY) or {})
+    jobs = []
+    for number, entry in enumerate(manifest.get(DOCUMENTS_KEY) or [], 1):
+        if isinstance(entry, str):
+            entry = {PATH_KEY: entry}
+        if not isinstance(entry, Mapping) or entry.get(PATH_KEY) is None:
+            raise MetadataError("{}: document {}: expected a path or a mapping with path".format(filename, number))
+        overrides = {key: val for key, val in entry.items() if key != PATH_KEY}
+        jobs.append((str(entry[PATH_KEY]), merge_choice(overrides, base)))
+    return jobs
+
+
+def csv_overrides(row):
+    """
+    :param dict row: column name -> cell of one CSV row, path excluded
+    :return dict: overrides; dotted names nested, empty cells left out
+    """
+    overrides = {}
+    for column, cell in row.items():
+        if column is None or cell is None or cell.strip() == "":
+            continue
+        value = [item.strip() for item in cell.split(LIST_SEPARATOR)] if column in LIST_KEYS else cell.strip()
+        *parents, key = column.split(".")
+        target = overrides
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[key] = value
+    return overrides
+
+
+def read_csv_manifest(filename):
+    """
+    :param str filename:
+    :return list jobs: list of (path, overrides) tuples
+    :raise MetadataError: when there is no path column, or a row has no path
+    """
+    jobs = []
+    with open(filename, encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        if PATH_KEY not in (reader.fieldnames or []):
+            raise MetadataError("{}: expected a header row with a {} column".format(filename, PATH_KEY))
+        for row in reader:
+            path = (row.pop(PATH_KEY) or "").strip()
+            if path == "":
+                raise MetadataError("{}:{}: row has no {}".format(filename, reader.line_num, PATH_KEY))
+            jobs.append((path, csv_overrides(row)))
+    return jobs
+
+
+def read_manifest(filename, meta_ext=None):
+    """ Reads manifest of any format, chosen by extension
+
+    :param str filename:
+    :param dict meta_ext: command-line (-M) overrides; see read_yaml_manifest()
+    :return list jobs: list of (path, overrides) tuples, in manifest order
+    """
+    if filename.lower().endswith((".yaml", ".yml")):
+        return read_yaml_manifest(filename, meta_ext)
+    if filename.lower().endswith(".csv"):
+        return read_csv_manifest(filename)
+    return read_line_manifest(filename)
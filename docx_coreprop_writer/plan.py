@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+""" Metadata compiled once into a validated, immutable plan
+
+Merged metadata (yaml block plus --metadata overrides) is checked and
+normalized before any document is opened: dates become datetime, revision
+becomes int, enum values are lowercased, yes/no strings become bool, and the
+passes which have anything to do are listed. Malformed input fails here,
+once, instead of in the middle of a run. Passes read a plan like any dict.
+"""
+
+import datetime
+from collections.abc import Mapping
+
+import docx_coreprop_writer
+from docx_coreprop_writer import (ATTR_LIST, PASSES, cell_vertical_alignment_pass, character_style_pass,
+                                  core_properties_pass, extra_section_pass, merge_choice, okuzuke_table_pass,
+                                  paragraph_style_pass, readonly_recommended_pass, table_alignment_in_page_pass,
+                                  table_autofit_pass, table_style_pass, word2010_compatibility_pass)
+
+DATE_KEYS = ["created", "modified", "last_printed"]
+DATE_FORMAT = "%d-%b-%Y"  # DD-MMM-YYYY
+BOOL_KEYS = ["word2010compatible", "disable-table-autofit", "read-only-recommended", "extra_section"]
+ENUM_KEYS = {"table-alignment-in-page": "TABLE_ALIGNMENT_IN_PAGE",
+             "table-cell-vertical-alignment": "CELL_VERTICAL_ALIGMENT"}
+STYLE_KEYS = ["table", "paragraph", "character"]
+OKUZUKE_KEYS = ["table-style", "para-style"]
+
+_TRUE = ("true", "yes", "on", "1")
+_FALSE = ("false", "no", "off", "0")
+
+
+class MetadataError(ValueError):
+    """ Raised by compile_metadata() with every problem found """
+
+
+class FrozenMap(Mapping):
+    """ Read-only dict; picklable, so plans can be sent to worker processes """
+
+    def __init__(self, data):
+        self._data = dict(data)
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return "{}({!r})".format(type(self).__name__, self._data)
+
+    def to_dict(self):
+        """ :return dict: plain copy, nested maps included """
+        return {key: val.to_dict() if isinstance(val, FrozenMap) else val for key, val in self._data.items()}
+
+
+class MetadataPlan(FrozenMap):
+    """ Normalized metadata plus the passes it needs
+
+    :param dict data: normalized metadata
+    :param tuple passes: pass functions with anything to do, in PASSES order
+    """
+
+    def __init__(self, data, passes):
+        super().__init__(data)
+        self.passes = tuple(passes)
+
+
+def to_bool(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lower() in _TRUE + _FALSE:
+        return value.strip().lower() in _TRUE
+    raise ValueError("expected true or false, got {!r}".format(value))
+
+
+def to_datetime(value):
+    if isinstance(value, datetime.datetime):
+        return value
+    if isinstance(value, datetime.date):  # yaml reads 2018-12-31 as date
+        return datetime.datetime.combine(value, datetime.time())
+    try:
+        return datetime.datetime.strptime(str(value).strip(), DATE_FORMAT)
+    except ValueError:
+        raise ValueError("expected DD-MMM-YYYY (e.g. 31-Dec-2018), got {!r}".format(value)) from None
+
+
+def to_revision(value):
+    if not isinstance(value, bool):
+        try:
+            revision = int(str(value).strip())
+        except ValueError:
+            revision = 0
+        if revision >= 1:
+            return revision
+    raise ValueError("expected a positive integer, got {!r}".format(value))
+
+
+def to_enum(value, table):
+    choices = getattr(docx_coreprop_writer, table)  # loads python-docx enums
+    key = str(value).strip().lower()
+    if key not in choices:
+        raise ValueError("expected one of {}, got {!r}".format(", ".join(choices), value))
+    return key
+
+
+def to_style_map(value):
+    if not isinstance(value, Mapping):
+        raise ValueError("expected a mapping of source style name to target style name, got {!r}".format(value))
+    return FrozenMap({str(key): str(val) for key, val in value.items()})
+
+
+def to_okuzuke(value):
+    if not isinstance(value, Mapping):
+        raise ValueError("expected a mapping with table-style, para-style and rows, got {!r}".format(value))
+    okuzuke = {key: str(value[key]) for key in OKUZUKE_KEYS if value.get(key) is not None}
+    rows = value.get("rows", [])
+    if isinstance(rows, str) or not isinstance(rows, (list, tuple)):
+        raise ValueError("rows: expected a list of strings, got {!r}".format(rows))
+    okuzuke["rows"] = tuple(str(row) for row in rows)
+    return FrozenMap(okuzuke)
+
+
+def needed_passes(meta):
+    """ :return list: pass functions of PASSES which would do anything for normalized meta """
+    wanted = {word2010_compatibility_pass: meta.get("word2010compatible", False) is False,
+              core_properties_pass: any(meta.get(key) is not None for key in ATTR_LIST),
+              paragraph_style_pass: meta.get("paragraph") is not None,
+              table_style_pass: meta.get("table") is not None,
+              character_style_pass: meta.get("character") is not None,
+              table_alignment_in_page_pass: meta.get("table-alignment-in-page") is not None,
+              cell_vertical_alignment_pass: meta.get("table-cell-vertical-alignment") is not None,
+              table_autofit_pass: meta.get("disable-table-autofit") is True,
+              extra_section_pass: meta.get("extra_section") is True,
+              readonly_recommended_pass: meta.get("read-only-recommended") is True,
+              okuzuke_table_pass: meta.get("okuzuke") is not None,
+              }
+    return [pass_func for pass_func in PASSES if wanted[pass_func]]
+
+
+def normalize(metadata):
+    """
+    :param dict metadata:
+    :return tuple: (normalized dict, list of error messages)
+    """
+    converters = dict.fromkeys(DATE_KEYS, to_datetime)
+    converters.update(dict.fromkeys(BOOL_KEYS, to_bool))
+    converters.update(dict.fromkeys(STYLE_KEYS, to_style_map))
+    converters.update({key: (lambda value, table=table: to_enum(value, table)) for key, table in ENUM_KEYS.items()})
+    converters.update({"revision": to_revision, "okuzuke": to_okuzuke})
+
+    meta = {}
+    errors = []
+    for key, value in metadata.items():
+        if value is None:
+            meta[key] = None
+            continue
+        convert = converters.get(key, str if key in ATTR_LIST else None)
+        try:
+            meta[key] = convert(value) if convert is not None else value
+        except ValueError as e:
+            errors.append("{}: {}".format(key, e))
+    return meta, errors
+
+
+def compile_metadata(metadata):
+    """ Validates and normalizes merged metadata
+
+    :param dict metadata: yaml block merged with overrides; a MetadataPlan is returned as is
+    :return MetadataPlan:
+    :raise MetadataError: listing every malformed key
+    """
+    if isinstance(metadata, MetadataPlan):
+        return metadata
+    meta, errors = normalize(metadata)
+    if errors != []:
+        raise MetadataError("invalid metadata; " + "; ".join(errors))
+    return MetadataPlan(meta, needed_passes(meta))
+
+
+def compile_overrides(plan, overrides):
+    """ plan with per-document overrides applied, as merge_choice() would before compile_metadata()
+    Only the overridden keys are converted; the rest of plan is reused as is
+
+    :param MetadataPlan plan: compiled base
+    :param dict overrides: raw overrides
+    :return MetadataPlan:
+    :raise MetadataError: listing every malformed key of overrides
+    """
+    if not overrides:
+        return plan
+    meta, errors = normalize(merge_choice(overrides, {key: plan[key] for key in overrides if key in plan}))
+    if errors != []:
+        raise MetadataError("invalid metadata; " + "; ".join(errors))
+    meta = dict(plan, **meta)
+    return MetadataPlan(meta, needed_passes(meta))
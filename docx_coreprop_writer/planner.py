@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+""" Decides which passes a document needs before it is loaded
+
+The metadata plan says which passes are configured; a cheap scan of the
+package (element counts of the document and its headers, footers and notes,
+style names in styles.xml, part sizes from the ZIP directory) tells
+which of them could possibly change this document. The rest are skipped,
+and when only ZIP level passes remain the document is never loaded at all.
+
+--dry-run prints the decision and a cost estimate per stage.
+"""
+
+import re
+import sys
+from collections import Counter
+import zipfile
+from xml.sax.saxutils import escape
+
+from docx_coreprop_writer import (FAST_PASSES, cell_vertical_alignment_pass, character_style_pass,
+                                  extra_section_pass, okuzuke_table_pass, paragraph_style_pass, profiling,
+                                  table_alignment_in_page_pass, table_autofit_pass, table_style_pass, zipio)
+from docx_coreprop_writer.plan import compile_metadata
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+ELEMENTS = {b"p": "paragraphs", b"r": "runs", b"tbl": "tables", b"tc": "cells"}
+
+# pass -> (metadata key of its style mapping, element count it visits)
+STYLE_PASSES = {paragraph_style_pass: ("paragraph", "paragraphs"),
+                table_style_pass: ("table", "tables"),
+                character_style_pass: ("character", "runs"),
+                }
+# pass -> element count it visits
+ELEMENT_PASSES = {table_alignment_in_page_pass: "tables",
+                  cell_vertical_alignment_pass: "cells",
+                  table_autofit_pass: "tables",
+                  }
+
+# Cost model in milliseconds, measured on the benchmark fixtures (benchmarks/fixtures.py);
+# only meant to tell cheap from expensive configurations
+COST_PER_ELEMENT_MS = {paragraph_style_pass: ("paragraphs", 0.09),
+                       character_style_pass: ("runs", 0.1),
+                       table_style_pass: ("tables", 0.3),
+                       table_alignment_in_page_pass: ("tables", 0.05),
+                       cell_vertical_alignment_pass: ("cells", 0.04),
+                       table_autofit_pass: ("tables", 0.05),
+                       }
+COST_PASS_MS = {extra_section_pass: 5.0, okuzuke_table_pass: 15.0}  # other passes: COST_MS["pass"]
+COST_MS = {"load": 20.0,  # python-docx load, fixed part
+           "load_xml_mb": 15.0,  # per MiB of uncompressed XML
+           "load_other_mb": 1.5,  # per MiB of media and other binary parts
+           "walk_paragraph": 0.0025,  # walking alone, per paragraph
+           "pass": 1.0,
+           "fast": 5.0,  # ZIP level load and save, fixed part
+           "deflate_mb": 30.0,  # per MiB of rewritten XML
+           "copy_mb": 1.5,  # per MiB of members copied raw
+           }
+
+_CHUNK_SIZE = 1024 * 1024
+_MiB = 1024 * 1024
+
+
+def wordml_prefix(data):
+    """
+    :param bytes data: start of an XML part
+    :return bytes: prefix bound to the WordprocessingML namespace (b"w:" as a rule, b"" when it is
+        the default namespace); None when data does not declare it
+    """
+    declared = re.search(rb'xmlns(?::([\w.-]+))?="' + re.escape(W_NS.encode()) + b'"', data)
+    if declared is None:
+        return None
+    return declared.group(1) + b":" if declared.group(1) is not None else b""
+
+
+def scan_tags(zf, name, make_pattern):
+    """ Counts matches of a start tag pattern over one part, streamed without parsing it
+
+    :param zipfile.ZipFile zf:
+    :param str name: member name
+    :param make_pattern: WordprocessingML prefix (bytes) -> compiled pattern matching within one tag
+    :return Counter: findall() item -> number of matches, or None when the prefix cannot be told
+    """
+    found = Counter()
+    with zf.open(name) as f:
+        chunk = f.read(_CHUNK_SIZE)
+        prefix = wordml_prefix(chunk)
+        if prefix is None:
+            return None
+        pattern = make_pattern(prefix)
+        tail = b""
+        while chunk != b"":
+            buf = tail + chunk
+            cut = buf.rfind(b"<")  # a tag starting there may continue in the next chunk
+            cut = cut if cut >= 0 else len(buf)
+            found.update(pattern.findall(buf, 0, cut))
+            tail = buf[cut:]
+            chunk = f.read(_CHUNK_SIZE)
+        found.update(pattern.findall(tail))
+    return found
+
+
+def count_elements(zf, name):
+    """ Counts w:p, w:r, w:tbl and w:tc start tags of one part without parsing it
+
+    :param zipfile.ZipFile zf:
+    :param str name: member name
+    :return dict: count name -> number, or None when the WordprocessingML prefix cannot be told
+    """
+    found = scan_tags(zf, name, lambda prefix: re.compile(b"<" + re.escape(prefix) + rb"(p|r|tbl|tc)[\s>/]"))
+    if found is None:
+        return None
+    counts = dict.fromkeys(ELEMENTS.values(), 0)
+    for tag, number in found.items():
+        counts[ELEMENTS[tag]] += number
+    return counts
+
+
+def style_defined(styles_xml, name):
+    """ Conservative: False only when no attribute value of styles.xml is name, so no style can be called so
+
+    :param bytes styles_xml:
+    :param str name: style name as python-docx shows it (e.g. "Heading 1")
+    :return bool:
+    """
+    from docx.styles import BabelFish
+
+    return any('val="{}"'.format(escape(candidate, {'"': "&quot;"})).encode("utf-8") in styles_xml
+               for candidate in {name, BabelFish.ui2internal(name)})
+
+
+def scan_package(filename):
+    """ Reads what the planner needs from the package; never loads it with python-docx
+
+    :param str filename: or a seekable binary file object
+    :return dict: element counts (None each when unknown), styles.xml and part sizes; None when
+        the package has no main document part
+    """
+    with zipfile.ZipFile(filename) as zf:
+        document = zipio.package_partname(zf, zipio.RT_OFFICE_DOCUMENT)
+        if document is None or document not in zf.NameToInfo:
+            return None
+        counts = dict.fromkeys(ELEMENTS.values(), 0)
+        for name in [document] + zipio.related_partnames(zf, document, zipio.STORY_RELTYPES):
+            if name not in zf.NameToInfo:
+                continue
+            part = count_elements(zf, name)
+            for key in counts:
+                counts[key] = None if part is None or counts[key] is None else counts[key] + part[key]
+        styles_partname = zipio.related_partname(zf, document, zipio.RT_STYLES)
+        styles_xml = zf.read(styles_partname) if styles_partname in zf.NameToInfo else None
+        infos = zf.infolist()
+        xml = {info.filename for info in infos if info.filename.endswith((".xml", ".rels"))}
+        return {"counts": counts,
+                "styles_xml": styles_xml,
+                "document_bytes": zf.getinfo(document).file_size,
+                "xml_bytes": sum(info.file_size for info in infos if info.filename in xml),
+                "other_bytes": sum(info.compress_size for info in infos if info.filename not in xml),
+                "compressed_bytes": sum(info.compress_size for info in infos),
+                }
+
+
+def skip_reason(pass_func, plan, scan):
+    """ :return str: why pass_func cannot change the scanned document, or None when it has to run """
+    if scan is None:
+        return None
+    if pass_func in STYLE_PASSES:
+        key, noun = STYLE_PASSES[pass_func]
+        if scan["counts"][noun] == 0:
+            return "no {}".format(noun)
+        if scan["styles_xml"] is not None and not any(style_defined(scan["styles_xml"], name) for name in plan[key]):
+            return "none of {} defined in styles.xml".format(", ".join(sorted(plan[key])))
+    if pass_func in ELEMENT_PASSES and scan["counts"][ELEMENT_PASSES[pass_func]] == 0:
+        return "no {}".format(ELEMENT_PASSES[pass_func])
+    return None
+
+
+def select_passes(plan, scan):
+    """
+    :param MetadataPlan plan:
+    :param dict scan: scan_package() result, or None to run every configured pass
+    :return list: (pass function, reason it is skipped or None) for each pass plan needs
+    """
+    return [(pass_func, skip_reason(pass_func, plan, scan)) for pass_func in plan.passes]
+
+
+def planned_passes(meta_file, filename, profiler=None):
+    """ Passes worth running on filename; the package is scanned only when some pass could be skipped
+
+    :param dict meta_file: metadata or MetadataPlan
+    :param str filename: or a seekable binary file object
+    :param profiling.Profiler profiler: records the scan as "plan"; None to disable
+    :return list: pass functions in PASSES order
+    """
+    plan = compile_metadata(meta_file)
+    if not any(pass_func in STYLE_PASSES or pass_func in ELEMENT_PASSES for pass_func in plan.passes):
+        return list(plan.passes)  # nothing the scan could rule out
+    with profiling.stage(profiler, "plan"):
+        scan = scan_package(filename)
+    return [pass_func for pass_func, reason in select_passes(plan, scan) if reason is None]
+
+
+def estimate(selected, scan):
+    """ Estimated wall time of each stage
+
+    :param list selected: select_passes() result
+    :param dict scan: scan_package() result
+    :return list: (stage, milliseconds) in execution order, skipped passes at 0
+    """
+    counts = {key: val or 0 for key, val in scan["counts"].items()}
+    run = [pass_func for pass_func, reason in selected if reason is None]
+    rows = []
+    if all(pass_func in FAST_PASSES for pass_func in run):
+        rows.append(("load", COST_MS["fast"] if run != [] else 0.0))
+        rows.extend((pass_func.__name__, COST_MS["pass"] if pass_func in run else 0.0) for pass_func, _ in selected)
+        if run != []:
+            rows.append(("save", COST_MS["copy_mb"] * scan["compressed_bytes"] / _MiB))
+        return rows
+
+    rows.append(("load", COST_MS["load"] + COST_MS["load_xml_mb"] * scan["xml_bytes"] / _MiB +
+                 COST_MS["load_other_mb"] * scan["other_bytes"] / _MiB))
+    walked = False
+    for pass_func, reason in selected:
+        if reason is not None:
+            cost = 0.0
+        elif pass_func in COST_PER_ELEMENT_MS:
+            noun, per_element = COST_PER_ELEMENT_MS[pass_func]
+            cost = per_element * counts[noun]
+            if not walked:
+                cost += COST_MS["walk_paragraph"] * counts["paragraphs"]
+                walked = True
+        else:
+            cost = COST_PASS_MS.get(pass_func, COST_MS["pass"])
+        rows.append((pass_func.__name__, cost))
+    rows.append(("save", COST_MS["deflate_mb"] * scan["document_bytes"] / _MiB +
+                 COST_MS["copy_mb"] * scan["other_bytes"] / _MiB))
+    return rows
+
+
+def print_dry_run(meta_file, filename, label=None, file=None):
+    """ Prints which passes would run on filename, which are skipped and why, and estimated cost
+
+    :param dict meta_file: metadata or MetadataPlan
+    :param str filename: or a seekable binary file object
+    :param str label: document name to print; defaults to filename
+    :param file: defaults to sys.stderr
+    :return list: pass functions which would run
+    """
+    file = file or sys.stderr
+    plan = compile_metadata(meta_file)
+    scan = scan_package(filename)
+    selected = select_passes(plan, scan)
+    print("dry run: {}".format(label or filename), file=file)
+    if scan is None:
+        print("  no main document part; every configured pass would run", file=file)
+        for pass_func, _ in selected:
+            print("  {:<30} run".format(pass_func.__name__), file=file)
+        return list(plan.passes)
+
+    counts = scan["counts"]
+    print("  " + ", ".join("{} {}".format("?" if counts[noun] is None else counts[noun], noun)
+                           for noun in ELEMENTS.values()) +
+          "; XML {:.1f} MiB, other parts {:.1f} MiB".format(scan["xml_bytes"] / _MiB, scan["other_bytes"] / _MiB),
+          file=file)
+    reasons = dict((pass_func.__name__, reason) for pass_func, reason in selected)
+    rows = estimate(selected, scan)
+    for stage, cost in rows:
+        reason = reasons.get(stage)
+        action = "" if stage not in reasons else "run " if reason is None else "skip"
+        print("  {:<30} {:<4} {:>10}  {}".format(stage, action, "~{:.0f} ms".format(cost) if cost else "-",
+                                                 reason or ""), file=file)
+    print("  {:<30} {:<4} {:>10}".format("total", "", "~{:.0f} ms".format(sum(cost for _, cost in rows))),
+          file=file)
+    return [pass_func for pass_func, reason in selected if reason is None]
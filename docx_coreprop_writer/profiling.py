@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+""" Per-stage timing, memory and element count instrumentation behind --profile
+
+A stage is document load, one pass, or save. Passes report what they looked at
+through count(), which does nothing unless a stage is being profiled.
+"""
+
+import contextlib
+import json
+import sys
+import time
+
+FORMATS = ["text", "json"]
+
+_current = None
+
+
+def count(name, n=1):
+    """ Adds n to counter name of the stage being profiled; no-op when not profiling
+
+    :param str name: e.g. "paragraphs scanned"
+    :param int n:
+    """
+    if _current is not None:
+        _current[name] = _current.get(name, 0) + n
+
+
+def peak_rss_kib():
+    """ Peak RSS of this process in KiB; VmHWM on Linux, ru_maxrss elsewhere """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss // 1024 if sys.platform == "darwin" else maxrss
+
+
+class Profiler:
+    """ Records one entry per stage of one document
+
+    Peak memory delta is how much the process-wide peak RSS grew during the stage;
+    stages which stay below an earlier peak report 0.
+
+    :param str document: DOCX filename the stages belong to
+    """
+
+    def __init__(self, document):
+        self.document = document
+        self.stages = []
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        global _current
+        counts = {}
+        outer, _current = _current, counts
+        wall, cpu, peak = time.perf_counter(), time.process_time(), peak_rss_kib()
+        try:
+            yield counts
+        finally:
+            _current = outer
+            self.stages.append({"document": self.document,
+                                "stage": name,
+                                "wall_ms": round((time.perf_counter() - wall) * 1000, 3),
+                                "cpu_ms": round((time.process_time() - cpu) * 1000, 3),
+                                "peak_rss_delta_kib": peak_rss_kib() - peak,
+                                "counts": counts,
+                                })
+
+    def total(self):
+        """ :return dict: sum of every stage """
+        return {"document": self.document,
+                "stage": "total",
+                "wall_ms": round(sum(s["wall_ms"] for s in self.stages), 3),
+                "cpu_ms": round(sum(s["cpu_ms"] for s in self.stages), 3),
+                "peak_rss_delta_kib": sum(s["peak_rss_delta_kib"] for s in self.stages),
+                "counts": {},
+                }
+
+    def report(self, fmt="text", file=None):
+        """
+        :param str fmt: "text" (table) or "json" (one JSON object per line)
+        :param file: defaults to sys.stderr
+        """
+        file = file or sys.stderr
+        rows = self.stages + [self.total()]
+        if fmt == "json":
+            for row in rows:
+                print(json.dumps(row, ensure_ascii=False), file=file)
+            return
+
+        print("profile: {}".format(self.document), file=file)
+        print("  {:<30} {:>10} {:>10} {:>10}  {}".format("stage", "wall ms", "cpu ms", "peak +KiB", "counts"),
+              file=file)
+        for row in rows:
+            counts = " ".join("{}={}".format(key.replace(" ", "_"), val) for key, val in row["counts"].items())
+            print("  {:<30} {:>10.1f} {:>10.1f} {:>10}  {}".format(row["stage"], row["wall_ms"], row["cpu_ms"],
+                                                                  row["peak_rss_delta_kib"], counts), file=file)
+
+
+def stage(profiler, name):
+    """ :return: profiler.stage(name), or a context doing nothing when profiler is None """
+    if profiler is None:
+        return contextlib.nullcontext()
+    return profiler.stage(name)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+""" Warm server behind `docx-coreprop-writer --serve`
+
+Keeps python-docx and friends imported and parsed yaml configs cached, and runs
+jobs sent by docx-coreprop-client one at a time over a unix socket.
+One request is one JSON line; one response is one JSON line.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import signal
+import socket
+import socketserver
+import stat
+import sys
+
+from docx_coreprop_writer import load_metadata, open_cache, run_job
+from docx_coreprop_writer.cache import DEFAULT_SIZE_MIB
+from docx_coreprop_writer.plan import MetadataError
+from docx_coreprop_writer.client import SOCKET_ENV, check_socket, default_socket_path
+
+
+class ConfigCache:
+    """ Parsed yaml configs keyed by path; entries are dropped when mtime or size changes """
+
+    def __init__(self):
+        self.entries = {}
+
+    def load(self, filename):
+        """
+        :param str filename: yaml input filename
+        :return dict meta_file: a copy; callers may modify it
+        """
+        st = os.stat(filename)
+        key = (st.st_mtime_ns, st.st_size)
+        entry = self.entries.get(filename)
+        if entry is None or entry[0] != key:
+            entry = (key, load_metadata(filename))
+            self.entries[filename] = entry
+        return entry[1].copy()
+
+
+class JobHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if line == b"":
+            return
+        log = io.StringIO()
+        try:
+            job = json.loads(line)
+            args = argparse.Namespace(input=job["input"], output=job["output"],
+                                      metadata=job.get("metadata", {}), stream=job.get("stream", False),
+                                      check=job.get("check", False), dry_run=job.get("dry_run", False),
+                                      stamp=job.get("stamp", False),
+                                      cache=job.get("cache"),
+                                      cache_size=job.get("cache_size", DEFAULT_SIZE_MIB),
+                                      compress_level=job.get("compress_level"), fsync=job.get("fsync", False),
+                                      profile=job.get("profile"), profile_output=job.get("profile_output"))
+            cache = open_cache(args)
+            with contextlib.redirect_stderr(log):
+                changed = run_job(args, load=self.server.configs.load, cache=cache)
+                if cache is not None:
+                    cache.print_counts()
+            result = {"ok": True, "log": log.getvalue(), "error": None, "changed": changed}
+        except MetadataError as e:
+            result = {"ok": False, "log": log.getvalue(), "error": "{}: {}".format(job["input"], e), "status": 2,
+                      "changed": []}
+        except Exception as e:
+            result = {"ok": False, "log": log.getvalue(), "error": "{}: {}".format(type(e).__name__, e),
+                      "changed": []}
+        self.wfile.write(json.dumps(result).encode("utf-8") + b"\n")
+
+
+class JobServer(socketserver.UnixStreamServer):
+    """ Serves one job at a time; passes print to (redirected) stderr """
+
+    def __init__(self, socket_path):
+        self.configs = ConfigCache()
+        super().__init__(socket_path, JobHandler)
+
+
+def send_probe(socket_path):
+    """ :raises OSError: when nothing is listening on socket_path """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+
+
+def private_directory(directory):
+    """ Creates directory with mode 0700 unless it exists
+
+    :raises PermissionError: when directory is not a directory of this user, or others may write to it
+    """
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    st = os.lstat(directory)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o022:
+        raise PermissionError("{} is not a private directory of this user".format(directory))
+
+
+def serve(socket_path=None):
+    """ Runs until SIGINT or SIGTERM
+
+    :param str socket_path: defaults to client.default_socket_path()
+    """
+    if socket_path is None:
+        socket_path = default_socket_path()
+        if not os.environ.get(SOCKET_ENV):
+            private_directory(os.path.dirname(socket_path))
+    if os.path.lexists(socket_path):
+        check_socket(socket_path)  # never remove a file this server has not created
+        try:
+            send_probe(socket_path)
+        except OSError:
+            os.remove(socket_path)  # stale socket from killed server
+        else:
+            raise RuntimeError("another server is listening on {}".format(socket_path))
+
+    def terminate(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, terminate)
+    umask = os.umask(0o077)  # the socket is created 0600, with no window for other users to connect
+    try:
+        server = JobServer(socket_path)
+    finally:
+        os.umask(umask)
+    with server:
+        print("Listening on {}".format(socket_path), file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.remove(socket_path)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+""" Fingerprint of the applied metadata, kept in docProps/custom.xml
+
+With --stamp, a written document records a hash of the compiled metadata, the
+passes it needs and the tool version as a custom document property. The next
+run with --stamp reads only the package relationships and that one small part,
+and leaves the document alone when the fingerprint matches; nothing else is
+loaded or scanned.
+
+The fingerprint tells which metadata has been applied, not what the document
+looks like now: edits made later in Word go unnoticed until the metadata or
+the tool version changes. A regenerated document (e.g. by pandoc) has no
+fingerprint and is processed as usual.
+"""
+
+import hashlib
+import posixpath
+import zipfile
+
+from docx_coreprop_writer import zipio
+from docx_coreprop_writer.cache import normalize_metadata
+from docx_coreprop_writer.version import version
+
+PROPERTY_NAME = "docx-coreprop-writer fingerprint"
+CT_CUSTOM_PROPERTIES = "application/vnd.openxmlformats-officedocument.custom-properties+xml"
+FMTID_USER_DEFINED = "{D5CDD505-2E9C-101B-9397-08002B2CF9AE}"  # fmtid of every user defined property
+
+_NS_CUSTOM = "http://schemas.openxmlformats.org/officeDocument/2006/custom-properties"
+_NS_VT = "http://schemas.openxmlformats.org/officeDocument/2006/docPropsVTypes"
+_NS_RELS = "http://schemas.openxmlformats.org/package/2006/relationships"
+_NS_CT = "http://schemas.openxmlformats.org/package/2006/content-types"
+_PROPERTY = "{" + _NS_CUSTOM + "}property"
+_LPWSTR = "{" + _NS_VT + "}lpwstr"
+_EMPTY_CUSTOM = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                 '<Properties xmlns="{}" xmlns:vt="{}"/>'.format(_NS_CUSTOM, _NS_VT)).encode("utf-8")
+
+
+def fingerprint(plan):
+    """
+    :param MetadataPlan plan: compiled metadata
+    :return str: "sha256:" and hex digest of plan, the names of its passes and the tool version
+    """
+    digest = hashlib.sha256(normalize_metadata(plan))
+    digest.update(b"\0" + normalize_metadata([pass_func.__name__ for pass_func in plan.passes]))
+    digest.update(b"\0" + normalize_metadata(str(version)))
+    return "sha256:" + digest.hexdigest()
+
+
+def read_fingerprint(filename):
+    """ Reads the fingerprint without touching any part but _rels/.rels and the custom properties
+
+    :param str filename: or a seekable binary file object
+    :return str: None when the document has none (or is no ZIP at all)
+    """
+    from xml.etree import ElementTree
+
+    try:
+        with zipfile.ZipFile(filename) as zf:
+            partname = zipio.package_partname(zf, zipio.RT_CUSTOM_PROPERTIES)
+            if partname is None or partname not in zf.NameToInfo:
+                return None
+            root = ElementTree.fromstring(zf.read(partname))
+    except (zipfile.BadZipFile, ElementTree.ParseError):
+        return None
+    for prop in root.iter(_PROPERTY):
+        if prop.get("name") == PROPERTY_NAME:
+            value = prop.find(_LPWSTR)
+            return value.text if value is not None else None
+    return None
+
+
+def set_property(blob, name, value):
+    """
+    :param bytes blob: custom properties part; None to start an empty one
+    :param str name: property name
+    :param str value: text (vt:lpwstr) value
+    :return bytes: blob with property name set to value, other properties untouched
+    """
+    from docx.opc.oxml import serialize_part_xml
+    from lxml import etree
+
+    root = etree.fromstring(blob if blob is not None else _EMPTY_CUSTOM)
+    props = root.findall(_PROPERTY)
+    prop = next((prop for prop in props if prop.get("name") == name), None)
+    if prop is None:
+        pids = [int(prop.get("pid")) for prop in props if (prop.get("pid") or "").isdigit()]
+        prop = etree.SubElement(root, _PROPERTY, fmtid=FMTID_USER_DEFINED, pid=str(max(pids + [1]) + 1), name=name)
+    for child in list(prop):
+        prop.remove(child)
+    etree.SubElement(prop, _LPWSTR).text = value
+    return serialize_part_xml(root)
+
+
+def stamp_parts(read, value):
+    """ Members to write so that the package carries fingerprint value
+
+    The custom properties part is created when missing, along with its package
+    relationship and content type override.
+
+    :param read: member name -> current bytes of the member (None when missing)
+    :param str value: fingerprint()
+    :return dict: ZIP member name -> new bytes
+    """
+    from docx.opc.oxml import serialize_part_xml
+    from lxml import etree
+
+    rels = etree.fromstring(read(zipio.RELS))
+    targets = [rel.get("Target") for rel in rels.iter("{" + _NS_RELS + "}Relationship")
+               if rel.get("Type") == zipio.RT_CUSTOM_PROPERTIES and rel.get("TargetMode") != "External"]
+    parts = {}
+    if targets != []:
+        partname = posixpath.normpath(targets[0].lstrip("/"))
+    else:
+        partname = zipio.CUSTOM_PARTNAME
+        ids = {rel.get("Id") for rel in rels}
+        rid = next("rId{}".format(number) for number in range(1, len(ids) + 2) if "rId{}".format(number) not in ids)
+        etree.SubElement(rels, "{" + _NS_RELS + "}Relationship", Id=rid, Type=zipio.RT_CUSTOM_PROPERTIES,
+                         Target=partname)
+        parts[zipio.RELS] = serialize_part_xml(rels)
+    content_types = etree.fromstring(read(zipio.CONTENT_TYPES))
+    if not any(override.get("PartName") == "/" + partname
+               for override in content_types.iter("{" + _NS_CT + "}Override")):
+        etree.SubElement(content_types, "{" + _NS_CT + "}Override", PartName="/" + partname,
+                         ContentType=CT_CUSTOM_PROPERTIES)
+        parts[zipio.CONTENT_TYPES] = serialize_part_xml(content_types)
+    parts[partname] = set_property(read(partname), PROPERTY_NAME, value)
+    return parts
+
+
+def read_member(filename, parts):
+    """ :return: member reader for stamp_parts(); pending parts first, then the members of filename """
+
+    def read(name):
+        if isinstance(parts.get(name), bytes):
+            return parts[name]
+        return zipio.read_part(filename, name)
+
+    return read
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+""" Streaming engine: rewrites word/document.xml with incremental parsing
+
+Only one body-level block (paragraph or table) is held in memory at a time;
+it is transformed, written straight into the output ZIP and dropped.
+Small parts (styles, settings, core properties, headers, footers and notes)
+are parsed as a whole.
+"""
+
+import zipfile
+
+from lxml import etree
+from docx.opc.coreprops import CoreProperties
+from docx.opc.oxml import serialize_part_xml
+from docx.oxml import parse_xml
+from docx.oxml.ns import qn
+from docx.oxml.parser import element_class_lookup
+from docx.settings import Settings
+from docx.styles.styles import Styles
+
+from docx_coreprop_writer import (PASSES, STAMP_NAME, VISITORS, core_properties_pass, readonly_recommended_pass,
+                                  word2010_compatibility_pass)
+from docx_coreprop_writer import profiling, zipio
+from docx_coreprop_writer.blocks import BlockWalker
+from docx_coreprop_writer.plan import compile_metadata
+from docx_coreprop_writer.stamp import read_member, stamp_parts
+
+XML_DECLARATION = b"<?xml version='1.0' encoding='UTF-8' standalone='yes'?>\n"
+UNSUPPORTED_KEYS = ["extra_section", "okuzuke"]
+
+
+class PartialDocument:
+    """ Stands in for docx.Document in passes which touch only settings and core properties,
+    and in visitor factories which need only styles
+
+    :param settings: CT_Settings element or None
+    :param core: CT_CoreProperties element or None
+    :param styles: CT_Styles element or None
+    """
+
+    def __init__(self, settings=None, core=None, styles=None):
+        self.settings = Settings(settings) if settings is not None else None
+        self.core_properties = CoreProperties(core) if core is not None else None
+        self.styles = Styles(styles) if styles is not None else None
+
+
+def _namespace_declarations(nsmap):
+    return [b' xmlns="%s"' % uri.encode() if prefix is None else b' xmlns:%s="%s"' % (prefix.encode(), uri.encode())
+            for prefix, uri in nsmap.items()]
+
+
+def _strip_inherited(blob, inherited):
+    """ Drops namespace declarations already made by an ancestor from the first tag of blob """
+    end = blob.index(b">")
+    head = blob[:end]
+    for declaration in _namespace_declarations(inherited):
+        head = head.replace(declaration, b"", 1)
+    return head + blob[end:]
+
+
+def start_tag(elem, inherited):
+    """ :return bytes: start tag of elem without its children """
+    shallow = etree.Element(elem.tag, attrib=dict(elem.attrib), nsmap=elem.nsmap)
+    blob = _strip_inherited(etree.tostring(shallow, encoding="UTF-8", xml_declaration=False), inherited)
+    return blob[:-2] + b">"
+
+
+def end_tag(elem):
+    """ :return bytes: end tag of elem """
+    localname = etree.QName(elem).localname
+    name = localname if elem.prefix is None else "{}:{}".format(elem.prefix, localname)
+    return "</{}>".format(name).encode()
+
+
+def serialize_block(elem, inherited):
+    """ :return bytes: elem and its children, without namespace declarations made by ancestors """
+    blob = etree.tostring(elem, encoding="UTF-8", xml_declaration=False, with_tail=False)
+    return _strip_inherited(blob, inherited)
+
+
+def stream_body(src, dst, transform):
+    """ Copies document part from src to dst calling transform on each direct child of w:body
+
+    Whitespace between block-level elements is not preserved.
+
+    :param src: readable binary stream of word/document.xml
+    :param dst: writable binary stream
+    :param transform: callable taking one direct child of w:body, e.g. BlockWalker.block
+    """
+    context = etree.iterparse(src, events=("start", "end"), huge_tree=True)
+    context.set_element_class_lookup(element_class_lookup)
+    w_body = qn("w:body")
+
+    dst.write(XML_DECLARATION)
+    root = body = None
+    for event, elem in context:
+        parent = elem.getparent()
+        if event == "start":
+            if parent is None:
+                root = elem
+                dst.write(start_tag(elem, {}))
+            elif parent is root and elem.tag == w_body:
+                body = elem
+                dst.write(start_tag(elem, root.nsmap))
+            continue
+
+        if elem is root or elem is body:
+            dst.write(end_tag(elem))
+        elif parent is body or parent is root:
+            if parent is body:
+                transform(elem)
+            dst.write(serialize_block(elem, root.nsmap))
+            elem.clear()
+            while elem.getprevious() is not None:
+                del parent[0]
+
+
+def unsupported_keys(meta_file):
+    """
+    :param dict meta_file: metadata or MetadataPlan
+    :return list: keys of meta_file which stream_document() cannot apply
+    """
+    return [key for key in UNSUPPORTED_KEYS if meta_file.get(key) not in (None, False)]
+
+
+def stream_document(meta_file, filename, out_filename=None, write=True, profiler=None, compresslevel=None,
+                    fsync=False, stamp=None):
+    """ Same as process_document() but never builds the whole document tree
+
+    The body is only known to be unchanged after it has been streamed, so the
+    rewritten package is produced first and discarded when nothing has changed.
+
+    :param dict meta_file:
+    :param str filename:
+    :param str out_filename: defaults to filename (in-place)
+    :param bool write: False to only report what would change
+    :param profiling.Profiler profiler: records load, settings and core passes, walk of
+        headers, footers and notes, and save (which includes the body walk); None to disable
+    :param int compresslevel: deflate level of rewritten parts; None for zlib default
+    :param bool fsync: flush the result to disk before it replaces out_filename
+    :param str stamp: fingerprint to record in the custom properties (see stamp.py); None to leave them alone
+    :return list changed: names of the passes which have changed the document
+    """
+    meta_file = compile_metadata(meta_file)
+    unsupported = unsupported_keys(meta_file)
+    if unsupported != []:
+        raise ValueError("{} not supported in streaming mode".format(", ".join(unsupported)))
+
+    with profiling.stage(profiler, "load"), zipfile.ZipFile(filename) as zf:
+        document = zipio.package_partname(zf, zipio.RT_OFFICE_DOCUMENT)
+        styles_partname = zipio.related_partname(zf, document, zipio.RT_STYLES)
+        settings_partname = zipio.related_partname(zf, document, zipio.RT_SETTINGS)
+        core_partname = zipio.package_partname(zf, zipio.RT_CORE_PROPERTIES)
+        missing = [name for name in [document, styles_partname, settings_partname, core_partname]
+                   if name is None or name not in zf.NameToInfo]
+        if missing != []:
+            raise ValueError("{} not found; use regular mode".format(", ".join(str(name) for name in missing)))
+        styles = parse_xml(zf.read(styles_partname))
+        settings = parse_xml(zf.read(settings_partname))
+        core = parse_xml(zf.read(core_partname))
+        stories = {name: parse_xml(zf.read(name)) for name in zipio.related_partnames(zf, document, zipio.STORY_RELTYPES)
+                   if name in zf.NameToInfo}
+
+    partial = PartialDocument(settings=settings, core=core, styles=styles)
+    changed = []
+    for pass_func in [word2010_compatibility_pass, core_properties_pass]:
+        with profiling.stage(profiler, pass_func.__name__):
+            if pass_func(meta_file, partial):
+                changed.append(pass_func.__name__)
+
+    visitors = [VISITORS[pass_func](meta_file, partial) for pass_func in PASSES if pass_func in VISITORS]
+    walker = BlockWalker([visitor for visitor in visitors if visitor is not None])
+    parts = {}
+    with profiling.stage(profiler, "walk"):
+        for name, root in stories.items():
+            if walker.story(root):
+                parts[name] = serialize_part_xml(root)
+    with profiling.stage(profiler, readonly_recommended_pass.__name__):
+        readonly = readonly_recommended_pass(meta_file, partial)
+
+    if readonly or word2010_compatibility_pass.__name__ in changed:
+        parts[settings_partname] = serialize_part_xml(settings)
+    if core_properties_pass.__name__ in changed:
+        parts[core_partname] = serialize_part_xml(core)
+    if stamp is not None:
+        parts.update(stamp_parts(read_member(filename, parts), stamp))
+    parts[document] = lambda src, dst: stream_body(src, dst, walker.block)
+    with profiling.stage(profiler, "save"):
+        zipio.rewrite_parts(filename, parts, out_filename, compresslevel, fsync=fsync,
+                            keep=lambda: write and (changed != [] or readonly or stamp is not None or
+                                                    any(visitor.changed for visitor in walker.visitors)))
+        for visitor in walker.visitors:
+            visitor.finish()
+    changed.extend(visitor.name for visitor in walker.visitors if visitor.changed)
+    if readonly:
+        changed.append(readonly_recommended_pass.__name__)
+    if stamp is not None:
+        changed.append(STAMP_NAME)
+    return changed
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+""" XML fragments built once and deep-copied into each document
+
+The compat block never changes, and the okuzuke table only depends on the
+plan's rows plus three values resolved once per document (text width, table
+and paragraph style IDs). Each is built on first use with python-docx's own
+element classes, kept per process, and callers insert a deep copy, so batch
+runs do not rebuild identical fragments document after document.
+"""
+
+import copy
+import functools
+
+COMPAT_URL = "http://schemas.microsoft.com/office/word"
+# w:compatSetting (name, val) of Word 2013 and later, without Word 2010 compatibility mode
+COMPAT_SETTINGS = [("compatibilityMode", "15"),
+                   ("overrideTableStyleFontSizeAndJustification", "1"),
+                   ("enableOpenTypeFeatures", "1"),
+                   ("doNotFlipMirrorIndents", "1"),
+                   ("differentiateMultirowTableHeaders", "1"),
+                   ("useWord2013TrackBottomHyphenation", "0"),
+                   ]
+
+
+@functools.lru_cache(maxsize=None)
+def compat_template():
+    """ :return CT_Compat: w:compat block; deep-copy before inserting """
+    from docx.oxml import OxmlElement
+    from docx.oxml.ns import qn
+
+    compat = OxmlElement("w:compat")
+    compat.append(OxmlElement("w:useFELayout"))
+    for name, val in COMPAT_SETTINGS:
+        compat.append(OxmlElement("w:compatSetting", attrs={qn("w:name"): name, qn("w:url"): COMPAT_URL,
+                                                            qn("w:val"): val}))
+    return compat
+
+
+@functools.lru_cache(maxsize=64)
+def okuzuke_template(rows, width, table_style_id, para_style_id):
+    """ Okuzuke table as doc.add_table() and add_row() would build it; deep-copy before inserting
+
+    :param tuple rows: text of each row
+    :param int width: text width in EMU (Document._block_width)
+    :param str table_style_id: None for the default table style
+    :param str para_style_id: None for the default paragraph style
+    :return CT_Tbl:
+    """
+    from docx.enum.table import WD_TABLE_ALIGNMENT
+    from docx.oxml.table import CT_Tbl
+
+    tbl = CT_Tbl.new_tbl(0, 1, width)
+    tbl.tblStyle_val = table_style_id
+    tbl.tblPr.alignment = WD_TABLE_ALIGNMENT.CENTER
+    col_width = tbl.tblGrid.gridCol_lst[0].w  # width rounded to twips, as Table.add_row() reads it
+    for row_text in rows:
+        tc = tbl.add_tr().add_tc()
+        tc.width = col_width
+        tc.clear_content()
+        p = tc.add_p()
+        p.add_r().text = row_text.strip()
+        p.style = para_style_id
+    return tbl
+
+
+def fragment(template):
+    """ :return: deep copy of template, ready to be inserted into a document """
+    return copy.deepcopy(template)
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+""" `docx-coreprop-writer --watch`: stay resident and reprocess on change
+
+Watches the yaml config and the output DOCX (inotify on Linux, stat polling
+elsewhere) and, once a burst of writes has settled, reprocesses only what the
+change calls for:
+
+- the DOCX has been regenerated (e.g. by pandoc): every pass, as a normal run;
+- the yaml has changed: the passes whose keys have changed; core properties
+  alone are patched at ZIP level without loading the document.
+
+extra_section and okuzuke append content, so a change to them takes effect the
+next time the DOCX is regenerated. Our own writes are recognized and ignored.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import signal
+import struct
+import sys
+import time
+
+from docx_coreprop_writer import (ATTR_LIST, FAST_PASSES, PASSES, apply_parts_fast, cell_vertical_alignment_pass,
+                                  character_style_pass, core_properties_pass, extra_section_pass, load_metadata,
+                                  merge_choice, okuzuke_table_pass, paragraph_style_pass, process_document,
+                                  readonly_recommended_pass, table_alignment_in_page_pass, table_autofit_pass,
+                                  table_style_pass, word2010_compatibility_pass)
+from docx_coreprop_writer.plan import MetadataError, compile_metadata
+
+MODES = ["auto", "inotify", "poll"]
+DEBOUNCE = 0.3  # seconds without events before a burst counts as settled
+POLL_INTERVAL = 0.5
+
+# pass -> metadata keys it reads
+PASS_KEYS = {word2010_compatibility_pass: ["word2010compatible"],
+             core_properties_pass: ATTR_LIST,
+             paragraph_style_pass: ["paragraph"],
+             table_style_pass: ["table"],
+             character_style_pass: ["character"],
+             table_alignment_in_page_pass: ["table-alignment-in-page"],
+             cell_vertical_alignment_pass: ["table-cell-vertical-alignment"],
+             table_autofit_pass: ["disable-table-autofit"],
+             extra_section_pass: ["extra_section"],
+             readonly_recommended_pass: ["read-only-recommended"],
+             okuzuke_table_pass: ["okuzuke"],
+             }
+# Passes appending content; running them again on a processed DOCX would append twice
+APPEND_PASSES = [extra_section_pass, okuzuke_table_pass]
+
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len; followed by len bytes of name
+
+
+class InotifyWatcher:
+    """ Watches the directories of paths, so files replaced by rename are still seen
+
+    :param list paths:
+    :raise OSError: when inotify is unavailable
+    """
+
+    def __init__(self, paths):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self.fd = libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.paths = {os.path.abspath(path) for path in paths}
+        self.dirs = {}  # watch descriptor -> directory
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+        for directory in {os.path.dirname(path) for path in self.paths}:
+            wd = libc.inotify_add_watch(self.fd, os.fsencode(directory), mask)
+            if wd < 0:
+                os.close(self.fd)
+                raise OSError(ctypes.get_errno(), "inotify_add_watch failed", directory)
+            self.dirs[wd] = directory
+
+    def wait(self, timeout=None):
+        """
+        :param float timeout: seconds; None to wait for ever
+        :return set: watched paths with events; empty on timeout
+        """
+        if select.select([self.fd], [], [], timeout)[0] == []:
+            return set()
+        data = os.read(self.fd, 64 * 1024)
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, _, _, length = _EVENT.unpack_from(data, offset)
+            name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b"\0")
+            offset += _EVENT.size + length
+            path = os.path.join(self.dirs.get(wd, ""), os.fsdecode(name))
+            if path in self.paths:
+                changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """ Compares stat() of paths every interval
+
+    :param list paths:
+    :param float interval: seconds between checks
+    """
+
+    def __init__(self, paths, interval=POLL_INTERVAL):
+        self.interval = interval
+        self.stats = {os.path.abspath(path): signature(path) for path in paths}
+
+    def wait(self, timeout=None):
+        """
+        :param float timeout: seconds; None to wait for ever
+        :return set: watched paths whose stat() has changed; empty on timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            changed = set()
+            for path, stat in self.stats.items():
+                current = signature(path)
+                if current != stat:
+                    self.stats[path] = current
+                    changed.add(path)
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+            time.sleep(self.interval if deadline is None else max(min(self.interval, deadline - time.monotonic()), 0))
+
+    def close(self):
+        pass
+
+
+def signature(path):
+    """ :return tuple: (mtime, size, inode) of path; None when it does not exist """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+def open_watcher(paths, mode="auto"):
+    """
+    :param list paths: files to watch
+    :param str mode: one of MODES
+    :return: InotifyWatcher or PollingWatcher
+    """
+    if mode != "poll" and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(paths)
+        except OSError as e:
+            if mode == "inotify":
+                raise
+            print("inotify unavailable ({}); polling".format(e), file=sys.stderr)
+    elif mode == "inotify":
+        raise OSError("inotify is only available on Linux")
+    return PollingWatcher(paths)
+
+
+def settle(watcher, changed):
+    """ Waits until no event has arrived for DEBOUNCE seconds
+
+    :param changed: paths seen so far
+    :return set: changed plus paths seen while waiting
+    """
+    while True:
+        more = watcher.wait(DEBOUNCE)
+        if more == set():
+            return changed
+        changed |= more
+
+
+def affected_passes(old, new):
+    """ Passes of new whose metadata keys differ from old
+
+    :param MetadataPlan old:
+    :param MetadataPlan new:
+    :return list: pass functions in PASSES order
+    """
+    changed = {key for key in set(old) | set(new) if old.get(key) != new.get(key)}
+    return [pass_func for pass_func in PASSES
+            if pass_func in new.passes and changed.intersection(PASS_KEYS[pass_func])]
+
+
+def load_plan(args, load=load_metadata):
+    """ :return MetadataPlan: of the yaml and --metadata; None (after printing why) when malformed """
+    try:
+        return compile_metadata(merge_choice(args.metadata, load(args.input)))
+    except MetadataError as e:
+        print("{}: {}".format(args.input, e), file=sys.stderr)
+    except Exception as e:  # caught mid-write, or a syntax error; keep the previous plan
+        print("{}: {}: {}".format(args.input, type(e).__name__, e), file=sys.stderr)
+    return None
+
+
+def run(plan, filename, passes, args):
+    """ Runs passes (None for every pass plan needs) on filename and reports like a normal run
+
+    :return bool: True when filename has been written
+    """
+    try:
+        if passes is not None and all(pass_func in FAST_PASSES for pass_func in passes):
+            changed = apply_parts_fast(plan, filename, passes, compresslevel=args.compress_level, fsync=args.fsync)
+        else:
+            changed = process_document(plan, filename, passes, compresslevel=args.compress_level, fsync=args.fsync)
+    except Exception as e:  # e.g. a DOCX still being written; the next event retries
+        print("{}: {}: {}".format(filename, type(e).__name__, e), file=sys.stderr)
+        return False
+    print("{} {}".format(filename, "processed" if changed != [] else "unchanged, not written"), file=sys.stderr)
+    return changed != []
+
+
+def watch(args, mode="auto"):
+    """ Processes args.output once, then again on every change until SIGINT or SIGTERM
+
+    :param argparse.Namespace args: parsed command line arguments of main()
+    :param str mode: one of MODES
+    """
+    filename = os.path.abspath(args.output)
+    config = os.path.abspath(args.input)
+    plan = load_plan(args)
+    if plan is None:
+        sys.exit(2)
+
+    def terminate(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, terminate)
+    watcher = open_watcher([config, filename], mode)
+    run(plan, filename, None, args)
+    written = signature(filename)
+    print("Watching {} and {} ({})".format(config, filename, type(watcher).__name__), file=sys.stderr)
+    try:
+        while True:
+            changed = settle(watcher, watcher.wait())
+            regenerated = filename in changed and signature(filename) not in (written, None)
+            new_plan = load_plan(args) if config in changed else plan
+            if new_plan is None:
+                continue
+            if regenerated:
+                run(new_plan, filename, None, args)
+            elif new_plan != plan and signature(filename) is not None:
+                passes = affected_passes(plan, new_plan)
+                deferred = [pass_func.__name__ for pass_func in passes if pass_func in APPEND_PASSES]
+                if deferred != []:
+                    print("{} changed; takes effect when {} is regenerated".format(", ".join(deferred), filename),
+                          file=sys.stderr)
+                passes = [pass_func for pass_func in passes if pass_func not in APPEND_PASSES]
+                if passes != []:
+                    run(new_plan, filename, passes, args)
+            plan = new_plan
+            written = signature(filename)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+""" ZIP level access to DOCX package parts without python-docx """
+
+import contextlib
+import copy
+import os
+import posixpath
+import shutil
+import struct
+import tempfile
+import zipfile
+import zlib
+import xml.etree.ElementTree as ET
+
+from docx_coreprop_writer import profiling
+
+RELS = "_rels/.rels"
+CONTENT_TYPES = "[Content_Types].xml"
+RT_CORE_PROPERTIES = "http://schemas.openxmlformats.org/package/2006/relationships/metadata/core-properties"
+RT_CUSTOM_PROPERTIES = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/custom-properties"
+RT_OFFICE_DOCUMENT = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"
+RT_STYLES = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles"
+RT_SETTINGS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/settings"
+RT_HEADER = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/header"
+RT_FOOTER = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/footer"
+RT_FOOTNOTES = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/footnotes"
+RT_ENDNOTES = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/endnotes"
+STORY_RELTYPES = [RT_HEADER, RT_FOOTER, RT_FOOTNOTES, RT_ENDNOTES]
+PR_RELATIONSHIP = "{http://schemas.openxmlformats.org/package/2006/relationships}Relationship"
+CUSTOM_PARTNAME = "docProps/custom.xml"
+
+# python-docx declaration -> equivalent one written by Word
+XML_DECLARATIONS = [(b"<?xml version='1.0' encoding='UTF-8' standalone='yes'?>\n",
+                     b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\r\n'),
+                    ]
+
+_LOCAL_HEADER_SIZE = 30
+_CHUNK_SIZE = 1024 * 1024
+
+
+def rels_partname(partname):
+    """ :return str: relationships part name of partname; `word/document.xml` -> `word/_rels/document.xml.rels` """
+    directory, _, name = partname.rpartition("/")
+    return posixpath.join(directory, "_rels", name + ".rels")
+
+
+def related_partnames(zf, source, reltypes):
+    """ Finds relationship targets of any of reltypes from source part
+
+    :param zipfile.ZipFile zf:
+    :param str source: source part name; "" for package-level relationships
+    :param list reltypes: relationship type URIs
+    :return list partnames: ZIP member names (without leading slash) in relationship order, each once
+    """
+    try:
+        root = ET.fromstring(zf.read(rels_partname(source) if source else RELS))
+    except KeyError:
+        return []
+    partnames = []
+    for rel in root.iter(PR_RELATIONSHIP):
+        if rel.get("Type") in reltypes and rel.get("TargetMode") != "External":
+            target = rel.get("Target")
+            if target.startswith("/"):
+                partname = target.lstrip("/")
+            else:
+                partname = posixpath.normpath(posixpath.join(posixpath.dirname(source), target))
+            if partname not in partnames:
+                partnames.append(partname)
+    return partnames
+
+
+def related_partname(zf, source, reltype, default=None):
+    """ Finds relationship target of reltype from source part
+
+    :param zipfile.ZipFile zf:
+    :param str source: source part name; "" for package-level relationships
+    :param str reltype: relationship type URI
+    :param str default: returned when no such relationship exists
+    :return str partname: ZIP member name (without leading slash)
+    """
+    partnames = related_partnames(zf, source, [reltype])
+    return partnames[0] if partnames != [] else default
+
+
+def package_partname(zf, reltype, default=None):
+    """ Finds package-level relationship target of reltype in _rels/.rels
+
+    :param zipfile.ZipFile zf:
+    :param str reltype: relationship type URI
+    :param str default: returned when no such relationship exists
+    :return str partname: ZIP member name (without leading slash)
+    """
+    return related_partname(zf, "", reltype, default)
+
+
+def read_part(filename, partname):
+    """ Reads one ZIP member
+
+    :param str filename:
+    :param str partname:
+    :return bytes blob: or None when the member does not exist
+    """
+    with zipfile.ZipFile(filename) as zf:
+        try:
+            return zf.read(partname)
+        except KeyError:
+            return None
+
+
+def read_core_properties(filename):
+    """ Reads core properties part
+
+    :param str filename:
+    :return tuple: (partname, blob); blob is None when the package has no core properties part
+    """
+    with zipfile.ZipFile(filename) as zf:
+        partname = package_partname(zf, RT_CORE_PROPERTIES)
+        if partname is None or partname not in zf.NameToInfo:
+            return partname, None
+        return partname, zf.read(partname)
+
+
+def read_settings(filename):
+    """ Reads document settings part
+
+    :param str filename:
+    :return tuple: (partname, blob); blob is None when the package has no settings part
+    """
+    with zipfile.ZipFile(filename) as zf:
+        document = package_partname(zf, RT_OFFICE_DOCUMENT)
+        partname = related_partname(zf, document, RT_SETTINGS) if document is not None else None
+        if partname is None or partname not in zf.NameToInfo:
+            return partname, None
+        return partname, zf.read(partname)
+
+
+def open_source(filename):
+    """ :return: context of filename opened for binary reading; a file object is passed through and left open """
+    if hasattr(filename, "read"):
+        return contextlib.nullcontext(filename)
+    return open(filename, "rb")
+
+
+def can_copy_raw(zout):
+    """ True when zipfile has the internals copy_member_raw() relies on
+
+    zipfile._strip_extra() and the fp and start_dir attributes of ZipFile are not
+    public API (CPython 3.5 to 3.13 have them); without them members are copied
+    with copy_member() instead.
+
+    :param zipfile.ZipFile zout: destination ZIP opened for writing
+    """
+    return hasattr(zipfile, "_strip_extra") and hasattr(zout, "fp") and hasattr(zout, "start_dir")
+
+
+def copy_member(zin, info, zout):
+    """ Copies one member through the public zipfile API; decompresses and compresses it again
+
+    :param zipfile.ZipFile zin: source ZIP
+    :param zipfile.ZipInfo info: member of zin
+    :param zipfile.ZipFile zout: destination ZIP opened for writing
+    """
+    zinfo = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+    zinfo.external_attr = info.external_attr
+    zinfo.compress_type = info.compress_type
+    zip64 = info.file_size > zipfile.ZIP64_LIMIT
+    with zin.open(info) as member_src, zout.open(zinfo, "w", force_zip64=zip64) as member_dst:
+        shutil.copyfileobj(member_src, member_dst, _CHUNK_SIZE)
+
+
+def copy_member_raw(src, info, zout):
+    """ Copies one member's compressed bytes into zout; no decompress/recompress
+
+    :param file src: source ZIP file object opened in binary mode
+    :param zipfile.ZipInfo info: member info taken from the source central directory
+    :param zipfile.ZipFile zout: destination ZIP opened for writing
+    """
+    src.seek(info.header_offset)
+    header = src.read(_LOCAL_HEADER_SIZE)
+    name_len, extra_len = struct.unpack("<HH", header[26:30])
+    src.seek(info.header_offset + _LOCAL_HEADER_SIZE + name_len + extra_len)
+
+    new = copy.copy(info)
+    new.flag_bits &= ~0x08  # sizes and CRC go into local header instead of data descriptor
+    new.extra = zipfile._strip_extra(new.extra, (1,))  # zip64 extra is rebuilt by FileHeader()
+    new.header_offset = zout.fp.tell()
+    zip64 = new.file_size > zipfile.ZIP64_LIMIT or new.compress_size > zipfile.ZIP64_LIMIT
+    zout.fp.write(new.FileHeader(zip64))
+
+    remaining = info.compress_size
+    while remaining > 0:
+        chunk = src.read(min(remaining, _CHUNK_SIZE))
+        if chunk == b"":
+            raise zipfile.BadZipFile("Truncated member {}".format(info.filename))
+        zout.fp.write(chunk)
+        remaining -= len(chunk)
+
+    zout.filelist.append(new)
+    zout.NameToInfo[new.filename] = new
+    zout.start_dir = zout.fp.tell()
+
+
+def fsync_path(path):
+    """ Flushes a file, or a directory to make renames in it durable
+
+    Directories cannot be opened on Windows, where a rename needs no such flush.
+
+    :param str path:
+    """
+    is_dir = os.path.isdir(path)
+    if is_dir and os.name == "nt":
+        return
+    fd = os.open(path, os.O_RDONLY if is_dir else os.O_RDWR)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def current_umask():
+    """ :return int: umask of the process (which can only be read by setting it) """
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+
+def commit(tmp, dst, fsync=False):
+    """ Renames tmp over dst in one step; readers see either the old or the new file
+
+    A symlinked dst is written through: the file it points to is replaced, the link is kept.
+    tmp takes the mode of an existing dst, else the mode a new file gets under the umask.
+
+    :param str tmp: fully written file in the directory of os.path.realpath(dst)
+    :param str dst:
+    :param bool fsync: flush tmp before and the directory after the rename, so dst survives a crash
+    """
+    dst = os.path.realpath(dst)
+    if os.path.exists(dst):
+        os.chmod(tmp, os.stat(dst).st_mode & 0o7777)
+    else:
+        os.chmod(tmp, 0o666 & ~current_umask())  # as open() would create it, not mkstemp()'s 0600
+    if fsync:
+        fsync_path(tmp)
+    os.replace(tmp, dst)
+    if fsync:
+        fsync_path(os.path.dirname(os.path.abspath(dst)))
+
+
+def sync_files(filenames):
+    """ Makes many committed files durable after the fact, each directory flushed once
+
+    Each file is flushed, then each distinct parent directory once, which makes
+    the renames that put the files in place durable too.
+
+    :param list filenames:
+    """
+    filenames = [os.path.realpath(filename) for filename in filenames]
+    for filename in filenames:
+        fsync_path(filename)
+    for directory in sorted({os.path.dirname(filename) for filename in filenames}):
+        fsync_path(directory)
+
+
+def rewrite_parts(filename, parts, out_filename=None, compresslevel=None, keep=None, drop=(), fsync=False):
+    """ Writes a copy of filename where only the members in parts are replaced
+
+    Every other member is copied byte for byte, except those in drop. Members in
+    parts which do not exist in the source are appended. The result is written to
+    a temporary file next to out_filename and renamed into place, or straight
+    into out_filename when it is a file object.
+
+    A part value may also be a callable `func(src, dst)` which streams the member:
+    src is the decompressed source member opened for reading, dst is the new member
+    opened for writing.
+
+    :param str filename: source DOCX, or a seekable binary file object
+    :param dict parts: ZIP member name -> new bytes or callable
+    :param str out_filename: destination, or a binary file object; defaults to filename (in-place)
+    :param int compresslevel: deflate level for replaced members
+    :param keep: callable evaluated after writing; the result is discarded when it returns False
+        (a file object has been written to anyway; only the return value tells)
+    :param drop: names of source members to leave out
+    :param bool fsync: flush the result to disk before it replaces out_filename
+    :return bool: True when out_filename has been written
+    """
+    if out_filename is None:
+        if hasattr(filename, "read"):
+            raise ValueError("out_filename is required when reading from a file object")
+        out_filename = filename
+    if hasattr(out_filename, "write"):
+        _write_members(filename, parts, out_filename, compresslevel, drop)
+        return keep is None or bool(keep())
+    out_filename = os.path.realpath(out_filename)  # write through a symlink, as doc.save() did
+    directory = os.path.dirname(out_filename)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".", suffix=".docx.tmp")
+    try:
+        with os.fdopen(fd, "wb") as dst:
+            _write_members(filename, parts, dst, compresslevel, drop)
+        if keep is not None and not keep():
+            os.remove(tmp)
+            return False
+        commit(tmp, out_filename, fsync)
+        return True
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _write_members(filename, parts, dst, compresslevel, drop):
+    """ Writes the ZIP of rewrite_parts() to the binary file object dst """
+    pending = dict(parts)
+    with open_source(filename) as src, zipfile.ZipFile(src) as zin, zipfile.ZipFile(dst, "w") as zout:
+        raw = can_copy_raw(zout)
+        for info in zin.infolist():
+            if info.filename in drop:
+                continue
+            if info.filename in pending:
+                zinfo = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+                zinfo.external_attr = info.external_attr
+                part = pending.pop(info.filename)
+                if callable(part):
+                    zinfo.compress_type = zipfile.ZIP_DEFLATED
+                    zinfo._compresslevel = compresslevel
+                    zip64 = info.file_size > zipfile.ZIP64_LIMIT // 2  # leaves room for growth
+                    with zin.open(info) as part_src, zout.open(zinfo, "w", force_zip64=zip64) as part_dst:
+                        part(part_src, part_dst)
+                else:
+                    zout.writestr(zinfo, part, compress_type=zipfile.ZIP_DEFLATED, compresslevel=compresslevel)
+                profiling.count("members deflated")
+            elif raw:
+                copy_member_raw(src, info, zout)
+                profiling.count("members copied")
+            else:
+                copy_member(zin, info, zout)
+                profiling.count("members deflated")
+        for name, blob in pending.items():
+            if callable(blob):
+                raise KeyError("There is no item named {!r} in the archive".format(name))
+            zout.writestr(name, blob, compress_type=zipfile.ZIP_DEFLATED, compresslevel=compresslevel)
+            profiling.count("members deflated")
+
+
+def same_member(info, blob):
+    """ True when blob has the content of a source member, judged by size and CRC-32
+
+    python-docx's XML declaration is taken as equal to Word's, so unchanged
+    parts written by Word still match.
+
+    :param zipfile.ZipInfo info:
+    :param bytes blob:
+    :return bool:
+    """
+    candidates = [blob]
+    for ours, theirs in XML_DECLARATIONS:
+        if blob.startswith(ours):
+            candidates.append(theirs + blob[len(ours):])
+    return any(len(candidate) == info.file_size and zlib.crc32(candidate) == info.CRC for candidate in candidates)
+
+
+def write_package(filename, members, out_filename=None, compresslevel=None, fsync=False):
+    """ Writes members as the whole content of the package
+
+    Members whose content equals the source member are copied compressed, without
+    recompression; only new or changed members are deflated. Source members
+    missing from members are left out.
+
+    :param str filename: source DOCX, or a seekable binary file object
+    :param dict members: ZIP member name -> bytes
+    :param str out_filename: destination, or a binary file object; defaults to filename (in-place)
+    :param int compresslevel: deflate level for new or changed members
+    :param bool fsync: flush the result to disk before it replaces out_filename
+    :return list: names of members which have been deflated
+    """
+    with zipfile.ZipFile(filename) as zf:
+        infos = {info.filename: info for info in zf.infolist()}
+    parts = {name: blob for name, blob in members.items() if name not in infos or not same_member(infos[name], blob)}
+    drop = {name for name in infos if name not in members}
+    rewrite_parts(filename, parts, out_filename, compresslevel, drop=drop, fsync=fsync)
+    return list(parts)
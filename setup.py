@@ -138,7 +138,7 @@ setup(
     #
     # For an analysis of "install_requires" vs pip's requirements files see:
     # https://packaging.python.org/en/latest/requirements.html
-    install_requires=["pyyaml", "python-box", "argparse", "python-docx>=0.8.7"],  # Optional
+    install_requires=["pyyaml", "argparse", "python-docx>=0.8.7"],  # Optional
 
     # List additional groups of dependencies here (e.g. development
     # dependencies). Users will be able to install these using the "extras"
@@ -179,6 +179,8 @@ setup(
     entry_points={  # Optional
         'console_scripts': [
             'docx-coreprop-writer=docx_coreprop_writer:main',
+            'docx-coreprop-writer-batch=docx_coreprop_writer.batch:main',
+            'docx-coreprop-client=docx_coreprop_writer.client:main',
         ],
     },
 
@@ -0,0 +1,15 @@
+#!/usr/bin/env python3
+""" Fixtures shared by the tests """
+
+import docx
+import pytest
+
+
+@pytest.fixture
+def source(tmp_path):
+    """ :return str: a small DOCX saved by python-docx """
+    filename = str(tmp_path / "source.docx")
+    doc = docx.Document()
+    doc.add_paragraph("body")
+    doc.save(filename)
+    return filename
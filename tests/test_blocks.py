@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+""" Block walk over footnotes and endnotes """
+
+import docx
+from docx.oxml import parse_xml
+from docx.oxml.ns import qn
+
+from docx_coreprop_writer import blocks
+from docx_coreprop_writer.blocks import BlockWalker, Visitor
+
+FOOTNOTES = ('<w:footnotes xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+             '<w:footnote w:type="separator" w:id="-1"><w:p><w:r><w:separator/></w:r></w:p></w:footnote>'
+             '<w:footnote w:type="continuationSeparator" w:id="0"><w:p><w:r><w:continuationSeparator/></w:r></w:p>'
+             '</w:footnote>'
+             '<w:footnote w:id="1"><w:p><w:r><w:t>note</w:t></w:r></w:p></w:footnote>'
+             '</w:footnotes>')
+
+
+def test_separator_notes_skipped():
+    visited = []
+    visitor = Visitor("count", paragraph=lambda p: visited.append(p) or False)
+    BlockWalker([visitor]).story(parse_xml(FOOTNOTES))
+    assert [p.getparent().get(qn("w:id")) for p in visited] == ["1"]
+
+
+class BytesPart:
+    """ Story part python-docx keeps as bytes, without the private _blob """
+
+    partname = "/word/footnotes.xml"
+    blob = FOOTNOTES.encode("utf-8")
+
+
+def test_part_without_private_blob_left_alone(source, monkeypatch, capsys):
+    visited = []
+    visitor = Visitor("count", paragraph=lambda p: visited.append(p) or False)
+    monkeypatch.setattr(blocks, "story_parts", lambda doc: [BytesPart()])
+    blocks.walk_document(docx.Document(source), [visitor])
+    assert len(visited) == 1  # the body only
+    assert "/word/footnotes.xml skipped" in capsys.readouterr().err
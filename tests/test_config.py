@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+""" Parsed config cache: a JSON round trip gives back what yaml parsed """
+
+import datetime
+import os
+
+import pytest
+
+from docx_coreprop_writer import config
+
+CONFIG = """\
+docx_coreprop:
+  title: Title
+  revision: 3
+  created: 2018-12-31
+  modified: 2018-12-31 10:20:30
+  read-only-recommended: yes
+  paragraph:
+    Normal: Body Text
+  okuzuke:
+    rows: [Title, Author]
+other:
+  key: value
+"""
+
+
+def test_round_trip():
+    block = {"title": "Title", "created": datetime.date(2018, 12, 31),
+             "modified": datetime.datetime(2018, 12, 31, 10, 20, 30), "flag": True, "revision": 3,
+             "none": None, "rows": ["Title", {"!date": "2018-12-31", "other": "key"}]}
+    assert config.from_json(config.to_json(block)) == block
+
+
+@pytest.mark.parametrize("block", [{1: "one"}, {"key": {"!date": "2018-12-31"}}, {"key": {1, 2}}])
+def test_not_cacheable(block):
+    with pytest.raises(TypeError):
+        config.to_json(block)
+
+
+def test_cached_block_equals_parsed(tmp_path, monkeypatch):
+    filename = tmp_path / "config.yaml"
+    filename.write_text(CONFIG)
+    cache_dir = str(tmp_path / "configs")
+    parsed = config.load_block(str(filename), "docx_coreprop", cache_dir)
+    assert oct(os.stat(cache_dir).st_mode & 0o777) == oct(0o700)
+    monkeypatch.setattr(config, "read_yaml", lambda filename: pytest.fail("parsed again"))
+    cached = config.load_block(str(filename), "docx_coreprop", cache_dir)
+    assert cached == parsed
+    assert type(cached["created"]) is datetime.date
+    assert type(cached["modified"]) is datetime.datetime
+
+
+def test_changed_config_parsed_again(tmp_path):
+    filename = tmp_path / "config.yaml"
+    filename.write_text(CONFIG)
+    cache_dir = str(tmp_path / "configs")
+    config.load_block(str(filename), "docx_coreprop", cache_dir)
+    filename.write_text(CONFIG.replace("title: Title", "title: New title"))
+    assert config.load_block(str(filename), "docx_coreprop", cache_dir)["title"] == "New title"
+
+
+def test_disabled_by_default(monkeypatch):
+    monkeypatch.delenv(config.CONFIG_CACHE_ENV, raising=False)
+    assert config.config_cache_dir() is None
+    monkeypatch.setenv(config.CONFIG_CACHE_ENV, "0")
+    assert config.config_cache_dir() is None
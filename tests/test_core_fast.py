@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+""" ZIP level core.xml rewrite gives the same properties as python-docx and leaves other members alone """
+
+import shutil
+import zipfile
+
+import docx
+
+import docx_coreprop_writer as writer
+
+CORE_META = {"author": "K4ZUKI",
+             "category": "Category",
+             "comments": "Comment",
+             "content_status": "Final",
+             "created": "31-Dec-2018",
+             "identifier": "ID-001",
+             "keywords": "Keyword1 Keyword2",
+             "language": "ja-JP",
+             "last_modified_by": "K4ZUKI",
+             "last_printed": "31-Dec-2018",
+             "modified": "31-Dec-2018",
+             "revision": 1123,
+             "subject": "SubjecT",
+             "title": "Title",
+             "version": "1.0",
+             }
+
+
+def raw_members(filename):
+    """ :return dict: member name -> compressed bytes as stored """
+    members = {}
+    with open(filename, "rb") as f, zipfile.ZipFile(f) as zf:
+        for info in zf.infolist():
+            f.seek(info.header_offset + 26)
+            name_len, extra_len = int.from_bytes(f.read(2), "little"), int.from_bytes(f.read(2), "little")
+            f.seek(info.header_offset + 30 + name_len + extra_len)
+            members[info.filename] = f.read(info.compress_size)
+    return members
+
+
+def test_core_properties_match_python_docx(source, tmp_path):
+    slow = shutil.copy(source, str(tmp_path / "slow.docx"))
+    fast = shutil.copy(source, str(tmp_path / "fast.docx"))
+    assert writer.apply_core_properties(CORE_META, slow)
+    assert writer.apply_core_properties_fast(CORE_META, fast)
+
+    slow_props = docx.Document(slow).core_properties
+    fast_props = docx.Document(fast).core_properties
+    for key in writer.ATTR_LIST:
+        assert getattr(fast_props, key) == getattr(slow_props, key), key
+
+
+def test_other_members_untouched(source, tmp_path):
+    fast = shutil.copy(source, str(tmp_path / "fast.docx"))
+    assert writer.apply_core_properties_fast(CORE_META, fast)
+
+    before, after = raw_members(source), raw_members(fast)
+    assert list(before) == list(after)
+    for name in before:
+        if name != "docProps/core.xml":
+            assert after[name] == before[name], name
+
+
+def test_unchanged_document_not_written(source, tmp_path):
+    fast = shutil.copy(source, str(tmp_path / "fast.docx"))
+    assert writer.apply_core_properties_fast(CORE_META, fast)
+    with open(fast, "rb") as f:
+        written = f.read()
+    assert not writer.apply_core_properties_fast(CORE_META, fast)
+    with open(fast, "rb") as f:
+        assert f.read() == written
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+""" Manifest parsing and the precedence of overrides """
+
+import argparse
+
+import pytest
+
+from docx_coreprop_writer.batch import collect_jobs, run_batch
+from docx_coreprop_writer.manifest import read_manifest
+from docx_coreprop_writer.plan import MetadataError, compile_metadata, compile_overrides
+
+YAML_MANIFEST = """\
+docx_coreprop:
+  author: Manifest
+  title: Manifest
+  subject: Manifest
+documents:
+  - path: a.docx
+    title: Row
+  - b.docx
+"""
+
+
+def test_row_beats_metadata_beats_yaml_block(tmp_path):
+    manifest = tmp_path / "manifest.yaml"
+    manifest.write_text(YAML_MANIFEST)
+    args = argparse.Namespace(outputs=[], glob=[], manifest=[str(manifest)],
+                              metadata={"title": "Command", "author": "Command"})
+    jobs = dict(collect_jobs(args))
+    assert jobs["a.docx"] == {"author": "Command", "title": "Row", "subject": "Manifest"}
+    assert jobs["b.docx"] == {"author": "Command", "title": "Command", "subject": "Manifest"}
+
+
+def test_line_manifest(tmp_path):
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text('# comment\n\nout/a.docx title="Document A" identifier=A-001\nout/b.docx\n')
+    assert read_manifest(str(manifest)) == [("out/a.docx", {"title": "Document A", "identifier": "A-001"}),
+                                            ("out/b.docx", {})]
+
+
+def test_csv_manifest(tmp_path):
+    manifest = tmp_path / "manifest.csv"
+    manifest.write_text("path,title,revision,okuzuke.rows\nout/a.docx,Document A,3,Title| Author\nout/b.docx,,,\n")
+    assert read_manifest(str(manifest)) == [("out/a.docx", {"title": "Document A", "revision": "3",
+                                                            "okuzuke": {"rows": ["Title", "Author"]}}),
+                                            ("out/b.docx", {})]
+
+
+@pytest.mark.parametrize("name, content", [("manifest.csv", "title\nDocument A\n"),
+                                           ("manifest.csv", "path,title\n,Document A\n"),
+                                           ("manifest.yaml", "documents:\n  - title: Document A\n"),
+                                           ])
+def test_entry_without_path_rejected(tmp_path, name, content):
+    manifest = tmp_path / name
+    manifest.write_text(content)
+    with pytest.raises(MetadataError):
+        read_manifest(str(manifest))
+
+
+def test_overrides_applied_per_document(tmp_path):
+    manifest = tmp_path / "manifest.csv"
+    manifest.write_text("path,title,revision\na.docx,Document A,3\nb.docx,,x\n")
+    shared = compile_metadata({"title": "Base", "author": "Author"})
+    a, b = read_manifest(str(manifest))
+    plan = compile_overrides(shared, a[1])
+    assert (plan["title"], plan["author"], plan["revision"]) == ("Document A", "Author", 3)
+    with pytest.raises(MetadataError, match="revision"):
+        compile_overrides(shared, b[1])
+
+
+def test_malformed_rows_reported_before_any_job():
+    jobs = [("a.docx", {"revision": "x"}), ("b.docx", {}), ("c.docx", {"created": "yesterday"})]
+    with pytest.raises(MetadataError) as error:
+        run_batch({"title": "Base"}, jobs)  # none of the files exists; no job may have started
+    assert [line.split(":")[0] for line in str(error.value).splitlines()] == ["a.docx", "c.docx"]
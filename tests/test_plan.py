@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+""" Metadata is validated and normalized once, before any document is opened """
+
+import datetime
+
+import pytest
+
+import docx_coreprop_writer as writer
+from docx_coreprop_writer.plan import MetadataError, MetadataPlan, compile_metadata, compile_overrides
+
+
+def test_values_normalized():
+    plan = compile_metadata({"created": "31-Dec-2018", "revision": "3", "read-only-recommended": "yes",
+                             "table-alignment-in-page": "Center", "paragraph": {"Normal": "Body Text"}})
+    assert isinstance(plan, MetadataPlan)
+    assert plan["created"] == datetime.datetime(2018, 12, 31)
+    assert plan["revision"] == 3
+    assert plan["read-only-recommended"] is True
+    assert plan["table-alignment-in-page"] == "center"
+    assert dict(plan["paragraph"]) == {"Normal": "Body Text"}
+
+
+def test_passes_listed():
+    plan = compile_metadata({"word2010compatible": True, "title": "Title", "table": {"Normal Table": "Grid"}})
+    assert plan.passes == (writer.core_properties_pass, writer.table_style_pass)
+
+
+@pytest.mark.parametrize("key, value", [("table-alignment-in-page", "middle"),
+                                        ("table-cell-vertical-alignment", "diagonal"),
+                                        ("paragraph", "Body Text"),
+                                        ("table", ["Normal Table", "Grid"]),
+                                        ("okuzuke", {"rows": "Title"}),
+                                        ("revision", "0"),
+                                        ("created", "2018-12-31"),
+                                        ("extra_section", "maybe"),
+                                        ])
+def test_malformed_value_rejected(key, value):
+    with pytest.raises(MetadataError, match=key):
+        compile_metadata({key: value})
+
+
+def test_every_malformed_key_reported():
+    with pytest.raises(MetadataError) as error:
+        compile_metadata({"revision": "x", "table-alignment-in-page": "middle", "title": "fine"})
+    assert "revision" in str(error.value) and "table-alignment-in-page" in str(error.value)
+    assert "title" not in str(error.value)
+
+
+def test_overrides_merged_and_validated():
+    plan = compile_metadata({"title": "Base", "okuzuke": {"table-style": "Grid", "rows": ["Title"]}})
+    document = compile_overrides(plan, {"revision": "2", "okuzuke": {"rows": ["Author"]}})
+    assert document["title"] == "Base"
+    assert document["revision"] == 2
+    assert document["okuzuke"].to_dict() == {"table-style": "Grid", "rows": ("Author",)}
+    assert compile_overrides(plan, {}) is plan
+    with pytest.raises(MetadataError, match="revision"):
+        compile_overrides(plan, {"revision": "-1"})
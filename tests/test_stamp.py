@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+""" Fingerprint stamp: written once, matched only by the same metadata """
+
+import os
+
+import docx
+
+import docx_coreprop_writer as writer
+from docx_coreprop_writer import stamp
+from docx_coreprop_writer.plan import compile_metadata
+
+META = {"title": "Title", "author": "Author", "read-only-recommended": True}
+
+CUSTOM = (b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+          b'<Properties xmlns="http://schemas.openxmlformats.org/officeDocument/2006/custom-properties" '
+          b'xmlns:vt="http://schemas.openxmlformats.org/officeDocument/2006/docPropsVTypes">'
+          b'<property fmtid="{D5CDD505-2E9C-101B-9397-08002B2CF9AE}" pid="2" name="Client">'
+          b'<vt:lpwstr>ACME</vt:lpwstr></property></Properties>')
+
+
+def run(source, meta):
+    args = writer.argument_parser().parse_args(["-I", os.devnull, "-O", source, "--stamp"])
+    return writer.run_job(args, load=lambda filename: meta)
+
+
+def test_fingerprint_depends_on_metadata():
+    value = stamp.fingerprint(compile_metadata(META))
+    assert value == stamp.fingerprint(compile_metadata(dict(reversed(list(META.items())))))
+    assert value != stamp.fingerprint(compile_metadata(dict(META, title="Other")))
+    assert value != stamp.fingerprint(compile_metadata(dict(META, **{"read-only-recommended": False})))
+
+
+def test_stamp_written_then_matched(source):
+    assert stamp.read_fingerprint(source) is None
+    changed = run(source, META)
+    assert writer.STAMP_NAME in changed
+    assert stamp.read_fingerprint(source) == stamp.fingerprint(compile_metadata(META))
+    mtime = os.stat(source).st_mtime_ns
+    assert run(source, META) == []
+    assert os.stat(source).st_mtime_ns == mtime
+
+
+def test_other_metadata_not_matched(source):
+    run(source, META)
+    other = dict(META, title="Other")
+    assert run(source, other) != []
+    assert docx.Document(source).core_properties.title == "Other"
+    assert stamp.read_fingerprint(source) == stamp.fingerprint(compile_metadata(other))
+
+
+def test_other_custom_properties_kept():
+    blob = stamp.set_property(CUSTOM, stamp.PROPERTY_NAME, "sha256:0")
+    assert b'name="Client"' in blob and b"ACME" in blob
+    assert b'pid="3" name="' + stamp.PROPERTY_NAME.encode("utf-8") + b'"' in blob
+    again = stamp.set_property(blob, stamp.PROPERTY_NAME, "sha256:1")
+    assert again.count(stamp.PROPERTY_NAME.encode("utf-8")) == 1 and b"sha256:1" in again
@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+""" --stream falls back to the whole-document engine for passes it cannot stream """
+
+import docx
+
+import docx_coreprop_writer as writer
+
+
+def test_extra_section_falls_back(source, tmp_path, capsys):
+    config = tmp_path / "config.yaml"
+    config.write_text("docx_coreprop:\n  title: Title\n  extra_section: true\n")
+    args = writer.argument_parser().parse_args(["-I", str(config), "-O", source, "--stream"])
+    changed = writer.run_job(args)
+    assert "extra_section_pass" in changed
+    assert "not supported in streaming mode" in capsys.readouterr().err
+    doc = docx.Document(source)
+    assert doc.core_properties.title == "Title"
+    assert len(doc.sections) == 2
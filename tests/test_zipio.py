@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+""" Package rewrites: member copies, modes of new outputs, fallbacks for private zipfile and python-docx internals """
+
+import os
+import stat
+import sys
+import zipfile
+
+import docx
+import pytest
+
+import docx_coreprop_writer as writer
+from docx_coreprop_writer import zipio
+
+
+def members(filename):
+    """ :return dict: member name -> decompressed bytes """
+    with zipfile.ZipFile(filename) as zf:
+        return {info.filename: zf.read(info) for info in zf.infolist()}
+
+
+@pytest.mark.parametrize("raw", [True, False])
+def test_rewrite_parts_copies_members(source, tmp_path, monkeypatch, raw):
+    monkeypatch.setattr(zipio, "can_copy_raw", lambda zout: raw)
+    out = str(tmp_path / "out.docx")
+    zipio.rewrite_parts(source, {"docProps/custom.xml": b"<x/>"}, out)
+    expected = members(source)
+    expected["docProps/custom.xml"] = b"<x/>"
+    assert members(out) == expected
+    with zipfile.ZipFile(out) as zf:
+        assert zf.testzip() is None
+
+
+def test_package_members_without_content_types_item(source, monkeypatch):
+    doc = docx.Document(source)
+    expected = writer.package_members(doc)
+    monkeypatch.setitem(sys.modules, "docx.opc.pkgwriter", None)  # import of _ContentTypesItem fails
+    assert writer.package_members(doc) == expected
+
+
+def test_new_output_mode_follows_umask(source, tmp_path):
+    umask = os.umask(0o027)
+    try:
+        out = str(tmp_path / "new.docx")
+        zipio.rewrite_parts(source, {}, out)
+    finally:
+        os.umask(umask)
+    assert stat.S_IMODE(os.stat(out).st_mode) == 0o640